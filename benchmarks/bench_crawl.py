@@ -0,0 +1,259 @@
+"""End-to-end crawl throughput against the local fixture server (no live site)
+
+    python benchmarks/bench_crawl.py --scrapers static,browser,async --hotels 100 --latency 50 --repeat 3
+    python benchmarks/bench_crawl.py --save baseline.json
+    python benchmarks/bench_crawl.py --compare baseline.json --tolerance 0.15
+    python benchmarks/bench_crawl.py --scrapers async --hotels 2000 --recycle-after 200
+
+Reports hotels/s, p50/p95 per-page latency as seen by the scraper, peak RSS of
+this process plus the browser, and browser CPU seconds. --compare exits with
+status 1 when a scraper got slower or its peak RSS grew beyond the saved
+baseline by more than the tolerance, so it can gate performance changes.
+With --recycle-after / --max-rss the browser scrapers run memory-bounded;
+peak RSS should then stay flat as --hotels grows.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import psutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.server import FixtureConfig, FixtureServer  # noqa: E402
+from crawler.async_handler import AsyncJSScraper  # noqa: E402
+from crawler.content_extractor import BookingScraper  # noqa: E402
+from crawler.fetcher import TieredFetcher  # noqa: E402
+from crawler.js_handler import JSScraper  # noqa: E402
+from crawler.memory import MemoryBudget  # noqa: E402
+from crawler.rate_limiter import HostRateLimiter  # noqa: E402
+
+
+# A local server needs no politeness, the limiter must not be what gets measured
+def unlimited():
+    return HostRateLimiter(rate=1e6, burst=10000)
+
+
+class PageTimer:
+    """Collects per-page latencies from the scrapers below, thread and task safe"""
+
+    def __init__(self):
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class TimedBookingScraper(BookingScraper):
+    def fetch(self, url, params=None):
+        start = time.perf_counter()
+        try:
+            return super().fetch(url, params)
+        finally:
+            self.timer.add(time.perf_counter() - start)
+
+
+class TimedJSScraper(JSScraper):
+    def _open_search_page(self, page, url):
+        start = time.perf_counter()
+        try:
+            return super()._open_search_page(page, url)
+        finally:
+            self.timer.add(time.perf_counter() - start)
+
+    def _scrape_detail(self, context, card, index):
+        start = time.perf_counter()
+        try:
+            return super()._scrape_detail(context, card, index)
+        finally:
+            self.timer.add(time.perf_counter() - start)
+
+
+class TimedAsyncJSScraper(AsyncJSScraper):
+    async def _open_search_page(self, page, url):
+        start = time.perf_counter()
+        try:
+            return await super()._open_search_page(page, url)
+        finally:
+            self.timer.add(time.perf_counter() - start)
+
+    async def _scrape_detail(self, context, card, index, semaphore):
+        start = time.perf_counter()
+        try:
+            return await super()._scrape_detail(context, card, index, semaphore)
+        finally:
+            self.timer.add(time.perf_counter() - start)
+
+
+class ResourceSampler:
+    """Peak RSS of this process and its children (Playwright driver, browser) plus their CPU time"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_rss = 0
+        self.child_cpu = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._process = psutil.Process()
+
+    def _sample(self):
+        rss = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+                times = child.cpu_times()
+                self.child_cpu[child.pid] = times.user + times.system
+            except psutil.Error:
+                continue
+        self.peak_rss = max(self.peak_rss, rss)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def browser_cpu(self):
+        return sum(self.child_cpu.values())
+
+
+def build_scraper(name, base_url, timer, concurrency, memory=None):
+    if name == 'static':
+        limiter = unlimited()
+        static = TimedBookingScraper(rate_limiter=limiter)
+        static.base_url = f"{base_url}/searchresults.html"
+        static.timer = timer
+        browser = TimedJSScraper(slow_mo=0, rate_limiter=limiter, memory=memory)
+        browser.base_url = static.base_url
+        browser.timer = timer
+        return TieredFetcher(static=static, browser=browser, workers=concurrency)
+    if name == 'browser':
+        scraper = TimedJSScraper(slow_mo=0, rate_limiter=unlimited(), memory=memory)
+    elif name == 'async':
+        scraper = TimedAsyncJSScraper(slow_mo=0, concurrency=concurrency, rate_limiter=unlimited(), memory=memory)
+    else:
+        raise ValueError(f"Unknown scraper '{name}', expected static, browser or async")
+    scraper.base_url = f"{base_url}/searchresults.html"
+    scraper.timer = timer
+    return scraper
+
+
+def run_once(name, base_url, hotels, concurrency, recycle_after=None, max_rss=None):
+    timer = PageTimer()
+    memory = MemoryBudget(recycle_after, max_rss) if recycle_after or max_rss else None
+    scraper = build_scraper(name, base_url, timer, concurrency, memory)
+    cpu_before = psutil.Process().cpu_times()
+    with ResourceSampler() as sampler:
+        start = time.perf_counter()
+        count = sum(1 for _ in scraper.iter_hotels("Benchmark", "2025-12-01", "2025-12-02", hotels))
+        elapsed = time.perf_counter() - start
+    cpu_after = psutil.Process().cpu_times()
+    return {
+        'hotels': count,
+        'seconds': elapsed,
+        'hotels_per_sec': count / elapsed if elapsed else 0.0,
+        'p50_ms': timer.percentile(0.50) * 1000,
+        'p95_ms': timer.percentile(0.95) * 1000,
+        'pages': len(timer.samples),
+        'peak_rss_mb': sampler.peak_rss / 1024 / 1024,
+        'python_cpu_s': (cpu_after.user + cpu_after.system) - (cpu_before.user + cpu_before.system),
+        'browser_cpu_s': sampler.browser_cpu,
+    }
+
+
+def run_scenario(name, base_url, hotels, concurrency, repeat, recycle_after=None, max_rss=None):
+    # Median run by throughput, so one slow outlier does not decide a regression
+    runs = [run_once(name, base_url, hotels, concurrency, recycle_after, max_rss) for _ in range(repeat)]
+    runs.sort(key=lambda r: r['hotels_per_sec'])
+    result = dict(runs[len(runs) // 2])
+    result['hotels_per_sec_runs'] = [round(r['hotels_per_sec'], 2) for r in runs]
+    return result
+
+
+def compare(results, baseline, tolerance):
+    # Names of scrapers that lost more than tolerance of their throughput or p95 latency, or grew peak memory
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if result['hotels_per_sec'] < before['hotels_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {before['hotels_per_sec']:.1f} -> {result['hotels_per_sec']:.1f} hotels/s")
+        if before['p95_ms'] and result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.0f} -> {result['p95_ms']:.0f} ms")
+        if before.get('peak_rss_mb') and result['peak_rss_mb'] > before['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{name}: peak RSS {before['peak_rss_mb']:.0f} -> {result['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scrapers", default="static,browser,async")
+    parser.add_argument("--hotels", type=int, default=100, help="hotels per crawl")
+    parser.add_argument("--latency", type=float, default=50.0, help="server delay per request in ms")
+    parser.add_argument("--jitter", type=float, default=10.0)
+    parser.add_argument("--variant", default="testid", help="testid, popular, icons or captured")
+    parser.add_argument("--no-load-more", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--recycle-after", type=int, help="memory-bounded mode: new detail context every N pages")
+    parser.add_argument("--max-rss", type=float, help="memory-bounded mode: recycle once RSS passes this many MB")
+    parser.add_argument("--save", help="write results as a baseline JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    config = FixtureConfig(max(args.hotels * 2, 100), args.latency, args.jitter, args.variant,
+                           not args.no_load_more)
+    results = {}
+    with FixtureServer(config) as server:
+        for name in args.scrapers.split(','):
+            name = name.strip()
+            print(f"Running {name} against {server.base_url} ...")
+            results[name] = run_scenario(name, server.base_url, args.hotels, args.concurrency, args.repeat,
+                                         args.recycle_after, args.max_rss)
+
+    print(f"\n{args.hotels} hotels, {args.latency:.0f}+-{args.jitter:.0f} ms latency, {args.variant} markup, "
+          f"median of {args.repeat}")
+    print(f"  {'scraper':8} {'hotels/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'peak RSS':>9} {'py CPU':>7} {'browser CPU':>12}")
+    for name, r in results.items():
+        print(f"  {name:8} {r['hotels_per_sec']:9.1f} {r['p50_ms']:8.0f} {r['p95_ms']:8.0f} "
+              f"{r['peak_rss_mb']:7.0f}MB {r['python_cpu_s']:6.1f}s {r['browser_cpu_s']:11.1f}s")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions beyond {:.0%}:".format(args.tolerance))
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
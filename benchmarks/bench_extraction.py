@@ -0,0 +1,83 @@
+"""Per-card extraction cost: one query per field vs. one bulk page.evaluate
+
+    python benchmarks/bench_extraction.py --cards 100 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+from playwright.sync_api import sync_playwright
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler.extraction import CARD_FIELDS, PROPERTY_CARD_SELECTOR, extract_cards  # noqa: E402
+
+
+CARD_HTML = """
+<div data-testid="property-card">
+  <a href="https://www.booking.com/hotel/gb/hotel-{i}.html">
+    <div data-testid="title">Hotel {i}</div>
+  </a>
+  <span data-testid="price-and-discounted-price">EGP {price:,}</span>
+  <div data-testid="review-score">Scored {score}<br>{score}</div>
+  <span data-testid="address">Street {i}, London</span>
+  <span data-testid="distance">{distance} km from downtown</span>
+</div>
+"""
+
+
+def build_page(n):
+    cards = "".join(
+        CARD_HTML.format(i=i, price=1000 + 37 * i, score=round(6 + (i % 40) / 10, 1), distance=(i % 9) + 0.5)
+        for i in range(n)
+    )
+    return f"<html><body>{cards}</body></html>"
+
+
+def extract_per_field(page, limit):
+    # The pre-bulk approach: one IPC round trip per field per card
+    cards = []
+    for hotel in page.query_selector_all(PROPERTY_CARD_SELECTOR)[:limit]:
+        row = {}
+        for key, selector in CARD_FIELDS.items():
+            elem = hotel.query_selector(selector)
+            row[key] = elem.inner_text().strip() if elem else "N/A"
+        row['url'] = page.evaluate('(element) => element.querySelector("a").href', hotel)
+        cards.append(row)
+    return cards
+
+
+def timed(fn, page, n, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = fn(page, n)
+        best = min(best, time.perf_counter() - start)
+    assert len(rows) == n, f"expected {n} cards, got {len(rows)}"
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+        page.set_content(build_page(args.cards))
+
+        before = timed(extract_per_field, page, args.cards, args.repeat)
+        after = timed(extract_cards, page, args.cards, args.repeat)
+        browser.close()
+
+    print(f"{args.cards} cards, best of {args.repeat}")
+    print(f"  per-field queries : {before * 1000 / args.cards:8.3f} ms/card  ({before * 1000:8.1f} ms total)")
+    print(f"  bulk evaluate     : {after * 1000 / args.cards:8.3f} ms/card  ({after * 1000:8.1f} ms total)")
+    print(f"  speedup           : {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Price and score parsing throughput: Arrow kernels vs. the old per-column pandas regexes
+
+    python benchmarks/bench_normalize.py --rows 1000000 --distinct 0.3 --repeat 3
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler.normalize import normalize_frame  # noqa: E402
+
+
+PRICE_FORMATS = ['EGP\xa0{:,}', '€ {:,}', '£{:,}', 'US${:,}', '{:,} zł', 'N/A']
+SCORE_FORMATS = ['Scored {0}\n{0}\nWonderful\n{1:,} reviews', '{0}/10', 'N/A']
+
+
+def build_frame(n, distinct, seed=0):
+    # Crawls repeat price and score text across hotels and days, `distinct` is the share of unique strings
+    rng = np.random.default_rng(seed)
+    pool = max(1, int(n * distinct))
+    prices = [PRICE_FORMATS[i % len(PRICE_FORMATS)].format(p)
+              for i, p in enumerate(rng.integers(20, 400000, pool))]
+    scores = [SCORE_FORMATS[i % len(SCORE_FORMATS)].format(round(s, 1), r)
+              for i, (s, r) in enumerate(zip(rng.uniform(5, 10, pool), rng.integers(1, 5000, pool)))]
+    return pd.DataFrame({
+        'price': np.array(prices, dtype=object)[rng.integers(0, pool, n)],
+        'score': np.array(scores, dtype=object)[rng.integers(0, pool, n)],
+    })
+
+
+def old_parse(df):
+    # js_handler.build_dataframe before crawler.normalize, minus the crash on "N/A"
+    out = df.copy()
+    out['price_numeric'] = pd.to_numeric(out['price'].str.replace(r'[^\d.]', '', regex=True), errors='coerce')
+    out['score_clean'] = out['score'].str.extract(r'(\d+\.\d+)')[0].astype(float)
+    return out
+
+
+def timed(fn, df, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--distinct", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = build_frame(args.rows, args.distinct)
+    before = timed(old_parse, df, args.repeat)
+    after = timed(normalize_frame, df, args.repeat)
+
+    print(f"{args.rows:,} rows, {args.distinct:.0%} distinct strings, best of {args.repeat}")
+    print(f"  pandas regexes (price, score)        : {args.rows / before:12,.0f} rows/s  ({before:6.2f} s)")
+    print(f"  normalize_frame (+currency, reviews) : {args.rows / after:12,.0f} rows/s  ({after:6.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Cold-start time and import memory of the GUI, CLI and dashboard entry points
+
+    python benchmarks/bench_startup.py --repeat 5
+    python benchmarks/bench_startup.py --targets gui,cli-status --importtime
+    python benchmarks/bench_startup.py --save startup.json
+    python benchmarks/bench_startup.py --compare startup.json --tolerance 0.25
+
+Every run is a fresh interpreter started in an empty temporary directory, so
+no job queue, crawl store or CSV from this checkout is picked up. Reports the
+median wall time from process start to the entry point being ready, the RSS
+at that point and which heavy modules got imported. --compare exits with
+status 1 when a target got slower or bigger than the saved baseline by more
+than the tolerance.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('playwright', 'pandas', 'pyarrow', 'numpy', 'lxml', 'requests', 'matplotlib', 'plotly')
+
+# Code run in the child after the entry point is ready; prints one JSON line for the parent
+REPORT = """
+import json, sys, psutil
+print('STARTUP ' + json.dumps({
+    'rss_mb': psutil.Process().memory_info().rss / 2**20,
+    'modules': sorted({name.split('.')[0] for name in sys.modules} & set(%r)),
+}))
+""" % (HEAVY_MODULES,)
+
+TARGETS = {
+    # The Tk window with its worker threads; without a display everything but the window itself
+    'gui': """
+import run
+try:
+    root = run.tk.Tk()
+except run.tk.TclError:
+    run.CrawlDaemon(run.JobQueue(), workers=2).close()
+else:
+    app = run.BookingCrawlerGUI(root)
+    root.update()
+    app.on_close()
+""",
+    'cli-status': """
+import runpy, sys
+sys.argv = ['cli.py', 'status']
+runpy.run_path(os.path.join(ROOT, 'cli.py'), run_name='__main__')
+""",
+    'cli-submit': """
+import runpy, sys
+sys.argv = ['cli.py', 'submit', 'Paris, Madrid', '--checkin', '+7', '--checkout', '+8']
+runpy.run_path(os.path.join(ROOT, 'cli.py'), run_name='__main__')
+""",
+    # Streamlit's bare mode: the script runs top to bottom with no server, like a first page load
+    'dashboard': """
+import runpy
+runpy.run_path(os.path.join(ROOT, 'dashboard', 'app.py'), run_name='__main__')
+""",
+}
+
+
+def child_source(target):
+    return f"import os, sys\nROOT = {ROOT!r}\nsys.path.insert(0, ROOT)\n{TARGETS[target]}\n{REPORT}"
+
+
+def run_once(target, python, importtime=False):
+    with tempfile.TemporaryDirectory() as work_dir:
+        command = [python] + (['-X', 'importtime'] if importtime else []) + ['-c', child_source(target)]
+        start = time.perf_counter()
+        done = subprocess.run(command, cwd=work_dir, capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+
+    lines = [line for line in done.stdout.splitlines() if line.startswith('STARTUP ')]
+    if done.returncode != 0 or not lines:
+        raise RuntimeError(f"{target} failed (exit code {done.returncode}):\n{done.stderr[-2000:]}")
+    result = json.loads(lines[-1][len('STARTUP '):])
+    result['seconds'] = elapsed
+    if importtime:
+        result['imports'] = slowest_imports(done.stderr)
+    return result
+
+
+def slowest_imports(stderr, top=10):
+    # -X importtime lines: "import time: self [us] | cumulative | imported package", top-level packages only
+    found = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            found.append((int(cumulative) / 1000, name.strip()))
+    return sorted(found, reverse=True)[:top]
+
+
+def run_target(target, python, repeat):
+    # The first run warms the OS file cache and writes .pyc files of site-packages, it is not counted
+    run_once(target, python)
+    runs = [run_once(target, python) for _ in range(repeat)]
+    return {
+        'seconds': statistics.median(run['seconds'] for run in runs),
+        'rss_mb': statistics.median(run['rss_mb'] for run in runs),
+        'modules': runs[-1]['modules'],
+    }
+
+
+def compare(results, baseline, tolerance):
+    # Names of targets that start more than tolerance slower or use more than tolerance more memory
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if result['seconds'] > before['seconds'] * (1 + tolerance):
+            regressions.append(f"{name}: {before['seconds']:.2f} s -> {result['seconds']:.2f} s")
+        if result['rss_mb'] > before['rss_mb'] * (1 + tolerance):
+            regressions.append(f"{name}: {before['rss_mb']:.0f} MB -> {result['rss_mb']:.0f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", default=",".join(TARGETS), help="comma separated, from " + ", ".join(TARGETS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--python", default=sys.executable, help="interpreter to start the entry points with")
+    parser.add_argument("--importtime", action="store_true", help="also list the slowest imports of each target")
+    parser.add_argument("--save", help="write results as a baseline JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'target':>12}  {'startup':>9}  {'rss':>8}  heavy modules imported")
+    for target in args.targets.split(','):
+        result = results[target] = run_target(target, args.python, args.repeat)
+        print(f"{target:>12}  {result['seconds'] * 1000:7.0f} ms  {result['rss_mb']:5.0f} MB  "
+              f"{', '.join(result['modules']) or '-'}")
+        if args.importtime:
+            for ms, name in run_once(target, args.python, importtime=True)['imports']:
+                print(f"{'':>14}{ms:7.0f} ms  {name}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions beyond {:.0%}:".format(args.tolerance))
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
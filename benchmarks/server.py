@@ -0,0 +1,228 @@
+"""Local Booking.com stand-in serving search-result and hotel-detail fixtures
+
+    python benchmarks/server.py --port 8000 --latency 80 --jitter 20 --variant testid
+
+Search pages live at /searchresults.html (offset paging plus a "Load more
+results" button), hotel pages at /hotel/xx/<slug>.html. --variant captured
+serves the saved debug_html.html as every search page, with its hotel links
+pointed at this server.
+"""
+import argparse
+import hashlib
+import html
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CAPTURED_PAGE = os.path.join(ROOT, "debug_html.html")
+RESULTS_PER_PAGE = 25
+
+CARD_HTML = """
+<div data-testid="property-card">
+  <a href="{base}/hotel/gb/{slug}.html?aid=1&srpvid={i}">
+    <div data-testid="title">{name}</div>
+  </a>
+  <span data-testid="price-and-discounted-price">EGP&nbsp;{price:,}</span>
+  <div data-testid="review-score">Scored {score}<br>{score}<br>Good<br>{reviews:,} reviews</div>
+  <span data-testid="address">Street {i}, London</span>
+  <span data-testid="distance">{distance} km from downtown</span>
+</div>
+"""
+
+# The three facility layouts extraction.FACILITY_STRATEGIES knows about
+FACILITY_MARKUP = {
+    'testid': ('<div data-testid="property-highlights"><ul>{items}</ul></div>',
+               '<li role="listitem" class="c5ae8a7f67"><div class="b99b6ef58f b2b0196c65">{name}</div></li>'),
+    'popular': ('<div data-testid="property-most-popular-facilities-wrapper"><ul>{items}</ul></div>',
+                '<li class="b0bf4dc58f b2f588b43c"><span class="f6b6d2a959">{name}</span></li>'),
+    'icons': ('<ul>{items}</ul>',
+              '<li><span data-testid="facility-icon"></span><div class="b99b6ef58f">{name}</div></li>'),
+}
+FACILITIES = ['Free WiFi', 'Non-smoking rooms', 'Family rooms', 'Room service', 'Restaurant', 'Bar',
+              'Fitness centre', 'Parking', '24-hour front desk', 'Airport shuttle', 'Spa', 'Swimming pool']
+
+LOAD_MORE_SCRIPT = """
+<button id="load-more" onclick="loadMore()">Load more results</button>
+<script>
+let nextOffset = {next};
+async function loadMore() {{
+    const params = new URLSearchParams(location.search);
+    params.set('offset', nextOffset);
+    params.set('fragment', '1');
+    const response = await fetch('/searchresults.html?' + params.toString());
+    const text = await response.text();
+    document.getElementById('results').insertAdjacentHTML('beforeend', text);
+    nextOffset += {page_size};
+    if (!text.trim() || nextOffset >= {total}) document.getElementById('load-more').remove();
+}}
+</script>
+"""
+
+
+def _seed(text):
+    # Same request path -> same numbers on every run
+    return int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+
+
+class FixtureConfig:
+    def __init__(self, hotels=1000, latency_ms=0.0, jitter_ms=0.0, variant='testid', load_more=True,
+                 page_size=RESULTS_PER_PAGE, robots="User-agent: *\nAllow: /\n"):
+        if variant not in FACILITY_MARKUP and variant != 'captured':
+            raise ValueError(f"Unknown markup variant '{variant}', expected one of "
+                             f"{sorted(FACILITY_MARKUP) + ['captured']}")
+        self.hotels = hotels
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.variant = variant
+        self.load_more = load_more
+        self.page_size = page_size
+        # Served as /robots.txt with an ETag, so the crawler's conditional revalidation gets a 304
+        self.robots = robots
+        self._captured = None
+
+    def delay(self, path):
+        # Deterministic per path: latency +- jitter
+        if not self.latency_ms and not self.jitter_ms:
+            return 0.0
+        spread = (_seed(path) % 2001) / 1000.0 - 1.0
+        return max(0.0, self.latency_ms + spread * self.jitter_ms) / 1000.0
+
+    def captured_page(self, base):
+        if self._captured is None:
+            with open(CAPTURED_PAGE, encoding='utf-8') as f:
+                self._captured = f.read()
+        # Hotel links go to this server, assets and trackers stay external and get blocked or fail fast
+        return re.sub(r'https://www\.booking\.com/hotel/', base + '/hotel/', self._captured)
+
+    def cards(self, base, offset):
+        out = []
+        for i in range(offset, min(offset + self.page_size, self.hotels)):
+            seed = _seed(f"hotel-{i}")
+            out.append(CARD_HTML.format(
+                base=base, i=i, slug=f"hotel-{i}", name=f"Benchmark Hotel {i}",
+                price=1000 + seed % 300000, score=round(5 + (seed % 50) / 10, 1),
+                reviews=seed % 5000, distance=(seed % 90) / 10,
+            ))
+        return "".join(out)
+
+    def search_page(self, base, offset, fragment=False):
+        if self.variant == 'captured':
+            return self.captured_page(base) if offset == 0 else "<html><body></body></html>"
+        cards = self.cards(base, offset)
+        if fragment:
+            return cards
+        more = ""
+        if self.load_more and offset + self.page_size < self.hotels:
+            more = LOAD_MORE_SCRIPT.format(next=offset + self.page_size, page_size=self.page_size,
+                                           total=self.hotels)
+        return f"<html><body><div id=\"results\">{cards}</div>{more}</body></html>"
+
+    def detail_page(self, slug):
+        variant = 'testid' if self.variant == 'captured' else self.variant
+        wrapper, item = FACILITY_MARKUP[variant]
+        seed = _seed(slug)
+        names = [name for j, name in enumerate(FACILITIES) if (seed >> j) & 1] or FACILITIES[:1]
+        items = "".join(item.format(name=html.escape(name)) for name in names)
+        return (f"<html><head><title>{html.escape(slug)}</title></head><body>"
+                f"<h2>{html.escape(slug)}</h2>{wrapper.format(items=items)}</body></html>")
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    config = FixtureConfig()
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as two writes, Nagle would hold the body for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        base = f"http://{self.headers.get('Host')}"
+        time.sleep(self.config.delay(self.path))
+
+        if url.path.startswith('/searchresults'):
+            offset = int(query.get('offset', ['0'])[0] or 0)
+            body = self.config.search_page(base, offset, fragment='fragment' in query)
+            self._send(200, body)
+        elif url.path.startswith('/hotel/'):
+            self._send(200, self.config.detail_page(url.path.rsplit('/', 1)[-1].split('.')[0]))
+        elif url.path == '/robots.txt':
+            etag = f'"{_seed(self.config.robots):x}"'
+            if self.headers.get('If-None-Match') == etag:
+                self._send(304, "", headers={'ETag': etag})
+            else:
+                self._send(200, self.config.robots, 'text/plain', headers={'ETag': etag})
+        else:
+            self._send(404, "<html><body>Not found</body></html>")
+
+    def _send(self, status, body, content_type='text/html; charset=utf-8', headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FixtureServer:
+    """Threaded fixture server, usable as a context manager from benchmark code"""
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        handler = type('Handler', (FixtureHandler,), {'config': config or FixtureConfig()})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--hotels", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0, help="mean delay per request in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+- spread around the mean in ms")
+    parser.add_argument("--variant", default="testid", choices=sorted(FACILITY_MARKUP) + ['captured'])
+    parser.add_argument("--no-load-more", action="store_true", help="offset paging only")
+    args = parser.parse_args()
+
+    config = FixtureConfig(args.hotels, args.latency, args.jitter, args.variant, not args.no_load_more)
+    server = FixtureServer(config, port=args.port)
+    print(f"Serving {args.hotels} hotels ({args.variant}) at {server.base_url}/searchresults.html")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
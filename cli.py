@@ -0,0 +1,177 @@
+"""Headless entry point: crawl now, queue jobs, run the crawl daemon, check job status
+
+    python cli.py crawl "Paris, Madrid" --checkin 2025-12-01 --checkout 2025-12-08 --max-results 50
+    python cli.py submit Paris --checkin +7 --checkout +8 --every 6h
+    python cli.py daemon --workers 2
+    python cli.py status
+    python cli.py reextract --selectors selectors.json --output hotels_reextracted.csv
+"""
+import argparse
+from datetime import datetime, timedelta
+import sys
+
+from crawler.jobs import CrawlDaemon, JobQueue, parse_interval, resolve_date
+
+
+def add_job_arguments(parser):
+    today = datetime.now()
+    parser.add_argument("destinations", help='one or more, comma separated: "Paris, Madrid"')
+    parser.add_argument("--checkin", default=today.strftime('%Y-%m-%d'),
+                        help="YYYY-MM-DD, or +N for N days after the day the job runs")
+    parser.add_argument("--checkout", default=(today + timedelta(days=7)).strftime('%Y-%m-%d'))
+    parser.add_argument("--max-results", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel detail tabs per job")
+    parser.add_argument("--show-browser", action="store_true")
+    parser.add_argument("--browser-only", action="store_true", help="skip the static HTML tier")
+    parser.add_argument("--no-resume", action="store_true", help="start over instead of resuming a crawl")
+    parser.add_argument("--delta", action="store_true",
+                        help="visit detail pages only for hotels that are new or changed since the last crawl")
+    parser.add_argument("--archive", action="store_true",
+                        help="keep every fetched page compressed in html_archive/ for offline re-extraction")
+    parser.add_argument("--attempts", type=int, default=3, help="tries before a job counts as failed")
+
+
+def add_memory_arguments(parser):
+    parser.add_argument("--recycle-after", type=int, metavar="PAGES",
+                        help="replace the detail-page browser context after this many pages")
+    parser.add_argument("--max-rss", type=float, metavar="MB",
+                        help="recycle contexts and idle browsers once crawler plus browser memory passes this")
+
+
+def submit(queue, args, run_at=None, repeat_every=None):
+    # Dates are checked now so a typo fails here rather than in the daemon
+    resolve_date(args.checkin)
+    resolve_date(args.checkout)
+    return queue.submit(args.destinations, args.checkin, args.checkout, args.max_results, run_at=run_at,
+                        repeat_every=repeat_every, max_attempts=args.attempts, concurrency=args.concurrency,
+                        headless=not args.show_browser, static_first=not args.browser_only,
+                        resume=not args.no_resume, delta=args.delta, archive=args.archive)
+
+
+def print_jobs(jobs):
+    if not jobs:
+        print("No jobs")
+        return
+    print(f"{'id':>5}  {'status':9}  {'destination':20}  {'dates':23}  {'hotels':>9}  {'tries':>5}  next run / note")
+    for job in jobs:
+        dates = f"{job['checkin']} - {job['checkout']}"
+        hotels = f"{job['hotels']}/{job['max_results']}"
+        note = job['error'] or job['output'] or ''
+        if job['status'] == 'queued':
+            note = datetime.fromtimestamp(job['run_at']).strftime('%Y-%m-%d %H:%M')
+            if job['repeat_every']:
+                note += f", every {job['repeat_every'] / 3600:g} h"
+        print(f"{job['id']:>5}  {job['status']:9}  {job['destination'][:20]:20}  {dates:23}  {hotels:>9}  "
+              f"{job['attempts']:>2}/{job['max_attempts']:<2}  {note[:60]}")
+
+
+def run_reextract(args):
+    from crawler.archive import HtmlArchive, load_selectors, reextract
+    from crawler.js_handler import build_dataframe
+
+    archive = HtmlArchive(args.archive_dir)
+    selectors = load_selectors(args.selectors) if args.selectors else None
+    since = datetime.strptime(args.since, '%Y-%m-%d').timestamp() if args.since else None
+    try:
+        rows = reextract(archive, workers=args.workers, selectors=selectors, since=since)
+    finally:
+        archive.close()
+    if not rows:
+        print(f"No hotels found in {args.archive_dir}")
+        sys.exit(1)
+    build_dataframe(rows).to_csv(args.output, index=False)
+    print(f"Saved {len(rows)} hotels to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default="crawl_jobs.sqlite", help="job queue file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    crawl = commands.add_parser("crawl", help="crawl now in this process and wait for the result")
+    add_job_arguments(crawl)
+    crawl.add_argument("--workers", type=int, default=2, help="destinations crawled at the same time")
+    add_memory_arguments(crawl)
+
+    queued = commands.add_parser("submit", help="add jobs for a running daemon")
+    add_job_arguments(queued)
+    queued.add_argument("--at", help="first run, YYYY-MM-DD HH:MM (default now)")
+    queued.add_argument("--every", help="repeat interval, e.g. 30m, 6h, 1d")
+
+    daemon = commands.add_parser("daemon", help="run queued jobs until interrupted")
+    daemon.add_argument("--workers", type=int, default=2, help="jobs crawled at the same time")
+    daemon.add_argument("--poll", type=float, default=5.0, help="seconds between queue checks")
+    add_memory_arguments(daemon)
+
+    status = commands.add_parser("status", help="list jobs")
+    status.add_argument("job_id", nargs='?', type=int)
+    status.add_argument("--state", choices=['queued', 'running', 'done', 'failed', 'cancelled'])
+    status.add_argument("--limit", type=int, default=30)
+
+    cancel = commands.add_parser("cancel", help="cancel a queued job")
+    cancel.add_argument("job_id", type=int)
+
+    retry = commands.add_parser("retry", help="queue a failed or cancelled job again")
+    retry.add_argument("job_id", type=int)
+
+    reextract = commands.add_parser("reextract", help="parse archived pages again, without the network")
+    reextract.add_argument("--archive-dir", default="html_archive")
+    reextract.add_argument("--output", default="hotels_reextracted.csv")
+    reextract.add_argument("--selectors", help="JSON file with updated card_fields, facility_strategies, ...")
+    reextract.add_argument("--since", help="only pages fetched on or after this day, YYYY-MM-DD")
+    reextract.add_argument("--workers", type=int, help="parser processes (default one per core)")
+
+    args = parser.parse_args()
+    queue = JobQueue(args.db)
+
+    if args.command == "crawl":
+        ids = submit(queue, args)
+        worker = CrawlDaemon(queue, workers=args.workers, recycle_after=args.recycle_after, max_rss_mb=args.max_rss)
+        try:
+            worker.run_forever(until_done=ids)
+        except KeyboardInterrupt:
+            print("Interrupted, running jobs stop after their current hotel. "
+                  "Resume later with the same command or a daemon")
+        finally:
+            worker.close()
+        jobs = [queue.get(i) for i in ids]
+        print_jobs(jobs)
+        sys.exit(0 if all(job['status'] == 'done' for job in jobs) else 1)
+
+    elif args.command == "submit":
+        run_at = datetime.strptime(args.at, '%Y-%m-%d %H:%M').timestamp() if args.at else None
+        ids = submit(queue, args, run_at, parse_interval(args.every))
+        print(f"Queued job{'s' if len(ids) > 1 else ''} {', '.join(map(str, ids))}")
+
+    elif args.command == "daemon":
+        worker = CrawlDaemon(queue, workers=args.workers, poll_interval=args.poll, recycle_after=args.recycle_after,
+                             max_rss_mb=args.max_rss)
+        print(f"Crawl daemon {worker.name} waiting for jobs in {args.db} (Ctrl-C to stop)")
+        try:
+            worker.run_forever()
+        except KeyboardInterrupt:
+            print("Stopping, jobs in progress go back in the queue after their current hotel")
+        finally:
+            worker.close()
+
+    elif args.command == "status":
+        if args.job_id is not None:
+            job = queue.get(args.job_id)
+            print_jobs([job] if job else [])
+        else:
+            print_jobs(queue.jobs(args.state, args.limit))
+
+    elif args.command == "cancel":
+        print("Cancelled" if queue.cancel(args.job_id) else "Only queued jobs can be cancelled")
+
+    elif args.command == "retry":
+        print("Queued again" if queue.retry(args.job_id) else "Only failed or cancelled jobs can be retried")
+
+    elif args.command == "reextract":
+        run_reextract(args)
+
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from crawler.urls import canonical_url
+
+
+SEARCH = 'search'
+DETAIL = 'detail'
+
+# Keys a --selectors JSON file may override, with the content_extractor argument each one feeds
+SELECTOR_KEYS = {
+    'card_selector': 'search',
+    'card_fields': 'search',
+    'card_link_selector': 'search',
+    'facility_strategies': 'detail',
+}
+
+
+class HtmlArchive:
+    """Gzipped raw HTML of fetched search and detail pages, each distinct page stored once by its SHA-256"""
+
+    # objects/ab/abcdef....html.gz holds the HTML, index.sqlite says which URL was fetched
+    # when and as what. A page identical to one already archived only adds an index row,
+    # so re-crawling unchanged hotels costs next to nothing on disk.
+    def __init__(self, root="html_archive", level=6):
+        self.root = root
+        self.level = level
+        self.pages_added = 0
+        self.objects_added = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self._reported = (0, 0, 0, 0)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite"), timeout=30, check_same_thread=False)
+        # One index row per fetched page; WAL without a sync per commit keeps that cheap, a
+        # crash loses at most the last few rows, never an object
+        self._conn.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                url TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pages_kind ON pages (kind, fetched_at);
+        """)
+
+    def put(self, kind, url, html):
+        # Archive one fetched page, returns its digest
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = object_path(self.root, digest)
+        stored = 0
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            compressed = gzip.compress(data, compresslevel=self.level)
+            # Written under a temporary name first, a reader never sees half an object
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(compressed)
+            os.replace(tmp_path, path)
+            stored = len(compressed)
+        with self._lock:
+            self._conn.execute("INSERT INTO pages (kind, url, sha256, size, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                               (kind, url, digest, len(data), time.time()))
+            self._conn.commit()
+            self.pages_added += 1
+            self.raw_bytes += len(data)
+            if stored:
+                self.objects_added += 1
+                self.stored_bytes += stored
+        return digest
+
+    def get(self, digest):
+        return read_object(self.root, digest)
+
+    def pages(self, kind, since=None):
+        # Latest snapshot of each page of this kind: per search URL, or per hotel for detail pages
+        sql = "SELECT url, sha256, fetched_at FROM pages WHERE kind = ?"
+        params = [kind]
+        if since is not None:
+            sql += " AND fetched_at >= ?"
+            params.append(since)
+        with self._lock:
+            found = self._conn.execute(sql + " ORDER BY fetched_at", params).fetchall()
+        latest = {}
+        for url, digest, fetched_at in found:
+            key = canonical_url(url) if kind == DETAIL else url
+            latest[key] = {'url': url, 'sha256': digest, 'fetched_at': fetched_at}
+        return list(latest.values())
+
+    def stats(self):
+        return {
+            'pages': self.pages_added,
+            'objects': self.objects_added,
+            'raw_bytes': self.raw_bytes,
+            'stored_bytes': self.stored_bytes,
+        }
+
+    def print_summary(self):
+        # Pages archived since the last summary, so each crawl reports its own
+        with self._lock:
+            current = (self.pages_added, self.objects_added, self.raw_bytes, self.stored_bytes)
+            pages, objects, raw_bytes, stored_bytes = (now - before for now, before in zip(current, self._reported))
+            self._reported = current
+        if pages:
+            print(f"HTML archive: {pages} pages ({pages - objects} already archived), "
+                  f"{raw_bytes / 2 ** 20:.1f} MB of HTML stored as {stored_bytes / 2 ** 20:.1f} MB in {self.root}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def object_path(root, digest):
+    return os.path.join(root, "objects", digest[:2], digest[2:] + ".html.gz")
+
+
+def read_object(root, digest):
+    with open(object_path(root, digest), 'rb') as f:
+        return gzip.decompress(f.read()).decode('utf-8')
+
+
+def load_selectors(path):
+    # Updated selectors from a JSON file, same shapes as the constants in extraction.py
+    with open(path, encoding='utf-8') as f:
+        selectors = json.load(f)
+    unknown = set(selectors) - set(SELECTOR_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown selector keys: {', '.join(sorted(unknown))}")
+    return selectors
+
+
+# Re-extraction worker state, set once per process by _init_worker
+_root = None
+_selectors = {}
+
+
+def _init_worker(root, selectors):
+    global _root, _selectors
+    _root = root
+    _selectors = selectors or {}
+
+
+def _search_cards(page):
+    from crawler.content_extractor import parse_property_cards
+
+    url, digest = page
+    options = {key: value for key, value in _selectors.items() if SELECTOR_KEYS[key] == SEARCH}
+    try:
+        return parse_property_cards(read_object(_root, digest), url, **options)
+    except Exception as e:
+        print(f"Could not re-extract {url}: {str(e)[:100]}")
+        return []
+
+
+def _detail_facilities(page):
+    from crawler.content_extractor import parse_facilities
+
+    url, digest = page
+    options = {key: value for key, value in _selectors.items() if SELECTOR_KEYS[key] == DETAIL}
+    try:
+        return parse_facilities(read_object(_root, digest), **options)
+    except Exception as e:
+        print(f"Could not re-extract {url}: {str(e)[:100]}")
+        return None
+
+
+def search_of(url):
+    # Destination and dates of a search page, from its query string
+    query = parse_qs(urlsplit(url).query)
+    return {key: query.get(param, [''])[0] for key, param in
+            (('destination', 'ss'), ('checkin', 'checkin'), ('checkout', 'checkout'))}
+
+
+def reextract(archive, workers=None, selectors=None, since=None):
+    # Rows of every archived search, parsed again without the network, lxml spread over processes.
+    # Each hotel gets the facilities of its latest archived detail page.
+    from crawler.extraction import clean_cards
+    from crawler.js_handler import build_row
+
+    searches = archive.pages(SEARCH, since)
+    details = archive.pages(DETAIL, since)
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(archive.root, selectors)) as executor:
+        # Both maps are submitted before either is read, so search and detail pages share the workers
+        card_pages = executor.map(_search_cards, [(p['url'], p['sha256']) for p in searches],
+                                  chunksize=max(1, len(searches) // (workers * 4)))
+        facility_lists = executor.map(_detail_facilities, [(p['url'], p['sha256']) for p in details],
+                                      chunksize=max(1, len(details) // (workers * 4)))
+        card_pages = list(card_pages)
+        facilities = {canonical_url(p['url']): found for p, found in zip(details, facility_lists)}
+
+    rows = []
+    seen = set()
+    missing = 0
+    for page, raw_cards in zip(searches, card_pages):
+        search = search_of(page['url'])
+        for card in clean_cards(raw_cards):
+            # The same hotel on two result pages of one search is one row, as in a crawl
+            key = (canonical_url(card['url']), search['destination'], search['checkin'], search['checkout'])
+            if key in seen:
+                continue
+            seen.add(key)
+            found = facilities.get(key[0])
+            if found is None:
+                missing += 1
+            row = dict(search)
+            row.update(build_row(card, {'facilities': found or []}))
+            rows.append(row)
+
+    print(f"Re-extracted {len(searches)} search and {len(details)} detail pages into {len(rows)} hotels "
+          f"with {workers} processes in {time.perf_counter() - start:.1f} s"
+          + (f", {missing} hotels without an archived detail page" if missing else ""))
+    return rows
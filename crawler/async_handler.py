@@ -0,0 +1,461 @@
+from playwright.async_api import async_playwright
+from contextlib import asynccontextmanager
+import asyncio
+
+from crawler.js_handler import JSScraper, HEADERS, FACILITIES_READY_SELECTOR, build_dataframe
+from crawler.archive import SEARCH, DETAIL
+from crawler.memory import RowBuffer
+from crawler.urls import canonical_url, split_destinations
+from crawler.browser_pool import BrowserPool
+from crawler.extraction import (PROPERTY_CARD_SELECTOR, LOAD_MORE_SELECTOR, extract_cards_async,
+                                extract_facilities_async)
+
+
+# Upper bound on parallel detail-page tabs, past this Chromium and the site
+# stop giving us more throughput and start throttling instead
+MAX_CONCURRENCY = 16
+
+
+class PageDone:
+    # Marker from _aiter_cards: every card before offset has been handed out, urls those of this page
+    def __init__(self, offset, seen, urls):
+        self.offset = offset
+        self.seen = seen
+        self.urls = urls
+
+
+class AsyncJSScraper(JSScraper):
+    def __init__(self, headless=True, slow_mo=100, concurrency=4, max_concurrency=MAX_CONCURRENCY, pool=None,
+                 resource_profile="text-only", rate_limiter=None, detail_cache=None, metrics=None, robots=None,
+                 delta=None, memory=None, archive=None):
+        super().__init__(headless=headless, slow_mo=slow_mo, resource_profile=resource_profile,
+                         rate_limiter=rate_limiter, detail_cache=detail_cache, metrics=metrics, robots=robots,
+                         delta=delta, memory=memory, archive=archive)
+        self.concurrency = max(1, min(int(concurrency), max_concurrency))
+        self.pool = pool
+
+    def scrape_hotels(self, destination, checkin, checkout, max_results=20, adults=2, children=0, rooms=1):
+        # Same signature and result schema as JSScraper.scrape_hotels
+        coro = self.scrape_hotels_async(destination, checkin, checkout, max_results, adults, children, rooms)
+        try:
+            if self.pool is not None:
+                return self.pool.run(coro)
+            return asyncio.run(coro)
+        finally:
+            self.print_summary()
+
+    def scrape_batch(self, destinations, checkin, checkout, max_results=20, adults=2, children=0, rooms=1,
+                     pool_size=2):
+        # Scrape several destinations over one warm browser, returns {destination: DataFrame}
+        if self.pool is not None:
+            try:
+                return self.pool.run(self.scrape_batch_async(
+                    destinations, checkin, checkout, max_results, adults, children, rooms
+                ))
+            finally:
+                self.print_summary()
+
+        with BrowserPool(headless=self.headless, slow_mo=self.slow_mo, size=pool_size) as pool:
+            self.pool = pool
+            try:
+                return pool.run(self.scrape_batch_async(
+                    destinations, checkin, checkout, max_results, adults, children, rooms
+                ))
+            finally:
+                self.pool = None
+                self.print_summary()
+
+    def scrape_details(self, cards):
+        # Detail pages only, for cards found elsewhere (static HTML, an earlier search)
+        try:
+            if self.pool is not None:
+                return self.pool.run(self.scrape_details_async(cards))
+            return asyncio.run(self.scrape_details_async(cards))
+        finally:
+            self.print_summary()
+
+    def scrape_cards(self, destination, date_pairs, max_results=20, adults=2, children=0, rooms=1):
+        # Same as JSScraper.scrape_cards, on the pool's browser when there is one
+        coro = self.scrape_cards_async(destination, date_pairs, max_results, adults, children, rooms)
+        try:
+            if self.pool is not None:
+                return self.pool.run(coro)
+            return asyncio.run(coro)
+        finally:
+            self.print_summary()
+
+    async def scrape_cards_async(self, destination, date_pairs, max_results=20, adults=2, children=0, rooms=1):
+        await asyncio.to_thread(lambda: self.rate_limiter)
+        found = {}
+        async with self._browser_context() as context:
+            page = await context.new_page()
+            try:
+                for checkin, checkout in date_pairs:
+                    search = (destination, checkin, checkout, adults, children, rooms)
+                    try:
+                        found[(checkin, checkout)] = [card async for card in self._aiter_cards(page, search,
+                                                                                                max_results)]
+                    except Exception as e:
+                        print(f"Search for {checkin} - {checkout} failed: {str(e)[:100]}")
+                        self.metrics.error('search', e, destination=destination, checkin=checkin, checkout=checkout)
+                        found[(checkin, checkout)] = []
+            finally:
+                await page.close()
+        return found
+
+    async def scrape_details_async(self, cards):
+        await asyncio.to_thread(lambda: self.rate_limiter)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        if self.memory is None:
+            async with self._browser_context() as context:
+                rows = await asyncio.gather(*(
+                    self._scrape_detail(context, card, i, semaphore) for i, card in enumerate(cards)
+                ))
+            return [row for row in rows if row is not None]
+
+        # Memory-bounded: cards are started in turn so the detail context can be replaced between them
+        found = []
+        pending = {}
+        async with self._browser_context() as context:
+            details = await self._detail_context(context)
+            try:
+                for i, card in enumerate(cards):
+                    pending[asyncio.create_task(self._scrape_detail(details, card, i, semaphore))] = i
+                    if self.memory.due():
+                        found.extend([item async for item in self._drain(pending)])
+                        details = await self._replace_context(context, details)
+                found.extend([item async for item in self._drain(pending)])
+            finally:
+                for task in pending:
+                    task.cancel()
+                await details.close()
+        return [row for _, row in sorted(found, key=lambda item: item[0])]
+
+    async def scrape_batch_async(self, destinations, checkin, checkout, max_results=20, adults=2, children=0,
+                                 rooms=1):
+        # Destinations run side by side, each one holds a pooled context while it is scraped
+        destinations = split_destinations(destinations)
+        frames = await asyncio.gather(*(
+            self.scrape_hotels_async(d, checkin, checkout, max_results, adults, children, rooms)
+            for d in destinations
+        ))
+        return dict(zip(destinations, frames))
+
+    async def scrape_hotels_async(self, destination, checkin, checkout, max_results=20, adults=2, children=0, rooms=1):
+        rows = RowBuffer()
+        ranks = []
+        async for index, row in self._aiter_indexed(destination, checkin, checkout, max_results, adults, children,
+                                                    rooms):
+            rows.append(row)
+            ranks.append(index)
+        # Detail pages finish out of order, keep the search ranking in the frame
+        frame = build_dataframe(rows.to_dict())
+        return frame.iloc[sorted(range(len(ranks)), key=ranks.__getitem__)].reset_index(drop=True)
+
+    def iter_hotels(self, destination, checkin, checkout, max_results=20, adults=2, children=0, rooms=1,
+                    checkpoint=None):
+        # Synchronous view of aiter_hotels, detail tabs keep running in parallel underneath
+        rows = self.aiter_hotels(destination, checkin, checkout, max_results, adults, children, rooms, checkpoint)
+        loop = None
+        if self.pool is not None:
+            run = self.pool.run
+        else:
+            loop = asyncio.new_event_loop()
+            run = loop.run_until_complete
+
+        try:
+            while True:
+                try:
+                    row = run(rows.__anext__())
+                except StopAsyncIteration:
+                    return
+                yield row
+        finally:
+            try:
+                run(rows.aclose())
+            except RuntimeError:
+                # Interrupted mid-step, the generator cannot be closed cleanly
+                pass
+            if loop is not None:
+                leftover = asyncio.all_tasks(loop)
+                for task in leftover:
+                    task.cancel()
+                if leftover:
+                    loop.run_until_complete(asyncio.gather(*leftover, return_exceptions=True))
+                loop.run_until_complete(loop.shutdown_asyncgens())
+                loop.close()
+            self.print_summary()
+
+    async def aiter_hotels(self, destination, checkin, checkout, max_results=20, adults=2, children=0, rooms=1,
+                           checkpoint=None):
+        # Yields result rows as detail pages complete, while later result pages are still loading
+        async for _, row in self._aiter_indexed(destination, checkin, checkout, max_results, adults, children, rooms,
+                                                checkpoint):
+            yield row
+
+    async def _aiter_indexed(self, destination, checkin, checkout, max_results, adults, children, rooms,
+                             checkpoint=None):
+        search = (destination, checkin, checkout, adults, children, rooms)
+        # Resolve the shared limiter up front, seeding it may fetch robots.txt
+        await asyncio.to_thread(lambda: self.rate_limiter)
+
+        async with self._browser_context() as context:
+            async for item in self._aiter_search(context, search, max_results, checkpoint):
+                yield item
+
+    @asynccontextmanager
+    async def _browser_context(self):
+        # A warm context from the pool, or a browser launched just for this call
+        if self.pool is not None:
+            async with self.pool.context() as context:
+                yield context
+            return
+
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=self.headless, slow_mo=self.slow_mo)
+            context = await browser.new_context(extra_http_headers=HEADERS)
+            try:
+                yield context
+            finally:
+                await context.close()
+                await browser.close()
+
+    async def _detail_context(self, context):
+        # With a memory budget detail tabs run in a context of their own, so it can be replaced mid-search
+        if self.memory is None:
+            return context
+        return await context.browser.new_context(extra_http_headers=HEADERS)
+
+    async def _replace_context(self, context, details):
+        await details.close()
+        self.memory.recycled()
+        self.metrics.count('context_recycles')
+        return await self._detail_context(context)
+
+    async def _drain(self, pending):
+        # Every pending detail task as (index, row) in completion order
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = pending.pop(task)
+                if task.result() is not None:
+                    yield index, task.result()
+
+    async def _aiter_search(self, context, search, max_results, checkpoint=None):
+        page = await context.new_page()
+        details = await self._detail_context(context)
+        # Visit detail pages in parallel, at most self.concurrency tabs at once
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # Detail task -> position of its card in the search results
+        pending = {}
+
+        try:
+            # Position of the next hotel, the PageDone markers between pages are not hotels
+            position = 0
+            async for card in self._aiter_cards(page, search, max_results, checkpoint):
+                if isinstance(card, PageDone):
+                    # Hand out the whole page before the checkpoint moves past it
+                    async for item in self._drain(pending):
+                        yield item
+                    checkpoint.mark_page(card.offset, card.seen, card.urls)
+                    continue
+
+                task = asyncio.create_task(self._scrape_detail(details, card, position, semaphore))
+                pending[task] = position
+                position += 1
+
+                # Hand over whatever finished while we were paginating
+                for task in [task for task in pending if task.done()]:
+                    index = pending.pop(task)
+                    if task.result() is not None:
+                        yield index, task.result()
+
+                if self.memory is not None and self.memory.due():
+                    # Let the tabs of the old detail context finish, then swap in a fresh one
+                    async for item in self._drain(pending):
+                        yield item
+                    details = await self._replace_context(context, details)
+
+            async for item in self._drain(pending):
+                yield item
+
+        except Exception as e:
+            print(f"Playwright scraping failed: {str(e)}")
+            self.metrics.error('crawl', e, destination=search[0])
+        finally:
+            for task in pending:
+                task.cancel()
+            await page.close()
+            if details is not context:
+                await details.close()
+
+    async def _open_search_page(self, page, url):
+        # The first check of a site may download its robots.txt, keep that off the event loop
+        if not await asyncio.to_thread(self._allowed, url):
+            return False
+        await self.blocker.attach_async(page, url)
+        with self.metrics.span('rate_limit.wait'):
+            await self.rate_limiter.acquire_async(url)
+        with self.metrics.span('search.navigate'):
+            response = await page.goto(url, timeout=60000, wait_until="domcontentloaded")
+        self.rate_limiter.report_response(url, response)
+        self.metrics.count('search_pages')
+
+        # Wait for results to load
+        try:
+            with self.metrics.span('search.wait'):
+                await page.wait_for_selector(PROPERTY_CARD_SELECTOR, timeout=30000)
+        except Exception:
+            self.metrics.count('search_pages_empty')
+            return False
+
+        # Dismiss cookies popup if it is showing, without waiting for it to appear
+        try:
+            accept_button = await page.query_selector('button#onetrust-accept-btn-handler')
+            if accept_button:
+                await accept_button.click(timeout=2000)
+        except:
+            pass
+        return True
+
+    async def _load_more(self, page, count):
+        # Click "Load more results" or scroll to the bottom, then wait for new cards to render
+        try:
+            with self.metrics.span('search.load_more'):
+                button = await page.query_selector(LOAD_MORE_SELECTOR)
+                if button:
+                    await button.click(timeout=5000)
+                else:
+                    await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
+                await page.wait_for_function(
+                    '([selector, count]) => document.querySelectorAll(selector).length > count',
+                    arg=[PROPERTY_CARD_SELECTOR, count], timeout=10000
+                )
+            return True
+        except Exception:
+            return False
+
+    async def _aiter_cards(self, page, search, max_results, checkpoint=None):
+        # Same paging and checkpoint rules as JSScraper._iter_cards
+        seen = set()
+        offset = 0
+        total = 0
+        if checkpoint is not None:
+            offset, total = checkpoint.page_offset, checkpoint.seen
+        if total >= max_results:
+            return
+        if not await self._open_search_page(page, self.build_search_url(*search, offset=offset)):
+            print("No hotels found on the search results page")
+            return
+
+        while True:
+            read = 0
+            new_cards = 0
+            handed_out = []
+            while True:
+                # Read every card not seen yet in one round trip to the browser
+                with self.metrics.span('search.extract'):
+                    count = await page.eval_on_selector_all(PROPERTY_CARD_SELECTOR, 'cards => cards.length')
+                    cards = await extract_cards_async(page, count - read, offset=read)
+                for card in cards:
+                    key = canonical_url(card['url'])
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    new_cards += 1
+                    total += 1
+                    if checkpoint is None or not checkpoint.is_done(card['url']):
+                        handed_out.append(card['url'])
+                        yield card
+                    if total >= max_results:
+                        await self._archive_page(SEARCH, page.url, page)
+                        return
+                read = count
+                if not await self._load_more(page, count):
+                    await self._archive_page(SEARCH, page.url, page)
+                    break
+
+            # Nothing more on this page, move to the next offset
+            if not new_cards:
+                return
+            offset += read
+            if checkpoint is not None:
+                yield PageDone(offset, total, handed_out)
+            if not await self._open_search_page(page, self.build_search_url(*search, offset=offset)):
+                return
+
+    async def _archive_page(self, kind, url, page):
+        if self.archive is None:
+            return
+        try:
+            with self.metrics.span('archive'):
+                html = await page.content()
+                # Hashing and gzip take a few ms per page, kept off the event loop
+                await asyncio.to_thread(self.archive.put, kind, url, html)
+        except Exception as e:
+            print(f"Could not archive {url}: {str(e)[:100]}")
+
+    async def _scrape_detail(self, context, card, index, semaphore):
+        metrics = self.metrics
+        # The delta and detail cache are SQLite and robots may download a robots.txt, all kept off the event loop
+        row = await asyncio.to_thread(self._unchanged_row, card)
+        if row is not None:
+            return row
+
+        if self.detail_cache is not None:
+            detail = await asyncio.to_thread(self.detail_cache.get, card['url'])
+            if detail is not None:
+                metrics.count('detail_cache_hits')
+                return await asyncio.to_thread(self._row, card, detail)
+
+        if not await asyncio.to_thread(self._allowed, card['url']):
+            return None
+
+        async with semaphore:
+            hotel_page = None
+            try:
+                # Inside the try: a crashed or replaced context fails this hotel, not the whole search
+                hotel_page = await context.new_page()
+                # Timed once a tab is free, waiting for the semaphore is not the hotel's fault
+                with metrics.span('detail', hotel=card['name']):
+                    await self.blocker.attach_async(hotel_page, card['url'])
+                    with metrics.span('rate_limit.wait'):
+                        await self.rate_limiter.acquire_async(card['url'])
+                    try:
+                        with metrics.span('detail.navigate'):
+                            response = await hotel_page.goto(card['url'], timeout=60000,
+                                                             wait_until="domcontentloaded")
+                    except Exception:
+                        self.rate_limiter.report_error(card['url'])
+                        raise
+                    self.rate_limiter.report_response(card['url'], response)
+
+                    # Wait until a facilities block has rendered rather than a fixed delay
+                    try:
+                        with metrics.span('detail.wait'):
+                            await hotel_page.wait_for_selector(FACILITIES_READY_SELECTOR, timeout=10000)
+                    except Exception:
+                        print(f"No facilities block rendered for {card['name']}")
+                        metrics.count('facilities_missing')
+
+                    with metrics.span('detail.extract'):
+                        detail = {'facilities': await extract_facilities_async(hotel_page)}
+                    await self._archive_page(DETAIL, card['url'], hotel_page)
+            except Exception as e:
+                print(f"Error processing hotel {index + 1}: {str(e)}")
+                metrics.error('detail', e, hotel=card['name'], url=card['url'])
+                return None
+            finally:
+                if hotel_page is not None:
+                    try:
+                        await hotel_page.close()
+                    except Exception:
+                        pass
+                    if self.memory is not None:
+                        self.memory.page_done()
+
+        metrics.count('hotels')
+
+        if self.detail_cache is not None:
+            await asyncio.to_thread(self.detail_cache.put, card['url'], detail)
+        return await asyncio.to_thread(self._row, card, detail)
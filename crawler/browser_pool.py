@@ -0,0 +1,130 @@
+from playwright.async_api import async_playwright
+from contextlib import asynccontextmanager
+import asyncio
+import threading
+
+from crawler.js_handler import HEADERS
+
+
+class BrowserPool:
+    """Long-lived Chromium instance with a pool of warm browser contexts"""
+
+    # The pool owns its own event loop on a background thread, so synchronous
+    # callers (the GUI, scripts) can keep one browser alive across many scrape
+    # calls instead of paying a cold launch on every call.
+    def __init__(self, headless=True, slow_mo=100, size=2, memory=None):
+        self.headless = headless
+        self.slow_mo = slow_mo
+        self.size = max(1, int(size))
+        # Optional MemoryBudget, the browser is relaunched when it passes max_rss_mb while idle
+        self.memory = memory
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._browser = None
+        self._contexts = None
+        self._relaunch_lock = None
+        # Daemon workers share one pool, only one of them may launch the browser
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._loop is not None:
+                return self
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, daemon=True)
+            thread.start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._launch(), loop).result()
+            except BaseException:
+                loop.call_soon_threadsafe(loop.stop)
+                thread.join(timeout=10)
+                loop.close()
+                raise
+            # Published only once the browser and its contexts exist, so run() never sees a half-started pool
+            self._thread = thread
+            self._loop = loop
+        return self
+
+    def run(self, coro):
+        # Run a coroutine on the pool's loop and block until it finishes
+        loop = self._loop
+        if loop is None:
+            loop = self.start()._loop
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def close(self):
+        with self._start_lock:
+            if self._loop is None:
+                return
+
+            try:
+                self.run(self._shutdown())
+            finally:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=10)
+                self._loop.close()
+                self._loop = None
+                self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @asynccontextmanager
+    async def context(self):
+        # Borrow a warm context, waits while all of them are in use
+        context = await self._contexts.get()
+        try:
+            async with self._relaunch_lock:
+                if not self._browser.is_connected():
+                    print("Browser disconnected, relaunching pool browser")
+                    await self._relaunch()
+                elif self._idle() and self.memory is not None and self.memory.over_limit():
+                    # Nobody else holds a context, so a fresh browser hands back all the memory it grew
+                    print(f"Browser memory over {self.memory.max_rss_mb} MB, relaunching pool browser")
+                    await self._relaunch()
+                    self.memory.recycled()
+            if context.browser is not self._browser:
+                # Context belonged to a browser that has since crashed
+                context = await self._new_context()
+            yield context
+        finally:
+            # Leave the context clean for the next borrower but keep its cookies
+            for page in list(context.pages):
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            self._contexts.put_nowait(context)
+
+    def _idle(self):
+        # Every context but the one being borrowed is back in the queue
+        return self._contexts.qsize() == self.size - 1
+
+    async def _launch(self):
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=self.headless, slow_mo=self.slow_mo)
+        self._contexts = asyncio.Queue()
+        self._relaunch_lock = asyncio.Lock()
+        for _ in range(self.size):
+            self._contexts.put_nowait(await self._new_context())
+
+    async def _relaunch(self):
+        try:
+            await self._browser.close()
+        except Exception:
+            pass
+        self._browser = await self._playwright.chromium.launch(headless=self.headless, slow_mo=self.slow_mo)
+
+    async def _new_context(self):
+        return await self._browser.new_context(extra_http_headers=HEADERS)
+
+    async def _shutdown(self):
+        try:
+            await self._browser.close()
+        finally:
+            await self._playwright.stop()
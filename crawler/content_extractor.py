@@ -1,63 +1,185 @@
-
-from bs4 import BeautifulSoup
-import requests
-import pandas as pd
-import time
-import random
-
-
-class BookingScraper:
-    def __init__(self):
-        try:
-            from fake_useragent import UserAgent
-            ua = UserAgent()
-            user_agent = ua.random
-        except:
-            user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-
-        self.headers = {
-            'User-Agent': user_agent,
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Referer': 'https://www.google.com/'
-        }
-
-    def scrape_search_results(self, query, pages=1):
-        base_url = "https://www.booking.com/searchresults.en-us.html"
-        all_hotels = []
-
-        for page in range(pages):
-            params = {
-                'ss': query,
-                'offset': page * 25,
-                'checkin': '2025-12-01',
-                'checkout': '2026-12-02',
-                'group_adults': 1
-            }
-
-            try:
-                response = requests.get(base_url, params=params, headers=self.headers, timeout=10)
-                soup = BeautifulSoup(response.text, 'lxml')
-                with open("debug_html.html", "w", encoding="utf-8") as f:
-                    f.write(soup.prettify())
-                hotels = soup.find_all('div', {'data-testid': 'property-card'})
-
-                for hotel in hotels:
-                    try:
-                        data = {
-                            'name': hotel.find('div', {'data-testid': 'title'}).text.strip(),
-                            'price': hotel.find('span', {'data-testid': 'price-and-discounted-price'}).text.strip(),
-                            'score': hotel.find('div', {'data-testid': 'review-score'}).text.strip(),
-                            'location': hotel.find('span', {'data-testid': 'address'}).text.strip()
-                        }
-                        all_hotels.append(data)
-                    except AttributeError:
-                        continue
-
-                time.sleep(random.uniform(3, 7))
-
-            except Exception as e:
-                print(f"Error: {str(e)[:100]}")
-                break
-
-        return pd.DataFrame(all_hotels)
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+import requests
+import pandas as pd
+
+from crawler.archive import SEARCH, DETAIL
+from crawler.metrics import Metrics
+from crawler.rate_limiter import get_default_limiter
+from crawler.robots_analyzer import RobotsDisallowed, get_default_policy
+from crawler.extraction import PROPERTY_CARD_SELECTOR, CARD_FIELDS, CARD_LINK_SELECTOR, FACILITY_STRATEGIES
+
+
+def _inner_text(element):
+    # Close to the browser's innerText: one line per text node, so "Scored 9.3" and "9.3" stay apart
+    return '\n'.join(t.strip() for t in element.itertext() if t.strip())
+
+
+def parse_property_cards(page_html, base_url="https://www.booking.com/", card_selector=PROPERTY_CARD_SELECTOR,
+                         card_fields=CARD_FIELDS, card_link_selector=CARD_LINK_SELECTOR):
+    # Same card fields as extraction.extract_cards, read from static HTML with lxml.
+    # The selectors can be swapped to re-extract archived pages after a site change.
+    root = lxml_html.fromstring(page_html)
+    root.make_links_absolute(base_url)
+
+    cards = []
+    for card in root.cssselect(card_selector):
+        row = {}
+        for key, selector in card_fields.items():
+            found = card.cssselect(selector)
+            row[key] = _inner_text(found[0]) if found else None
+        links = card.cssselect(card_link_selector)
+        row['url'] = links[0].get('href') if links else None
+        cards.append(row)
+    return cards
+
+
+def parse_facilities(page_html, facility_strategies=FACILITY_STRATEGIES):
+    # Same strategies as extraction.extract_facilities, "closest" must be a tag name here
+    root = lxml_html.fromstring(page_html)
+
+    for strategy in facility_strategies:
+        found = []
+        for item in root.cssselect(strategy['items']):
+            if strategy.get('closest'):
+                tag = strategy['closest']
+                item = item if item.tag == tag else next(item.iterancestors(tag), None)
+                if item is None:
+                    continue
+            for selector in strategy['text']:
+                text_elements = item.cssselect(selector)
+                if text_elements:
+                    text = _inner_text(text_elements[0])
+                    if text:
+                        found.append(text)
+                    break
+        if found:
+            seen = set()
+            return [x for x in found if not (x in seen or seen.add(x))]
+    return []
+
+
+class BookingScraper:
+    def __init__(self, rate_limiter=None, pool_size=8, debug=False, metrics=None, robots=None, archive=None):
+        try:
+            from fake_useragent import UserAgent
+            ua = UserAgent()
+            user_agent = ua.random
+        except:
+            user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+
+        self.headers = {
+            'User-Agent': user_agent,
+            'Accept-Language': 'en-US,en;q=0.9',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Referer': 'https://www.google.com/'
+        }
+        self.base_url = "https://www.booking.com/searchresults.en-us.html"
+        # Write each fetched search page to debug_html.html
+        self.debug = debug
+        # Shared per-host limiter seeded from robots.txt unless one is passed in
+        self._rate_limiter = rate_limiter
+        # Stage timings and counters, shared with the browser scraper by TieredFetcher
+        self.metrics = metrics if metrics is not None else Metrics()
+        # RobotsPolicy checked before every request, the shared on-disk cache unless one is passed in
+        self._robots = robots
+        # Optional HtmlArchive, every fetched page is kept compressed for re-extraction
+        self.archive = archive
+
+        # Keep-alive connections reused across search and detail requests
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @property
+    def rate_limiter(self):
+        if self._rate_limiter is None:
+            self._rate_limiter = get_default_limiter()
+        return self._rate_limiter
+
+    @property
+    def robots(self):
+        if self._robots is None:
+            self._robots = get_default_policy()
+        return self._robots
+
+    @robots.setter
+    def robots(self, policy):
+        self._robots = policy
+
+    def fetch(self, url, params=None):
+        # robots.txt is checked against the full URL, query string included
+        full_url = requests.Request('GET', url, params=params).prepare().url
+        rule = self.robots.check(full_url)
+        if rule is not None:
+            self.metrics.count('robots_skipped')
+            self.metrics.event('robots_skipped', url=full_url, rule=rule)
+            raise RobotsDisallowed(full_url, rule)
+        with self.metrics.span('rate_limit.wait'):
+            self.rate_limiter.acquire(url)
+        try:
+            response = self.session.get(url, params=params, timeout=10)
+        except Exception:
+            self.rate_limiter.report_error(url)
+            raise
+        self.rate_limiter.report_response(url, response)
+        response.raise_for_status()
+        return response
+
+    def fetch_search_cards(self, query, checkin, checkout, offset=0, adults=2, children=0, rooms=1):
+        params = {
+            'ss': query,
+            'offset': offset,
+            'checkin': checkin,
+            'checkout': checkout,
+            'group_adults': adults,
+            'group_children': children,
+            'no_rooms': rooms
+        }
+        with self.metrics.span('static.search'):
+            response = self.fetch(self.base_url, params=params)
+        if self.debug:
+            with open("debug_html.html", "w", encoding="utf-8") as f:
+                f.write(response.text)
+        self._archive(SEARCH, response.url, response.text)
+        with self.metrics.span('static.search_extract'):
+            return parse_property_cards(response.text, response.url)
+
+    def fetch_facilities(self, hotel_url):
+        with self.metrics.span('static.detail'):
+            response = self.fetch(hotel_url)
+        self._archive(DETAIL, hotel_url, response.text)
+        with self.metrics.span('static.detail_extract'):
+            return parse_facilities(response.text)
+
+    def _archive(self, kind, url, html):
+        if self.archive is None:
+            return
+        try:
+            with self.metrics.span('archive'):
+                self.archive.put(kind, url, html)
+        except Exception as e:
+            print(f"Could not archive {url}: {str(e)[:100]}")
+
+    def close(self):
+        self.session.close()
+
+    def scrape_search_results(self, query, pages=1, checkin='2025-12-01', checkout='2026-12-02', adults=1):
+        all_hotels = []
+
+        for page in range(pages):
+            try:
+                cards = self.fetch_search_cards(query, checkin, checkout, offset=page * 25, adults=adults)
+                for card in cards:
+                    # Only keep cards that have every column, like before
+                    if all(card[key] for key in ('name', 'price', 'score', 'location')):
+                        all_hotels.append({key: card[key].strip() for key in ('name', 'price', 'score', 'location')})
+
+            except Exception as e:
+                print(f"Error: {str(e)[:100]}")
+                self.metrics.error('static.search', e, destination=query, page=page)
+                break
+
+        return pd.DataFrame(all_hotels)
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from crawler.extraction import CARD_FIELDS
+from crawler.urls import canonical_url
+
+
+MAX_AGE = 30 * 24 * 3600        # an unchanged hotel still gets its detail page revisited after a month
+
+
+def card_fingerprint(card):
+    # Hash of every search-card field but the link, whose query string changes with every search
+    text = json.dumps([(card.get(key) or '').strip() for key in CARD_FIELDS])
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class DeltaState:
+    """Card fingerprint and output row of every hotel from earlier crawls, keyed by canonical hotel URL"""
+
+    # A hotel whose search card is identical to last time gets its previous row back
+    # instead of a detail-page visit; new and changed hotels are scraped as usual.
+    def __init__(self, path="crawl_state.sqlite", max_age=MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.skipped = 0
+        self.changed = 0
+        self.new = 0
+        self.expired = 0
+        self._reported = (0, 0, 0, 0)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cards (
+                url TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                row TEXT NOT NULL,
+                scraped_at REAL NOT NULL
+            );
+        """)
+
+    def unchanged(self, card):
+        # Previous row when the card matches the last crawl's, None for a new, changed or too old hotel
+        key = canonical_url(card['url'])
+        with self._lock:
+            found = self._conn.execute("SELECT fingerprint, row, scraped_at FROM cards WHERE url = ?",
+                                       (key,)).fetchone()
+            if found is None:
+                self.new += 1
+                return None
+            if found[0] != card_fingerprint(card):
+                self.changed += 1
+                return None
+            if time.time() - found[2] > self.max_age:
+                self.expired += 1
+                return None
+            self.skipped += 1
+        return json.loads(found[1])
+
+    def record(self, card, row):
+        # Remember what this card produced for the next crawl
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cards (url, fingerprint, row, scraped_at) VALUES (?, ?, ?, ?)",
+                (canonical_url(card['url']), card_fingerprint(card), json.dumps(row), time.time())
+            )
+            self._conn.commit()
+
+    def skip_ratio(self):
+        seen = self.skipped + self.changed + self.new + self.expired
+        return self.skipped / seen if seen else 0.0
+
+    def stats(self):
+        return {
+            'skipped': self.skipped,
+            'changed': self.changed,
+            'new': self.new,
+            'expired': self.expired,
+            'skip_ratio': self.skip_ratio(),
+        }
+
+    def print_summary(self):
+        # Hotels looked up since the last summary, so each crawl reports its own skip ratio
+        with self._lock:
+            current = (self.skipped, self.changed, self.new, self.expired)
+            skipped, changed, new, expired = (now - before for now, before in zip(current, self._reported))
+            self._reported = current
+        seen = skipped + changed + new + expired
+        if seen:
+            print(f"Delta crawl: {skipped} of {seen} hotels unchanged, {skipped / seen:.0%} of detail pages "
+                  f"skipped ({changed} changed, {new} new, {expired} due for a refresh)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,96 @@
+import json
+import sqlite3
+import threading
+import time
+
+from crawler.urls import canonical_url
+
+
+DEFAULT_TTL = 7 * 24 * 3600     # facilities and rating breakdowns rarely change within a week
+DEFAULT_MAX_ENTRIES = 50000
+EVICT_EVERY = 100               # puts between eviction passes
+
+
+class DetailCache:
+    """SQLite cache of hotel detail-page data keyed by canonical hotel URL"""
+
+    def __init__(self, path="detail_cache.sqlite", ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS details (
+                url TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS details_accessed ON details (accessed_at);
+        """)
+
+    def get(self, url):
+        # Detail dict for a fresh entry, None on a miss or an expired entry
+        key = canonical_url(url)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT data, fetched_at FROM details WHERE url = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if now - row[1] > self.ttl:
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE details SET accessed_at = ? WHERE url = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, url, data):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO details (url, data, fetched_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (canonical_url(url), json.dumps(data), now, now)
+            )
+            self._puts += 1
+            if self._puts % EVICT_EVERY == 0:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Drop expired entries, then least recently used ones beyond max_entries
+        self._conn.execute("DELETE FROM details WHERE fetched_at < ?", (time.time() - self.ttl,))
+        count = self._conn.execute("SELECT COUNT(*) FROM details").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM details WHERE url IN (SELECT url FROM details ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'hit_rate': self.hit_rate(),
+        }
+
+    def print_summary(self):
+        if self.hits + self.misses:
+            print(f"Detail cache: {self.hits} hits, {self.misses} misses ({self.expired} expired), "
+                  f"hit rate {self.hit_rate():.0%}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,121 @@
+# Bulk DOM extraction: every card on a search page, and every facility on a
+# detail page, comes back from a single page.evaluate call instead of one
+# browser round trip per field.
+
+PROPERTY_CARD_SELECTOR = 'div[data-testid="property-card"]'
+
+# Newer result pages append cards in place instead of linking to the next offset
+LOAD_MORE_SELECTOR = 'button:has-text("Load more results")'
+
+# Search card column -> selector inside the card, read with innerText
+CARD_FIELDS = {
+    'name': 'div[data-testid="title"]',
+    'price': 'span[data-testid="price-and-discounted-price"]',
+    'score': 'div[data-testid="review-score"]',
+    'location': 'span[data-testid="address"]',
+    'distance_from_center': 'span[data-testid="distance"]',
+}
+CARD_LINK_SELECTOR = 'a'
+
+# Tried in order, the first strategy that yields any text wins.
+# "closest" climbs from each matched item to an ancestor before looking for the text.
+FACILITY_STRATEGIES = [
+    {
+        'name': 'property highlights',
+        'items': 'li[role="listitem"].c5ae8a7f67',
+        'text': ['div.b99b6ef58f.b2b0196c65'],
+    },
+    {
+        'name': 'popular facilities',
+        'items': 'li.b0bf4dc58f.b2f588b43c',
+        'text': ['span.f6b6d2a959', 'div.b99b6ef58f'],
+    },
+    {
+        'name': 'facility icons',
+        'items': '[data-testid="facility-icon"]',
+        'closest': 'li',
+        'text': ['div.b99b6ef58f'],
+    },
+]
+
+EXTRACT_CARDS_JS = """
+([cardSelector, fields, linkSelector, offset, limit]) => {
+    const all = Array.from(document.querySelectorAll(cardSelector));
+    const cards = all.slice(offset, limit === null ? undefined : offset + limit);
+    return cards.map((card) => {
+        const row = {};
+        for (const [key, selector] of Object.entries(fields)) {
+            const el = card.querySelector(selector);
+            row[key] = el ? el.innerText : null;
+        }
+        const link = card.querySelector(linkSelector);
+        row.url = link ? link.href : null;
+        return row;
+    });
+}
+"""
+
+EXTRACT_FACILITIES_JS = """
+(strategies) => {
+    for (const strategy of strategies) {
+        const found = [];
+        for (let item of document.querySelectorAll(strategy.items)) {
+            if (strategy.closest) {
+                item = item.closest(strategy.closest);
+                if (!item) continue;
+            }
+            for (const selector of strategy.text) {
+                const el = item.querySelector(selector);
+                if (el) {
+                    const text = el.innerText.trim();
+                    if (text) found.push(text);
+                    break;
+                }
+            }
+        }
+        if (found.length) return {strategy: strategy.name, items: found};
+    }
+    return {strategy: null, items: []};
+}
+"""
+
+
+def clean_cards(raw_cards, offset=0):
+    cards = []
+    for i, raw in enumerate(raw_cards, start=offset):
+        # A card without a title or link cannot be followed up, skip it like before
+        if not raw.get('name') or not raw.get('url'):
+            print(f"Error processing hotel {i + 1}: missing title or link")
+            continue
+
+        card = {key: (raw.get(key) or "N/A").strip() for key in CARD_FIELDS}
+        card['url'] = raw['url']
+        cards.append(card)
+    return cards
+
+
+def _clean_facilities(raw):
+    # Deduplicate while keeping page order
+    seen = set()
+    return [x for x in raw['items'] if x and not (x in seen or seen.add(x))]
+
+
+def extract_cards(page, limit=None, offset=0):
+    # Cards offset .. offset + limit in page order, limit=None reads to the end
+    return clean_cards(page.evaluate(
+        EXTRACT_CARDS_JS, [PROPERTY_CARD_SELECTOR, CARD_FIELDS, CARD_LINK_SELECTOR, offset, limit]
+    ), offset)
+
+
+async def extract_cards_async(page, limit=None, offset=0):
+    return clean_cards(await page.evaluate(
+        EXTRACT_CARDS_JS, [PROPERTY_CARD_SELECTOR, CARD_FIELDS, CARD_LINK_SELECTOR, offset, limit]
+    ), offset)
+
+
+def extract_facilities(page):
+    return _clean_facilities(page.evaluate(EXTRACT_FACILITIES_JS, FACILITY_STRATEGIES))
+
+
+async def extract_facilities_async(page):
+    return _clean_facilities(await page.evaluate(EXTRACT_FACILITIES_JS, FACILITY_STRATEGIES))
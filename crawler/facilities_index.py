@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+
+# Placeholders the scrapers and dashboard write when a hotel has no facilities
+EMPTY_VALUES = {'', 'nan', 'No facilities listed', 'No data available'}
+
+# Set bits per byte value, for counting hotels in a packed bitset
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class FacilitiesIndex:
+    """Facility vocabulary plus one packed bitset of hotels per facility"""
+
+    # bits[f] has bit i set when hotel i (by position) lists vocabulary[f]
+    def __init__(self, vocabulary, bits, n_hotels):
+        self.vocabulary = list(vocabulary)
+        self.bits = bits
+        self.n_hotels = n_hotels
+        self.positions = {name: i for i, name in enumerate(self.vocabulary)}
+
+    @classmethod
+    def from_series(cls, facilities, separator=r',\s*'):
+        # facilities holds one comma-joined string (or a list) per hotel
+        facilities = pd.Series(facilities).reset_index(drop=True)
+        if facilities.map(lambda v: isinstance(v, list)).any():
+            exploded = facilities.explode()
+        else:
+            exploded = facilities.fillna('').astype(str).str.split(separator).explode()
+        exploded = exploded.dropna().astype(str).str.strip()
+        exploded = exploded[~exploded.isin(EMPTY_VALUES)]
+
+        # Vocabulary ordered by how many hotels list each facility
+        names = exploded.value_counts().index
+        codes = pd.Index(names).get_indexer(exploded)
+        # Bits set straight into the packed rows, in np.packbits order (hotel 0 is the high bit of byte 0),
+        # without a bool matrix of every facility by every hotel first
+        hotels = exploded.index.to_numpy()
+        bits = np.zeros((len(names), (len(facilities) + 7) // 8), dtype=np.uint8)
+        np.bitwise_or.at(bits, (codes, hotels >> 3), (0x80 >> (hotels & 7)).astype(np.uint8))
+        return cls(names, bits, len(facilities))
+
+    def _pack(self, mask):
+        return np.packbits(np.asarray(mask, dtype=bool))
+
+    def _unpack(self, bits):
+        return np.unpackbits(bits, count=self.n_hotels).astype(bool)
+
+    def has(self, facility):
+        i = self.positions.get(facility)
+        if i is None:
+            return np.zeros(self.n_hotels, dtype=bool)
+        return self._unpack(self.bits[i])
+
+    def mask(self, required, within=None):
+        # Hotels listing every facility in required, optionally only among a boolean mask
+        bits = self._pack(within) if within is not None else np.full(self.bits.shape[1], 0xFF, np.uint8)
+        for facility in required:
+            i = self.positions.get(facility)
+            if i is None:
+                return np.zeros(self.n_hotels, dtype=bool)
+            bits = bits & self.bits[i]
+        return self._unpack(bits)
+
+    def counts(self, within=None):
+        # Hotels per facility, over all hotels or the ones selected by a boolean mask
+        bits = self.bits if within is None else self.bits & self._pack(within)
+        return pd.Series(POPCOUNT[bits].sum(axis=1, dtype=np.int64), index=self.vocabulary, name='hotels')
+
+    def top(self, n=10, within=None):
+        counts = self.counts(within)
+        counts = counts[counts > 0]
+        return counts.sort_values(ascending=False, kind='stable').head(n)
+
+    def __len__(self):
+        return len(self.vocabulary)
@@ -0,0 +1,284 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from crawler.content_extractor import BookingScraper
+from crawler.extraction import clean_cards
+from crawler.js_handler import JSScraper, build_dataframe, build_row
+from crawler.robots_analyzer import RobotsDisallowed
+from crawler.urls import canonical_url, split_destinations
+
+
+RESULTS_PER_PAGE = 25
+TIERS = ('static search', 'static detail', 'browser search', 'browser detail')
+# _static_detail result for a page robots.txt disallows, neither a row nor a reason to escalate
+SKIPPED = object()
+
+
+class TierStats:
+    def __init__(self):
+        self.attempts = 0
+        self.successes = 0
+        self.seconds = 0.0
+        # Static detail pages are recorded from the worker threads
+        self._lock = threading.Lock()
+
+    def record(self, ok, seconds):
+        with self._lock:
+            self.attempts += 1
+            self.successes += int(bool(ok))
+            self.seconds += seconds
+
+    def as_dict(self):
+        with self._lock:
+            attempts, successes, seconds = self.attempts, self.successes, self.seconds
+        return {
+            'attempts': attempts,
+            'success_rate': successes / attempts if attempts else 0.0,
+            'mean_latency_ms': seconds * 1000 / attempts if attempts else 0.0,
+        }
+
+
+class TieredFetcher:
+    """Static requests + lxml first, headless browser only where static HTML falls short"""
+
+    def __init__(self, static=None, browser=None, detail_cache=None, required_fields=('name', 'price', 'url'),
+                 min_usable=0.8, workers=4, delta=None):
+        self.browser = browser or JSScraper(detail_cache=detail_cache)
+        self.metrics = self.browser.metrics
+        self.robots = self.browser.robots
+        self.static = static or BookingScraper(rate_limiter=self.browser.rate_limiter, pool_size=workers)
+        # A static scraper passed in keeps its own rate limiter, but reports into the same metrics
+        # and follows the same robots policy and archive as the browser tier
+        self.static.metrics = self.metrics
+        self.static.robots = self.robots
+        self.static.archive = self.browser.archive
+        self.detail_cache = detail_cache if detail_cache is not None else self.browser.detail_cache
+        self.delta = delta if delta is not None else self.browser.delta
+        # A static search page counts when this share of its cards has every required field
+        self.required_fields = required_fields
+        self.min_usable = min_usable
+        self.workers = workers
+        self.stats = {tier: TierStats() for tier in TIERS}
+
+    def scrape_hotels(self, destination, checkin, checkout, max_results=20, adults=2, children=0, rooms=1):
+        search = (destination, checkin, checkout, adults, children, rooms)
+        rows = self._scrape_static(search, max_results)
+        if rows is None:
+            frame = self._scrape_browser([destination], search, max_results)[destination]
+        else:
+            frame = build_dataframe(rows)
+        self.print_summary()
+        return frame
+
+    def scrape_batch(self, destinations, checkin, checkout, max_results=20, adults=2, children=0, rooms=1):
+        # Static tier per destination, every destination it cannot serve goes to the browser in one batch
+        destinations = split_destinations(destinations)
+        frames = {}
+        escalate = []
+        for destination in destinations:
+            rows = self._scrape_static((destination, checkin, checkout, adults, children, rooms), max_results)
+            if rows is None:
+                escalate.append(destination)
+            else:
+                frames[destination] = build_dataframe(rows)
+
+        if escalate:
+            frames.update(self._scrape_browser(escalate, (None, checkin, checkout, adults, children, rooms),
+                                               max_results))
+        self.print_summary()
+        return {d: frames[d] for d in destinations}
+
+    def scrape_cards(self, destination, date_pairs, max_results=20, adults=2, children=0, rooms=1):
+        # Search cards per date pair from static pages, the pairs static HTML cannot serve go to the browser together
+        found = {}
+        escalate = []
+        for checkin, checkout in date_pairs:
+            cards = self._static_cards((destination, checkin, checkout, adults, children, rooms), max_results)
+            if cards is None:
+                escalate.append((checkin, checkout))
+            else:
+                found[(checkin, checkout)] = cards
+        if escalate:
+            found.update(self.browser.scrape_cards(destination, escalate, max_results, adults, children, rooms))
+        return {(checkin, checkout): found[(checkin, checkout)] for checkin, checkout in date_pairs}
+
+    def scrape_details(self, cards):
+        # Detail pages only, static first with the browser for the ones that need JavaScript
+        rows = list(self._iter_static(cards))
+        self.print_summary()
+        return rows
+
+    def _scrape_browser(self, destinations, search, max_results):
+        _, checkin, checkout, adults, children, rooms = search
+        start = time.perf_counter()
+        frames = self.browser.scrape_batch(destinations, checkin, checkout, max_results, adults, children, rooms)
+        elapsed = (time.perf_counter() - start) / len(destinations)
+        for frame in frames.values():
+            self.stats['browser search'].record(frame is not None and not frame.empty, elapsed)
+        return frames
+
+    def _static_cards(self, search, max_results, offset=0, pages=None):
+        # Cards from static result pages starting at offset, None when the first page lacks usable cards.
+        # pages, when given, gets (next offset, cards so far, urls) of every result page used in full.
+        destination, checkin, checkout, adults, children, rooms = search
+        cards = []
+        seen = set()
+
+        while len(cards) < max_results:
+            start = time.perf_counter()
+            try:
+                page_cards = self.static.fetch_search_cards(destination, checkin, checkout, offset,
+                                                            adults, children, rooms)
+            except RobotsDisallowed as e:
+                # The browser would be turned away too, so this is the end of the search
+                print(f"Static search stopped for {destination}: {e}")
+                break
+            except Exception as e:
+                print(f"Static search failed for {destination}: {str(e)[:100]}")
+                self.metrics.error('static.search', e, destination=destination, offset=offset)
+                page_cards = []
+
+            usable = [c for c in page_cards if all(c.get(field) for field in self.required_fields)]
+            ok = bool(page_cards) and len(usable) >= self.min_usable * len(page_cards)
+            self.stats['static search'].record(ok, time.perf_counter() - start)
+            if not ok:
+                if not cards:
+                    print(f"Static HTML lacks usable cards for {destination}, escalating to browser")
+                    self.metrics.count('escalations', stage='search')
+                    return None
+                break
+
+            before = len(cards)
+            for card in clean_cards(usable, offset):
+                key = canonical_url(card['url'])
+                if key not in seen:
+                    seen.add(key)
+                    cards.append(card)
+            if pages is not None and before < len(cards) <= max_results:
+                pages.append((offset + len(page_cards), len(cards), [card['url'] for card in cards[before:]]))
+
+            # A short page or one with nothing new is the last one
+            if len(page_cards) < RESULTS_PER_PAGE or len(cards) == before:
+                break
+            offset += len(page_cards)
+
+        return cards[:max_results]
+
+    def _row(self, card, detail):
+        row = build_row(card, detail)
+        if self.delta is not None:
+            self.delta.record(card, row)
+        return row
+
+    def _static_detail(self, card):
+        if self.delta is not None:
+            row = self.delta.unchanged(card)
+            if row is not None:
+                self.metrics.count('delta_skipped')
+                return row
+
+        if self.detail_cache is not None:
+            detail = self.detail_cache.get(card['url'])
+            if detail is not None:
+                self.metrics.count('detail_cache_hits')
+                return self._row(card, detail)
+
+        start = time.perf_counter()
+        try:
+            facilities = self.static.fetch_facilities(card['url'])
+        except RobotsDisallowed:
+            return SKIPPED
+        except Exception as e:
+            print(f"Static detail failed for {card['name']}: {str(e)[:100]}")
+            self.metrics.error('static.detail', e, hotel=card['name'], url=card['url'])
+            facilities = []
+        elapsed = time.perf_counter() - start
+        self.stats['static detail'].record(facilities, elapsed)
+        self.metrics.observe('static.hotel', elapsed, hotel=card['name'])
+
+        if not facilities:
+            return None
+        self.metrics.count('hotels')
+        detail = {'facilities': facilities}
+        if self.detail_cache is not None:
+            self.detail_cache.put(card['url'], detail)
+        return self._row(card, detail)
+
+    def _scrape_static(self, search, max_results):
+        cards = self._static_cards(search, max_results)
+        if cards is None:
+            return None
+        return list(self._iter_static(cards))
+
+    def _iter_static(self, cards, checkpoint=None, pages=()):
+        # pages as filled in by _static_cards, each is marked in the checkpoint once its hotels are done
+        pages = list(pages) if checkpoint is not None else []
+        if checkpoint is not None:
+            cards = [card for card in cards if not checkpoint.is_done(card['url'])]
+
+        # Detail pages whose facilities only render with JavaScript go to the browser at the end
+        escalate = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for card, row in zip(cards, executor.map(self._static_detail, cards)):
+                if row is None:
+                    escalate.append(card)
+                elif row is not SKIPPED:
+                    yield row
+                if not escalate:
+                    # The rows yielded so far have been written, a hotel left for the browser holds the pages back
+                    self._mark_pages(checkpoint, pages)
+
+        if escalate:
+            self.metrics.count('escalations', len(escalate), stage='detail')
+            start = time.perf_counter()
+            browser_rows = self.browser.scrape_details(escalate)
+            elapsed = (time.perf_counter() - start) / len(escalate)
+            found = {row['url'] for row in browser_rows}
+            for card in escalate:
+                self.stats['browser detail'].record(card['url'] in found, elapsed)
+            yield from browser_rows
+        self._mark_pages(checkpoint, pages)
+
+    def _mark_pages(self, checkpoint, pages):
+        # Result pages in order, up to the first with a hotel that is not done yet
+        while pages and all(checkpoint.is_done(url) for url in pages[0][2]):
+            checkpoint.mark_page(*pages.pop(0))
+
+    def iter_hotels(self, destination, checkin, checkout, max_results=20, adults=2, children=0, rooms=1,
+                    checkpoint=None):
+        # Streaming version of scrape_hotels, same checkpoint handling as JSScraper.iter_hotels
+        search = (destination, checkin, checkout, adults, children, rooms)
+        try:
+            # A checkpoint's first unfinished result page, e.g. the start of a sharding.Shard
+            offset, seen = (checkpoint.page_offset, checkpoint.seen) if checkpoint is not None else (0, 0)
+            pages = []
+            cards = self._static_cards(search, max_results - seen, offset, pages)
+            if cards is None:
+                start = time.perf_counter()
+                count = 0
+                for row in self.browser.iter_hotels(destination, checkin, checkout, max_results, adults, children,
+                                                    rooms, checkpoint=checkpoint):
+                    count += 1
+                    yield row
+                self.stats['browser search'].record(count, time.perf_counter() - start)
+            else:
+                pages = [(next_offset, seen + count, urls) for next_offset, count, urls in pages]
+                yield from self._iter_static(cards, checkpoint, pages)
+        finally:
+            self.print_summary()
+
+    def summary(self):
+        return {tier: stats.as_dict() for tier, stats in self.stats.items()}
+
+    def print_summary(self):
+        for tier, stats in self.summary().items():
+            if stats['attempts']:
+                print(f"{tier:>14}: {stats['attempts']} requests, {stats['success_rate']:.0%} ok, "
+                      f"{stats['mean_latency_ms']:.0f} ms mean")
+        self.robots.print_summary()
+        if self.delta is not None:
+            self.delta.print_summary()
+        if self.static.archive is not None:
+            self.static.archive.print_summary()
+        self.metrics.print_summary()
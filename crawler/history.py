@@ -0,0 +1,204 @@
+import glob
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+
+from crawler.normalize import normalize_frame
+from crawler.store import read_crawl_csv
+from crawler.urls import canonical_url
+
+
+CSV_PATTERN = "hotels_data_*.csv"
+
+
+class PriceHistory:
+    """SQLite time series of every hotel's price and score, one point per hotel, crawl day and stay"""
+
+    def __init__(self, path="price_history.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # Histories from before stays were recorded keep their points under an empty stay
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(observations)")]
+        migrate = bool(columns) and 'checkin' not in columns
+        if migrate:
+            self._conn.execute("ALTER TABLE observations RENAME TO observations_by_day")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS hotels (
+                hotel_id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                name TEXT,
+                destination TEXT
+            );
+            CREATE INDEX IF NOT EXISTS hotels_destination ON hotels (destination);
+            CREATE TABLE IF NOT EXISTS observations (
+                hotel_id INTEGER NOT NULL,
+                crawl_date TEXT NOT NULL,
+                checkin TEXT NOT NULL DEFAULT '',
+                checkout TEXT NOT NULL DEFAULT '',
+                price REAL,
+                currency TEXT,
+                score REAL,
+                review_count INTEGER,
+                PRIMARY KEY (hotel_id, crawl_date, checkin, checkout)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS ingested (
+                source TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                rows INTEGER NOT NULL,
+                ingested_at REAL NOT NULL
+            );
+        """)
+        if migrate:
+            self._conn.executescript("""
+                INSERT INTO observations (hotel_id, crawl_date, price, currency, score, review_count)
+                SELECT hotel_id, crawl_date, price, currency, score, review_count FROM observations_by_day;
+                DROP TABLE observations_by_day;
+            """)
+
+    def is_ingested(self, path):
+        # Unchanged size and mtime means the file was already added
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns FROM ingested WHERE source = ?",
+                                     (os.path.abspath(path),)).fetchone()
+        return row is not None and row == (stat.st_size, stat.st_mtime_ns)
+
+    def ingest_frame(self, df, destination, crawl_date=None, checkin=None, checkout=None):
+        # Rows of one crawl, a hotel seen twice in that search keeps the last row
+        crawl_date = crawl_date or date.today()
+        if isinstance(crawl_date, date):
+            crawl_date = crawl_date.isoformat()
+        stay = tuple('' if day is None else str(day) for day in (checkin, checkout))
+        if df.empty or 'url' not in df.columns:
+            return 0
+
+        df = normalize_frame(df[df['url'].notna()])
+        df['canonical'] = df['url'].map(canonical_url)
+        df = df.drop_duplicates('canonical', keep='last')
+        for column in ('name', 'price_numeric', 'currency', 'score_clean', 'review_count'):
+            if column not in df.columns:
+                df[column] = None
+        df = df.astype(object).where(df.notna(), None)
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO hotels (url, name, destination) VALUES (?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET name = excluded.name, destination = excluded.destination",
+                [(url, name, destination) for url, name in zip(df['canonical'], df['name'])]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO observations "
+                "(hotel_id, crawl_date, checkin, checkout, price, currency, score, review_count) "
+                "SELECT hotel_id, ?, ?, ?, ?, ?, ?, ? FROM hotels WHERE url = ?",
+                [(crawl_date, *stay, *values) for values in zip(df['price_numeric'], df['currency'],
+                                                                df['score_clean'], df['review_count'],
+                                                                df['canonical'])]
+            )
+            self._conn.commit()
+        return len(df)
+
+    def ingest_csv(self, path, destination=None, crawl_date=None, checkin=None, checkout=None, force=False):
+        # Adds a crawl file once, re-running over the same files only reads new or changed ones
+        if not force and self.is_ingested(path):
+            return 0
+        stat = os.stat(path)
+        df, destination, crawl_date, checkin, checkout = read_crawl_csv(path, destination, crawl_date,
+                                                                        checkin, checkout)
+        rows = self.ingest_frame(df, destination, crawl_date, checkin, checkout)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ingested (source, size, mtime_ns, rows, ingested_at) VALUES (?, ?, ?, ?, ?)",
+                (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, rows, time.time())
+            )
+            self._conn.commit()
+        return rows
+
+    def ingest_new(self, pattern=CSV_PATTERN):
+        # Number of files added this call
+        added = 0
+        for path in sorted(glob.glob(pattern)):
+            if self.is_ingested(path):
+                continue
+            try:
+                self.ingest_csv(path, force=True)
+                added += 1
+            except Exception as e:
+                print(f"Could not add {path} to the price history: {str(e)[:200]}")
+        return added
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def destinations(self):
+        return self._query("SELECT DISTINCT destination FROM hotels ORDER BY destination")['destination'].tolist()
+
+    def hotels(self, destination):
+        return self._query("SELECT name, url FROM hotels WHERE destination = ? ORDER BY name", (destination,))
+
+    def hotel_series(self, url):
+        return self._query("""
+            SELECT o.crawl_date, o.checkin, o.checkout, o.price, o.currency, o.score, o.review_count
+            FROM observations o JOIN hotels h USING (hotel_id)
+            WHERE h.url = ?
+            ORDER BY o.crawl_date, o.checkin, o.checkout
+        """, (canonical_url(url),))
+
+    def destination_series(self, destination):
+        # One row per crawl day: hotels seen, average price and score over every stay searched that day
+        return self._query("""
+            SELECT o.crawl_date, COUNT(DISTINCT o.hotel_id) AS hotels, AVG(o.price) AS avg_price, MIN(o.price) AS min_price,
+                   AVG(o.score) AS avg_score
+            FROM observations o JOIN hotels h USING (hotel_id)
+            WHERE h.destination = ?
+            GROUP BY o.crawl_date
+            ORDER BY o.crawl_date
+        """, (destination,))
+
+    def price_drops(self, destination=None, min_drop=0.05, limit=20):
+        # Hotels whose latest price for a stay is at least min_drop (a fraction) below the previous
+        # price for the same stay, prices of other dates are never compared
+        return self._query(f"""
+            WITH ranked AS (
+                SELECT hotel_id, crawl_date, checkin, checkout, price, currency,
+                       LAG(price) OVER stay AS previous_price,
+                       LAG(currency) OVER stay AS previous_currency,
+                       ROW_NUMBER() OVER (PARTITION BY hotel_id, checkin, checkout ORDER BY crawl_date DESC) AS newest
+                FROM observations
+                WHERE price IS NOT NULL
+                WINDOW stay AS (PARTITION BY hotel_id, checkin, checkout ORDER BY crawl_date)
+            )
+            SELECT h.name, h.destination, h.url, r.checkin, r.checkout, r.crawl_date, r.previous_price, r.price,
+                   r.currency,
+                   (r.previous_price - r.price) / r.previous_price AS price_drop
+            FROM ranked r JOIN hotels h USING (hotel_id)
+            WHERE r.newest = 1 AND r.previous_price > 0 AND r.currency IS r.previous_currency
+              AND (r.previous_price - r.price) / r.previous_price >= ?
+              {"AND h.destination = ?" if destination else ""}
+            ORDER BY price_drop DESC
+            LIMIT ?
+        """, (min_drop, destination, limit) if destination else (min_drop, limit))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    # python -m crawler.history [pattern], adds crawl files that are not in the history yet
+    import sys
+
+    history = PriceHistory()
+    pattern = sys.argv[1] if len(sys.argv) > 1 else CSV_PATTERN
+    print(f"Added {history.ingest_new(pattern)} new crawl files to {history.path}")
+    history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+import json
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+
+from crawler.urls import split_destinations
+
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+RETRY_DELAY = 60            # seconds before the first retry, doubled on every further attempt
+STALE_AFTER = 600           # a running job whose worker has not checked in for this long is requeued
+POLL_INTERVAL = 2.0
+
+INTERVAL_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class CrawlAborted(Exception):
+    """Raised inside a running job once its daemon is interrupted"""
+
+
+def parse_interval(text):
+    # "30m", "6h", "1d" or plain seconds -> seconds, None stays None
+    if text is None or text == '':
+        return None
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*', str(text))
+    if not match:
+        raise ValueError(f"Bad interval '{text}', expected e.g. 30m, 6h or 1d")
+    return float(match.group(1)) * INTERVAL_UNITS[match.group(2) or 's']
+
+
+def resolve_date(value, today=None):
+    # "2025-12-01" stays as it is, "+7" is seven days after the day the job runs (for recurring jobs)
+    value = str(value).strip()
+    if value.startswith('+'):
+        return ((today or date.today()) + timedelta(days=int(value[1:]))).isoformat()
+    return datetime.strptime(value, '%Y-%m-%d').date().isoformat()
+
+
+def crawl_path(destination, checkin, checkout, adults=2, day=None):
+    # hotels_data_<destination>_<crawl day>_<checkin>-<checkout>_<adults>a.csv: the store and the
+    # dashboard read destination and crawl day from it, and two searches of one destination on
+    # the same day (other dates, a recurring job) never share a file or a checkpoint
+    day = day or datetime.now()
+    search = f"{checkin.replace('-', '')}-{checkout.replace('-', '')}_{adults}a"
+    return f"hotels_data_{destination.replace(',', '').replace(' ', '_')}_{day.strftime('%Y%m%d')}_{search}.csv"
+
+
+class JobQueue:
+    """SQLite queue of crawl jobs shared by the GUI, the command line and any number of daemons"""
+
+    def __init__(self, path="crawl_jobs.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+        # Autocommit, claims run in their own BEGIN IMMEDIATE so two daemons never take the same job
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                destination TEXT NOT NULL,
+                checkin TEXT NOT NULL,
+                checkout TEXT NOT NULL,
+                max_results INTEGER NOT NULL,
+                options TEXT NOT NULL DEFAULT '{}',
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                run_at REAL NOT NULL,
+                repeat_every REAL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                heartbeat_at REAL,
+                worker TEXT,
+                hotels INTEGER NOT NULL DEFAULT 0,
+                output TEXT,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_at);
+        """)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def submit(self, destination, checkin, checkout, max_results=20, run_at=None, repeat_every=None,
+               max_attempts=3, **options):
+        # One job per destination ("Paris, Madrid" -> two jobs), returns their ids
+        ids = []
+        for d in split_destinations(destination):
+            cursor = self._execute(
+                "INSERT INTO jobs (destination, checkin, checkout, max_results, options, status, max_attempts, "
+                "run_at, repeat_every, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (d, str(checkin), str(checkout), int(max_results), json.dumps(options), QUEUED, int(max_attempts),
+                 run_at or time.time(), repeat_every, time.time())
+            )
+            ids.append(cursor.lastrowid)
+        return ids
+
+    def claim(self, worker):
+        # Next job that is due, marked running for this worker; None when nothing is due
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? AND run_at <= ? ORDER BY run_at, id LIMIT 1",
+                    (QUEUED, now)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, worker = ?, started_at = ?, heartbeat_at = ?, "
+                        "attempts = attempts + 1, error = NULL WHERE id = ?",
+                        (RUNNING, worker, now, now, row['id'])
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row['id']) if row is not None else None
+
+    def heartbeat(self, job_ids):
+        if job_ids:
+            marks = ','.join('?' * len(job_ids))
+            self._execute(f"UPDATE jobs SET heartbeat_at = ? WHERE id IN ({marks})", (time.time(), *job_ids))
+
+    def set_output(self, job_id, path):
+        # The file a job writes, kept from its first attempt so retries on later days resume it
+        self._execute("UPDATE jobs SET output = ? WHERE id = ? AND output IS NULL", (path, job_id))
+
+    def progress(self, job_id, hotels):
+        self._execute("UPDATE jobs SET hotels = ?, heartbeat_at = ? WHERE id = ?", (hotels, time.time(), job_id))
+
+    def finish(self, job_id, hotels, output=None):
+        self._execute("UPDATE jobs SET status = ?, hotels = ?, output = ?, finished_at = ? WHERE id = ?",
+                      (DONE, hotels, output, time.time(), job_id))
+        self._schedule_next(job_id)
+
+    def release(self, job_id):
+        # A job interrupted by its own daemon, queued again without using up an attempt
+        self._execute("UPDATE jobs SET status = ?, run_at = ?, attempts = attempts - 1 WHERE id = ? AND status = ?",
+                      (QUEUED, time.time(), job_id, RUNNING))
+
+    def fail(self, job_id, error, retry_delay=RETRY_DELAY):
+        # Back in the queue after an exponential delay until max_attempts is used up
+        job = self.get(job_id)
+        if job['attempts'] < job['max_attempts']:
+            delay = retry_delay * 2 ** (job['attempts'] - 1)
+            self._execute("UPDATE jobs SET status = ?, run_at = ?, error = ? WHERE id = ?",
+                          (QUEUED, time.time() + delay, error, job_id))
+        else:
+            self._execute("UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?",
+                          (FAILED, time.time(), error, job_id))
+            self._schedule_next(job_id)
+
+    def _schedule_next(self, job_id):
+        # A recurring job queues its next run when this one is over, failed or not
+        job = self.get(job_id)
+        if not job['repeat_every']:
+            return
+        run_at = job['run_at'] + job['repeat_every']
+        while run_at <= time.time():
+            run_at += job['repeat_every']
+        self.submit(job['destination'], job['checkin'], job['checkout'], job['max_results'], run_at=run_at,
+                    repeat_every=job['repeat_every'], max_attempts=job['max_attempts'], **job['options'])
+
+    def cancel(self, job_id):
+        # Queued jobs only, a running crawl finishes its current attempt
+        return self._execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                             (CANCELLED, time.time(), job_id, QUEUED)).rowcount > 0
+
+    def retry(self, job_id):
+        # Failed or cancelled job back in the queue with a fresh set of attempts
+        return self._execute(
+            "UPDATE jobs SET status = ?, attempts = 0, run_at = ?, finished_at = NULL WHERE id = ? AND status IN (?, ?)",
+            (QUEUED, time.time(), job_id, FAILED, CANCELLED)
+        ).rowcount > 0
+
+    def requeue_stale(self, stale_after=STALE_AFTER):
+        # Jobs left running by a worker that crashed or was killed; resume picks up their checkpoint
+        return self._execute("UPDATE jobs SET status = ?, run_at = ? WHERE status = ? AND heartbeat_at < ?",
+                             (QUEUED, time.time(), RUNNING, time.time() - stale_after)).rowcount
+
+    def get(self, job_id):
+        row = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['options'] = json.loads(job['options'])
+        return job
+
+    def jobs(self, status=None, limit=50):
+        # Newest first
+        if status:
+            rows = self._execute("SELECT id FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit))
+        else:
+            rows = self._execute("SELECT id FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+        return [self.get(row['id']) for row in rows.fetchall()]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Progress:
+    # Passes rows through and reports the running count to the queue, stops the crawl once aborted is set
+    def __init__(self, scraper, report, aborted):
+        self.scraper = scraper
+        self.report = report
+        self.aborted = aborted
+
+    def iter_hotels(self, *args, **kwargs):
+        count = 0
+        for row in self.scraper.iter_hotels(*args, **kwargs):
+            count += 1
+            self.report(count)
+            yield row
+            if self.aborted.is_set():
+                raise CrawlAborted("Crawl daemon interrupted")
+
+
+class CrawlDaemon:
+    """Takes jobs off a JobQueue and crawls them, at most workers at a time"""
+
+    # Owns what the GUI used to own: a warm browser pool per headless setting, the
+    # detail cache, the Parquet store, the price history and the metrics, plus the
+    # card fingerprints that delta jobs compare against and the HTML archive of archiving
+    # jobs. recycle_after and max_rss_mb bound memory over long runs: detail contexts are
+    # replaced after that many pages or once the crawler and its browsers pass
+    # max_rss_mb, and an idle pool browser over max_rss_mb is relaunched.
+    def __init__(self, queue, workers=2, poll_interval=POLL_INTERVAL, store=None, history=None, detail_cache=None,
+                 metrics=None, delta=None, recycle_after=None, max_rss_mb=None, archive=None):
+        from crawler.metrics import Metrics
+
+        self.queue = queue
+        self.workers = max(1, int(workers))
+        self.poll_interval = poll_interval
+        # The store and history pull in pandas and pyarrow, they are opened when the first job runs.
+        # The detail cache and delta state likewise, the delta only once a delta job asks for it.
+        self._store = store
+        self._history = history
+        self._archive = archive
+        self._detail_cache = detail_cache
+        self._delta = delta
+        self._open_lock = threading.Lock()
+        self.metrics = metrics if metrics is not None else Metrics(log_path="crawl_metrics.jsonl",
+                                                                   prometheus_path="crawl_metrics.prom")
+        self.recycle_after = recycle_after
+        self.max_rss_mb = max_rss_mb
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+        self._running = {}
+        self._stop = threading.Event()
+        # Set on Ctrl-C, running jobs stop after their current hotel
+        self._aborted = threading.Event()
+
+    @property
+    def store(self):
+        from crawler.store import CrawlStore
+
+        with self._open_lock:
+            if self._store is None:
+                self._store = CrawlStore()
+            return self._store
+
+    @property
+    def history(self):
+        from crawler.history import PriceHistory
+
+        with self._open_lock:
+            if self._history is None:
+                self._history = PriceHistory()
+            return self._history
+
+    @property
+    def detail_cache(self):
+        from crawler.detail_cache import DetailCache
+
+        with self._open_lock:
+            if self._detail_cache is None:
+                self._detail_cache = DetailCache()
+            return self._detail_cache
+
+    @property
+    def delta(self):
+        from crawler.delta import DeltaState
+
+        with self._open_lock:
+            if self._delta is None:
+                self._delta = DeltaState()
+            return self._delta
+
+    @property
+    def archive(self):
+        from crawler.archive import HtmlArchive
+
+        with self._open_lock:
+            if self._archive is None:
+                self._archive = HtmlArchive()
+            return self._archive
+
+    def browser_pool(self, headless):
+        from crawler.browser_pool import BrowserPool
+
+        with self._pools_lock:
+            pool = self._pools.get(headless)
+            if pool is None:
+                pool = self._pools[headless] = BrowserPool(headless=headless, size=self.workers,
+                                                           memory=self.memory_budget(None))
+            return pool
+
+    def memory_budget(self, max_pages):
+        # A MemoryBudget when the daemon runs memory-bounded, None otherwise
+        from crawler.memory import MemoryBudget
+
+        if max_pages is None and self.max_rss_mb is None:
+            return None
+        return MemoryBudget(max_pages=max_pages, max_rss_mb=self.max_rss_mb)
+
+    def build_scraper(self, options):
+        from crawler.async_handler import AsyncJSScraper
+        from crawler.fetcher import TieredFetcher
+
+        headless = options.get('headless', True)
+        # Delta jobs visit detail pages only for hotels whose search card changed since the last crawl
+        delta = self.delta if options.get('delta') else None
+        # Archiving jobs keep every fetched page so it can be re-extracted offline
+        archive = self.archive if options.get('archive') else None
+        scraper = AsyncJSScraper(
+            headless=headless,
+            concurrency=options.get('concurrency', 4),
+            pool=self.browser_pool(headless),
+            detail_cache=self.detail_cache,
+            metrics=self.metrics,
+            delta=delta,
+            archive=archive,
+            # Each job has its own budget, so its summary shows its own peak memory
+            memory=self.memory_budget(self.recycle_after)
+        )
+        if options.get('static_first', True):
+            scraper = TieredFetcher(browser=scraper, detail_cache=scraper.detail_cache, delta=delta)
+        return scraper
+
+    def run_job(self, job):
+        from crawler.writer import crawl_to_csv
+
+        options = job['options']
+        try:
+            # A bad date fails the job like any other error instead of leaving it running
+            checkin, checkout = resolve_date(job['checkin']), resolve_date(job['checkout'])
+            # Named on the first attempt, a retry the next day must find the same checkpoint and partial file
+            path = job['output'] or crawl_path(job['destination'], checkin, checkout)
+            self.queue.set_output(job['id'], path)
+            print(f"Job {job['id']}: {job['destination']} {checkin} - {checkout}, attempt {job['attempts']}")
+            scraper = _Progress(self.build_scraper(options), lambda count: self.queue.progress(job['id'], count),
+                                self._aborted)
+            # Retries always resume, the checkpoint keeps the hotels an earlier attempt finished
+            total = crawl_to_csv(scraper, path, job['destination'], checkin, checkout, job['max_results'],
+                                 resume=options.get('resume', True) or job['attempts'] > 1,
+                                 store=self.store, history=self.history)
+        except Exception as e:
+            if self._aborted.is_set():
+                # CrawlAborted, or the browser closed under it: the checkpoint is kept for the next run
+                print(f"Job {job['id']} interrupted, back in the queue")
+                self.queue.release(job['id'])
+            else:
+                print(f"Job {job['id']} failed: {str(e)[:200]}")
+                self.queue.fail(job['id'], f"{type(e).__name__}: {e}")
+        else:
+            if total:
+                self.queue.finish(job['id'], total, path)
+            else:
+                self.queue.fail(job['id'], "No hotels were scraped")
+
+    def run_forever(self, until_done=None):
+        # Poll for due jobs until stop(); with until_done, return once those job ids are finished
+        until_done = set(until_done or ())
+        self.queue.requeue_stale()
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            while not self._stop.is_set():
+                while len(self._running) < self.workers:
+                    job = self.queue.claim(self.name)
+                    if job is None:
+                        break
+                    # Registered before the task starts and released when it ends, however it ends
+                    self._running[job['id']] = job
+                    future = executor.submit(self.run_job, job)
+                    future.add_done_callback(lambda _, job_id=job['id']: self._running.pop(job_id, None))
+
+                if until_done and all(self.queue.get(i)['status'] in FINISHED for i in until_done):
+                    break
+                self._stop.wait(self.poll_interval)
+                self.queue.heartbeat(list(self._running))
+                self.queue.requeue_stale()
+        except BaseException:
+            # Ctrl-C: return right away instead of waiting for the running crawls,
+            # which stop after their current hotel and go back in the queue
+            self.abort()
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+
+    def stop(self):
+        # No new jobs are taken, running ones finish
+        self._stop.set()
+
+    def abort(self):
+        # No new jobs are taken, running ones stop at their next hotel
+        self._stop.set()
+        self._aborted.set()
+
+    def close(self):
+        self.stop()
+        for pool in self._pools.values():
+            try:
+                pool.close()
+            except Exception:
+                pass
+        self._pools = {}
+        self.metrics.close()
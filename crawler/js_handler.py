@@ -1,169 +1,407 @@
-from playwright.sync_api import sync_playwright
-import pandas as pd
-from urllib.parse import urlencode
-import time
-import random
-
-
-class JSScraper:
-    def __init__(self, headless=True, slow_mo=100):
-        self.headless = headless
-        self.slow_mo = slow_mo
-        self.base_url = "https://www.booking.com/searchresults.html"
-
-    def build_search_url(self, destination, checkin, checkout, adults=2, children=0, rooms=1):
-        params = {
-            'ss': destination,
-            'checkin': checkin,
-            'checkout': checkout,
-            'group_adults': adults,
-            'group_children': children,
-            'no_rooms': rooms,
-            'sb_travel_purpose': 'leisure'
-        }
-        return f"{self.base_url}?{urlencode(params)}"
-
-    # Update the scrape_hotels method in JSScraper class (js_handler.py)
-    def scrape_hotels(self, destination, checkin, checkout, max_results=20, adults=2, children=0, rooms=1):
-        url = self.build_search_url(destination, checkin, checkout, adults, children, rooms)
-        results = []
-
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=self.headless, slow_mo=self.slow_mo)
-            context = browser.new_context()
-            page = context.new_page()
-
-            try:
-                # Set headers and load search page
-                page.set_extra_http_headers({
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                    'Accept-Language': 'en-US,en;q=0.9'
-                })
-
-                page.goto(url, timeout=60000, wait_until="domcontentloaded")
-                time.sleep(random.uniform(2, 5))
-
-                # Handle cookies popup if it appears
-                try:
-                    page.click('button#onetrust-accept-btn-handler', timeout=5000)
-                    time.sleep(1)
-                except:
-                    pass
-
-                # Wait for results to load
-                page.wait_for_selector('div[data-testid="property-card"]', timeout=30000)
-
-                # Get all hotel elements
-                hotel_elements = page.query_selector_all('div[data-testid="property-card"]')
-                if not hotel_elements:
-                    print("No hotels found on the search results page")
-                    return pd.DataFrame()
-
-                for i, hotel in enumerate(hotel_elements[:max_results]):
-                    try:
-                        # Get basic info from search card
-                        name = hotel.query_selector('div[data-testid="title"]').inner_text()
-                        price_elem = hotel.query_selector('span[data-testid="price-and-discounted-price"]')
-                        price = price_elem.inner_text() if price_elem else "N/A"
-
-                        score_elem = hotel.query_selector('div[data-testid="review-score"]')
-                        score = score_elem.inner_text() if score_elem else "N/A"
-
-                        location_elem = hotel.query_selector('span[data-testid="address"]')
-                        location = location_elem.inner_text() if location_elem else "N/A"
-
-                        distance_elem = hotel.query_selector('span[data-testid="distance"]')
-                        distance = distance_elem.inner_text() if distance_elem else "N/A"
-
-                        # Get hotel URL
-                        hotel_url = page.evaluate('(element) => element.querySelector("a").href', hotel)
-
-                        # Open new tab for hotel details
-                        hotel_page = context.new_page()
-                        hotel_page.goto(hotel_url, timeout=60000, wait_until="domcontentloaded")
-                        time.sleep(3)  # Increased wait time for page to fully load
-
-                        # COMBINED FACILITIES SCRAPING APPROACH
-                        facilities = []
-
-                        # METHOD 1: Try property highlights (original structure)
-                        try:
-                            hotel_page.wait_for_selector('div[data-testid="property-highlights"]', timeout=3000)
-                            highlight_items = hotel_page.query_selector_all('li[role="listitem"].c5ae8a7f67')
-                            for item in highlight_items:
-                                text_element = item.query_selector('div.b99b6ef58f.b2b0196c65')
-                                if text_element:
-                                    facility_text = text_element.inner_text().strip()
-                                    if facility_text:
-                                        facilities.append(facility_text)
-                        except Exception as e:
-                            print(f"Property highlights method failed for {name}: {str(e)}")
-
-                        # METHOD 2: Try popular facilities (new structure)
-                        if not facilities:
-                            try:
-                                hotel_page.wait_for_selector(
-                                    'div[data-testid="property-most-popular-facilities-wrapper"]', timeout=3000)
-                                popular_items = hotel_page.query_selector_all('li.b0bf4dc58f.b2f588b43c')
-                                for item in popular_items:
-                                    # Try both possible text element locations
-                                    text_element = item.query_selector('span.f6b6d2a959') or item.query_selector(
-                                        'div.b99b6ef58f')
-                                    if text_element:
-                                        facility_text = text_element.inner_text().strip()
-                                        if facility_text:
-                                            facilities.append(facility_text)
-                            except Exception as e:
-                                print(f"Popular facilities method failed for {name}: {str(e)}")
-
-                        # METHOD 3: Fallback to general facility search
-                        if not facilities:
-                            try:
-                                general_items = hotel_page.query_selector_all('[data-testid="facility-icon"]')
-                                for item in general_items:
-                                    parent = item.query_selector('xpath=./ancestor::li[1]')
-                                    if parent:
-                                        text_element = parent.query_selector('div.b99b6ef58f')
-                                        if text_element:
-                                            facility_text = text_element.inner_text().strip()
-                                            if facility_text:
-                                                facilities.append(facility_text)
-                            except Exception as e:
-                                print(f"General facilities method failed for {name}: {str(e)}")
-                                facilities = ["Facilities not found"]
-
-                        # Clean and deduplicate
-                        seen = set()
-                        facilities = [x for x in facilities if x and not (x in seen or seen.add(x))]
-
-                        # Close hotel page tab
-                        hotel_page.close()
-
-                        # Build results dictionary
-                        results.append({
-                            'name': name.strip(),
-                            'price': price.strip(),
-                            'score': score.strip(),
-                            'location': location.strip(),
-                            'distance_from_center': distance.strip(),
-                            'facilities': ', '.join(facilities) if facilities else "No facilities listed",
-                            'url': hotel_url
-                        })
-
-                    except Exception as e:
-                        print(f"Error processing hotel {i + 1}: {str(e)}")
-                        continue
-
-            except Exception as e:
-                print(f"Playwright scraping failed: {str(e)}")
-            finally:
-                context.close()
-                browser.close()
-
-        # Create DataFrame with proper data types
-        df = pd.DataFrame(results)
-        if not df.empty:
-            df['price_numeric'] = df['price'].str.replace(r'[^\d.]', '', regex=True).astype(float)
-            df['score_clean'] = df['score'].str.extract(r'(\d+\.\d+)')[0].astype(float)
-
-        return df
\ No newline at end of file
+from playwright.sync_api import sync_playwright
+import pandas as pd
+from urllib.parse import urlencode
+
+from crawler.archive import SEARCH, DETAIL
+from crawler.memory import RowBuffer
+from crawler.metrics import Metrics
+from crawler.resource_blocking import ResourceBlocker
+from crawler.rate_limiter import get_default_limiter
+from crawler.robots_analyzer import get_default_policy
+from crawler.urls import canonical_url, split_destinations
+from crawler.normalize import normalize_frame
+from crawler.extraction import PROPERTY_CARD_SELECTOR, LOAD_MORE_SELECTOR, extract_cards, extract_facilities
+
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9'
+}
+
+# Any of these means the detail page has rendered its facilities block
+FACILITIES_READY_SELECTOR = ', '.join([
+    'div[data-testid="property-highlights"]',
+    'div[data-testid="property-most-popular-facilities-wrapper"]',
+    '[data-testid="facility-icon"]',
+])
+
+
+def build_dataframe(results):
+    # Create DataFrame with proper data types
+    return normalize_frame(pd.DataFrame(results))
+
+
+def build_row(card, detail):
+    # One output row from a search card plus its detail-page data
+    facilities = detail['facilities']
+    return {
+        'name': card['name'],
+        'price': card['price'],
+        'score': card['score'],
+        'location': card['location'],
+        'distance_from_center': card['distance_from_center'],
+        'facilities': ', '.join(facilities) if facilities else "No facilities listed",
+        'url': card['url']
+    }
+
+
+class JSScraper:
+    def __init__(self, headless=True, slow_mo=100, resource_profile="text-only", rate_limiter=None,
+                 detail_cache=None, metrics=None, robots=None, delta=None, memory=None, archive=None):
+        self.headless = headless
+        self.slow_mo = slow_mo
+        # Which requests get aborted before download, see resource_blocking.PROFILES
+        self.blocker = ResourceBlocker(resource_profile)
+        # Shared per-host limiter seeded from robots.txt unless one is passed in
+        self._rate_limiter = rate_limiter
+        # Optional DetailCache, a fresh hit skips the detail-page visit
+        self.detail_cache = detail_cache
+        # Optional DeltaState, a hotel whose search card has not changed since the last crawl keeps its old row
+        self.delta = delta
+        # Stage timings and counters, pass a shared Metrics to log or export them
+        self.metrics = metrics if metrics is not None else Metrics()
+        # RobotsPolicy checked before every navigation, the shared on-disk cache unless one is passed in
+        self._robots = robots
+        # Optional MemoryBudget, detail tabs then run in a context that is replaced every so many pages
+        self.memory = memory
+        # Optional HtmlArchive, rendered search and detail pages are kept compressed for re-extraction
+        self.archive = archive
+        self.base_url = "https://www.booking.com/searchresults.html"
+
+    def build_search_url(self, destination, checkin, checkout, adults=2, children=0, rooms=1, offset=0):
+        params = {
+            'ss': destination,
+            'checkin': checkin,
+            'checkout': checkout,
+            'group_adults': adults,
+            'group_children': children,
+            'no_rooms': rooms,
+            'sb_travel_purpose': 'leisure'
+        }
+        if offset:
+            params['offset'] = offset
+        return f"{self.base_url}?{urlencode(params)}"
+
+    @property
+    def rate_limiter(self):
+        if self._rate_limiter is None:
+            self._rate_limiter = get_default_limiter()
+        return self._rate_limiter
+
+    @property
+    def robots(self):
+        if self._robots is None:
+            self._robots = get_default_policy()
+        return self._robots
+
+    def _allowed(self, url):
+        # robots.txt gate in front of every fetch, skipped URLs are counted and logged
+        rule = self.robots.check(url)
+        if rule is None:
+            return True
+        self.metrics.count('robots_skipped')
+        self.metrics.event('robots_skipped', url=url, rule=rule)
+        return False
+
+    def scrape_hotels(self, destination, checkin, checkout, max_results=20, adults=2, children=0, rooms=1):
+        rows = RowBuffer()
+        for row in self.iter_hotels(destination, checkin, checkout, max_results, adults, children, rooms):
+            rows.append(row)
+        return build_dataframe(rows.to_dict())
+
+    def scrape_batch(self, destinations, checkin, checkout, max_results=20, adults=2, children=0, rooms=1):
+        # One destination after another, returns {destination: DataFrame}
+        return {
+            d: self.scrape_hotels(d, checkin, checkout, max_results, adults, children, rooms)
+            for d in split_destinations(destinations)
+        }
+
+    def scrape_details(self, cards):
+        # Detail pages only, for cards found elsewhere (static HTML, an earlier search)
+        return list(self.iter_details(cards))
+
+    def scrape_cards(self, destination, date_pairs, max_results=20, adults=2, children=0, rooms=1):
+        # Search result cards only, no detail pages: {(checkin, checkout): [card, ...]} from one browser tab
+        found = {}
+        with sync_playwright() as p:
+            browser, context = self._launch(p)
+            page = context.new_page()
+            try:
+                for checkin, checkout in date_pairs:
+                    search = (destination, checkin, checkout, adults, children, rooms)
+                    try:
+                        found[(checkin, checkout)] = list(self._iter_cards(page, search, max_results))
+                    except Exception as e:
+                        print(f"Search for {checkin} - {checkout} failed: {str(e)[:100]}")
+                        self.metrics.error('search', e, destination=destination, checkin=checkin, checkout=checkout)
+                        found[(checkin, checkout)] = []
+            finally:
+                context.close()
+                browser.close()
+                self.print_summary()
+        return found
+
+    def iter_details(self, cards):
+        with sync_playwright() as p:
+            browser, context = self._launch(p)
+            try:
+                yield from self._iter_detail_rows(browser, context, cards)
+            finally:
+                context.close()
+                browser.close()
+                self.print_summary()
+
+    def iter_hotels(self, destination, checkin, checkout, max_results=20, adults=2, children=0, rooms=1,
+                    checkpoint=None):
+        # Yields one result row per hotel as soon as its detail page is done,
+        # following result pages until max_results hotels have been seen.
+        # With a writer.Checkpoint, hotels it has marked done are skipped and
+        # the crawl starts at the last finished result page.
+        search = (destination, checkin, checkout, adults, children, rooms)
+
+        with sync_playwright() as p:
+            browser, context = self._launch(p)
+            page = context.new_page()
+
+            try:
+                yield from self._iter_detail_rows(browser, context,
+                                                  self._iter_cards(page, search, max_results, checkpoint))
+
+            except Exception as e:
+                print(f"Playwright scraping failed: {str(e)}")
+                self.metrics.error('crawl', e, destination=destination)
+            finally:
+                context.close()
+                browser.close()
+                self.print_summary()
+
+    def _launch(self, p):
+        browser = p.chromium.launch(headless=self.headless, slow_mo=self.slow_mo)
+        return browser, self._new_context(browser)
+
+    def _new_context(self, browser):
+        context = browser.new_context()
+        # Set headers for every tab opened in this context
+        context.set_extra_http_headers(HEADERS)
+        return context
+
+    def _iter_detail_rows(self, browser, context, cards):
+        # With a memory budget the detail tabs get a context of their own, closed and replaced
+        # when the budget says so; the search page in context carries on undisturbed
+        details = self._new_context(browser) if self.memory is not None else context
+        try:
+            for i, card in enumerate(cards):
+                row = self._scrape_detail(details, card, i)
+                if row is not None:
+                    yield row
+                if self.memory is not None and self.memory.due():
+                    details.close()
+                    details = self._new_context(browser)
+                    self.memory.recycled()
+                    self.metrics.count('context_recycles')
+        finally:
+            if details is not context:
+                details.close()
+
+    def print_summary(self):
+        self.blocker.print_summary()
+        self.robots.print_summary()
+        if self.detail_cache is not None:
+            self.detail_cache.print_summary()
+        if self.delta is not None:
+            self.delta.print_summary()
+        if self.memory is not None:
+            self.memory.print_summary()
+        if self.archive is not None:
+            self.archive.print_summary()
+        self.metrics.print_summary()
+
+    def _open_search_page(self, page, url):
+        if not self._allowed(url):
+            return False
+        limiter = self.rate_limiter
+        self.blocker.attach(page, url)
+        with self.metrics.span('rate_limit.wait'):
+            limiter.acquire(url)
+        with self.metrics.span('search.navigate'):
+            response = page.goto(url, timeout=60000, wait_until="domcontentloaded")
+        limiter.report_response(url, response)
+        self.metrics.count('search_pages')
+
+        # Wait for results to load
+        try:
+            with self.metrics.span('search.wait'):
+                page.wait_for_selector(PROPERTY_CARD_SELECTOR, timeout=30000)
+        except Exception:
+            self.metrics.count('search_pages_empty')
+            return False
+
+        # Dismiss cookies popup if it is showing, without waiting for it to appear
+        try:
+            accept_button = page.query_selector('button#onetrust-accept-btn-handler')
+            if accept_button:
+                accept_button.click(timeout=2000)
+        except:
+            pass
+        return True
+
+    def _load_more(self, page, count):
+        # Click "Load more results" or scroll to the bottom, then wait for new cards to render
+        try:
+            with self.metrics.span('search.load_more'):
+                button = page.query_selector(LOAD_MORE_SELECTOR)
+                if button:
+                    button.click(timeout=5000)
+                else:
+                    page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
+                page.wait_for_function(
+                    '([selector, count]) => document.querySelectorAll(selector).length > count',
+                    arg=[PROPERTY_CARD_SELECTOR, count], timeout=10000
+                )
+            return True
+        except Exception:
+            return False
+
+    def _iter_cards(self, page, search, max_results, checkpoint=None):
+        # Cards across result pages: "load more"/scroll first, then the next offset page
+        seen = set()
+        offset = 0
+        total = 0
+        if checkpoint is not None:
+            offset, total = checkpoint.page_offset, checkpoint.seen
+        if total >= max_results:
+            return
+        if not self._open_search_page(page, self.build_search_url(*search, offset=offset)):
+            print("No hotels found on the search results page")
+            return
+
+        while True:
+            read = 0
+            new_cards = 0
+            # Hotels of this result page handed out for their detail pages
+            handed_out = []
+            while True:
+                # Read every card not seen yet in one round trip to the browser
+                with self.metrics.span('search.extract'):
+                    count = page.eval_on_selector_all(PROPERTY_CARD_SELECTOR, 'cards => cards.length')
+                    cards = extract_cards(page, count - read, offset=read)
+                for card in cards:
+                    key = canonical_url(card['url'])
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    new_cards += 1
+                    total += 1
+                    if checkpoint is None or not checkpoint.is_done(card['url']):
+                        handed_out.append(card['url'])
+                        yield card
+                    if total >= max_results:
+                        self._archive_page(SEARCH, page.url, page)
+                        return
+                read = count
+                if not self._load_more(page, count):
+                    # Every card of this page has rendered, archive it once rather than per "load more"
+                    self._archive_page(SEARCH, page.url, page)
+                    break
+
+            # Nothing more on this page, move to the next offset
+            if not new_cards:
+                return
+            offset += read
+            if checkpoint is not None:
+                # Every card up to here has been handed out and consumed
+                checkpoint.mark_page(offset, total, handed_out)
+            if not self._open_search_page(page, self.build_search_url(*search, offset=offset)):
+                return
+
+    def _archive_page(self, kind, url, page):
+        # Rendered HTML into the archive, so the page can be parsed again once the selectors change
+        if self.archive is None:
+            return
+        try:
+            with self.metrics.span('archive'):
+                self.archive.put(kind, url, page.content())
+        except Exception as e:
+            print(f"Could not archive {url}: {str(e)[:100]}")
+
+    def _unchanged_row(self, card):
+        # Last crawl's row for a card identical to last time, None when the detail page has to be visited
+        if self.delta is None:
+            return None
+        row = self.delta.unchanged(card)
+        if row is not None:
+            self.metrics.count('delta_skipped')
+        return row
+
+    def _row(self, card, detail):
+        # Output row, remembered with its card's fingerprint for the next delta crawl
+        row = build_row(card, detail)
+        if self.delta is not None:
+            self.delta.record(card, row)
+        return row
+
+    def _scrape_detail(self, context, card, index):
+        limiter = self.rate_limiter
+        hotel_url = card['url']
+
+        metrics = self.metrics
+
+        row = self._unchanged_row(card)
+        if row is not None:
+            return row
+
+        if self.detail_cache is not None:
+            detail = self.detail_cache.get(hotel_url)
+            if detail is not None:
+                metrics.count('detail_cache_hits')
+                return self._row(card, detail)
+
+        if not self._allowed(hotel_url):
+            return None
+
+        hotel_page = None
+        try:
+            with metrics.span('detail', hotel=card['name']):
+                # Open new tab for hotel details, closed below whatever happens so a failed page cannot leak
+                hotel_page = context.new_page()
+                self.blocker.attach(hotel_page, hotel_url)
+                with metrics.span('rate_limit.wait'):
+                    limiter.acquire(hotel_url)
+                try:
+                    with metrics.span('detail.navigate'):
+                        response = hotel_page.goto(hotel_url, timeout=60000, wait_until="domcontentloaded")
+                except Exception:
+                    limiter.report_error(hotel_url)
+                    raise
+                limiter.report_response(hotel_url, response)
+
+                # Wait until a facilities block has rendered rather than a fixed delay
+                try:
+                    with metrics.span('detail.wait'):
+                        hotel_page.wait_for_selector(FACILITIES_READY_SELECTOR, timeout=10000)
+                except Exception:
+                    print(f"No facilities block rendered for {card['name']}")
+                    metrics.count('facilities_missing')
+
+                with metrics.span('detail.extract'):
+                    detail = {'facilities': extract_facilities(hotel_page)}
+                self._archive_page(DETAIL, hotel_url, hotel_page)
+
+        except Exception as e:
+            print(f"Error processing hotel {index + 1}: {str(e)}")
+            metrics.error('detail', e, hotel=card['name'], url=hotel_url)
+            return None
+        finally:
+            if hotel_page is not None:
+                try:
+                    hotel_page.close()
+                except Exception:
+                    pass
+                if self.memory is not None:
+                    self.memory.page_done()
+
+        metrics.count('hotels')
+
+        if self.detail_cache is not None:
+            self.detail_cache.put(hotel_url, detail)
+        return self._row(card, detail)
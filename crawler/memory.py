@@ -0,0 +1,237 @@
+from array import array
+import threading
+
+import psutil
+
+
+# A text column in a RowBuffer stays dictionary-encoded while at most this share of its values
+# are distinct, checked once it has DICTIONARY_MIN_ROWS rows
+DICTIONARY_MAX_SHARE = 0.5
+DICTIONARY_MIN_ROWS = 1000
+
+
+class MemoryBudget:
+    """When to recycle a browser context or browser, and the peak memory of a crawl"""
+
+    # A detail-page context is replaced after max_pages pages, or sooner once this process
+    # and the browser it started pass max_rss_mb together. RSS is sampled every
+    # check_every pages since walking the Chromium process tree takes a few ms.
+    def __init__(self, max_pages=200, max_rss_mb=None, check_every=10):
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.check_every = max(1, int(check_every))
+        self.pages = 0
+        self.total_pages = 0
+        self.recycles = 0
+        self.peak_mb = 0.0
+        self.peak_process_mb = 0.0
+        self.peak_browser_mb = 0.0
+        self._over = False
+        self._process = psutil.Process()
+        self._lock = threading.Lock()
+
+    def rss_mb(self):
+        # (this process, browser) resident memory, the browser being every child process (driver, Chromium)
+        process = self._process.memory_info().rss
+        browser = 0
+        for child in self._process.children(recursive=True):
+            try:
+                browser += child.memory_info().rss
+            except psutil.Error:
+                # Renderers come and go while we walk the tree
+                pass
+        return process / 2 ** 20, browser / 2 ** 20
+
+    def sample(self):
+        process, browser = self.rss_mb()
+        with self._lock:
+            self.peak_process_mb = max(self.peak_process_mb, process)
+            self.peak_browser_mb = max(self.peak_browser_mb, browser)
+            self.peak_mb = max(self.peak_mb, process + browser)
+        return process + browser
+
+    def over_limit(self):
+        return self.max_rss_mb is not None and self.sample() > self.max_rss_mb
+
+    def page_done(self):
+        # One detail page actually opened; cache and delta hits never get here
+        with self._lock:
+            self.pages += 1
+            self.total_pages += 1
+            pages = self.pages
+        if pages % self.check_every == 0 and self.over_limit():
+            with self._lock:
+                self._over = True
+
+    def due(self):
+        # True when the detail context has served max_pages pages, or memory went over the limit
+        return self._over or (bool(self.max_pages) and self.pages >= self.max_pages)
+
+    def recycled(self):
+        with self._lock:
+            self.pages = 0
+            self._over = False
+            self.recycles += 1
+
+    def stats(self):
+        return {
+            'pages': self.total_pages,
+            'recycles': self.recycles,
+            'peak_mb': self.peak_mb,
+            'peak_process_mb': self.peak_process_mb,
+            'peak_browser_mb': self.peak_browser_mb,
+        }
+
+    def print_summary(self):
+        self.sample()
+        print(f"Memory: peak {self.peak_mb:.0f} MB (crawler {self.peak_process_mb:.0f} MB, "
+              f"browser {self.peak_browser_mb:.0f} MB), {self.recycles} context recycles "
+              f"over {self.total_pages} pages")
+
+
+class _NumberColumn:
+    # int64 array, widened to float64 once a float arrives; positions of None kept in missing
+    def __init__(self, count, value):
+        self.values = array('d' if isinstance(value, float) else 'q', bytes(8 * count))
+        self.missing = set(range(count))
+
+    def append(self, value):
+        if value is None:
+            self.missing.add(len(self.values))
+            value = 0
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError(f"{type(value).__name__} in a number column")
+        elif isinstance(value, float) and self.values.typecode == 'q':
+            self.values = array('d', self.values)
+        self.values.append(value)
+
+    def to_list(self):
+        missing = self.missing
+        return [None if i in missing else value for i, value in enumerate(self.values)]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class _DictColumn:
+    # Text as int32 codes into the distinct values, code 0 is None
+    def __init__(self, count):
+        self.codes = array('i', bytes(4 * count))
+        self.values = [None]
+        self.index = {None: 0}
+
+    def append(self, value):
+        code = self.index.get(value)
+        if code is None:
+            if not isinstance(value, str):
+                raise TypeError(f"{type(value).__name__} in a text column")
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def too_distinct(self):
+        return len(self.codes) >= DICTIONARY_MIN_ROWS and len(self.values) > DICTIONARY_MAX_SHARE * len(self.codes)
+
+    def to_list(self):
+        values = self.values
+        return [values[code] for code in self.codes]
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class _Utf8Column:
+    # Text as one UTF-8 buffer plus the end offset of every value, for columns whose values rarely repeat
+    def __init__(self, values=()):
+        self.data = bytearray()
+        self.ends = array('q')
+        self.missing = set()
+        for value in values:
+            self.append(value)
+
+    def append(self, value):
+        if value is None:
+            self.missing.add(len(self.ends))
+        elif not isinstance(value, str):
+            raise TypeError(f"{type(value).__name__} in a text column")
+        else:
+            self.data += value.encode('utf-8', 'surrogatepass')
+        self.ends.append(len(self.data))
+
+    def to_list(self):
+        values = []
+        start = 0
+        for i, end in enumerate(self.ends):
+            values.append(None if i in self.missing else self.data[start:end].decode('utf-8', 'surrogatepass'))
+            start = end
+        return values
+
+    def __len__(self):
+        return len(self.ends)
+
+
+class _ObjectColumn:
+    # Anything else, and columns whose values turned out to be of mixed types
+    def __init__(self, values):
+        self.values = values
+
+    def append(self, value):
+        self.values.append(value)
+
+    def to_list(self):
+        return self.values
+
+    def __len__(self):
+        return len(self.values)
+
+
+def _new_column(count, value):
+    # Typed by the first value that is not None, count earlier rows had none
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return _NumberColumn(count, value)
+    if isinstance(value, str):
+        return _DictColumn(count)
+    return _ObjectColumn([None] * count)
+
+
+class RowBuffer:
+    """Result rows kept column by column in typed arrays instead of one dict per hotel, until they become a DataFrame"""
+
+    # Numbers go into array('q') / array('d'). Text is dictionary-encoded while its values
+    # repeat (locations, distances, price labels) and moves to a UTF-8 buffer with offsets
+    # once most of them are distinct (names, urls), either way without a str object per value.
+    def __init__(self):
+        self.columns = {}
+        # Every key seen, in order, including ones that have only been None so far
+        self.keys = {}
+        self.count = 0
+
+    def append(self, row):
+        for key, value in row.items():
+            self.keys[key] = None
+            column = self.columns.get(key)
+            if column is None:
+                if value is None:
+                    continue
+                # A column first seen now was empty for every earlier row
+                column = self.columns[key] = _new_column(self.count, value)
+            try:
+                column.append(value)
+            except (TypeError, OverflowError):
+                # A value the column's type cannot hold, the column keeps plain objects from now on
+                column = self.columns[key] = _ObjectColumn(column.to_list())
+                column.append(value)
+            if isinstance(column, _DictColumn) and column.too_distinct():
+                self.columns[key] = _Utf8Column(column.to_list())
+        self.count += 1
+        for column in self.columns.values():
+            if len(column) < self.count:
+                column.append(None)
+
+    def to_dict(self):
+        # Column name -> list of values, for pd.DataFrame
+        return {key: self.columns[key].to_list() if key in self.columns else [None] * self.count
+                for key in self.keys}
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,247 @@
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+import time
+
+
+# Per-stage samples kept for quantiles and for the run summary, older ones are dropped
+MAX_SAMPLES = 5000
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+def _quantile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{str(value).replace(chr(34), "")}"' for key, value in labels) + '}'
+
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max = 0.0
+        # Latest durations for the exported quantiles, and the ones since the last run summary
+        self.samples = []
+        self.run = []
+
+    def add(self, seconds, ok):
+        self.count += 1
+        self.errors += int(not ok)
+        self.seconds += seconds
+        self.max = max(self.max, seconds)
+        for samples in (self.samples, self.run):
+            samples.append(seconds)
+            if len(samples) > MAX_SAMPLES:
+                del samples[:len(samples) - MAX_SAMPLES]
+
+
+class Metrics:
+    """Timing spans and counters for a crawl, as JSON lines and a Prometheus text file"""
+
+    # One instance is shared by every scraper of a crawl. Counters and stage totals
+    # only ever grow, like Prometheus expects; the run summary covers the spans
+    # recorded since the previous summary.
+    def __init__(self, log_path=None, prometheus_path=None):
+        self.log_path = log_path
+        self.prometheus_path = prometheus_path
+        self.stages = {}
+        self.counters = {}
+        # Hotel -> seconds spent on its detail page in this run
+        self.hotels = {}
+        self._lock = threading.Lock()
+        self._log = open(log_path, 'a', buffering=1, encoding='utf-8') if log_path else None
+        self._server = None
+        self._recorded = 0
+        self._reported = 0
+
+    def _write(self, entry):
+        if self._log is not None:
+            self._log.write(json.dumps(entry, default=str) + '\n')
+
+    @contextmanager
+    def span(self, stage, hotel=None, **fields):
+        # with metrics.span('detail.navigate', hotel=name): ...
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start, error=error, hotel=hotel, **fields)
+
+    def observe(self, stage, seconds, error=None, hotel=None, **fields):
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+            stats.add(seconds, error is None)
+            if hotel is not None:
+                self.hotels[hotel] = self.hotels.get(hotel, 0.0) + seconds
+            self._recorded += 1
+            entry = {'ts': time.time(), 'event': 'span', 'stage': stage, 'seconds': round(seconds, 6),
+                     'ok': error is None}
+            if hotel is not None:
+                entry['hotel'] = hotel
+            if error is not None:
+                entry['error'] = f"{type(error).__name__}: {error}"
+            entry.update(fields)
+            self._write(entry)
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self._recorded += 1
+
+    def event(self, name, **fields):
+        with self._lock:
+            self._write({'ts': time.time(), 'event': name, **fields})
+
+    def error(self, stage, error, **fields):
+        # Full error text goes to the log, the console keeps its short message
+        self.count('errors', stage=stage)
+        self.event('error', stage=stage, error=f"{type(error).__name__}: {error}", **fields)
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            stages = sorted(self.stages.items())
+            counters = sorted(self.counters.items())
+            lines.append('# HELP crawler_stage_seconds Wall time per crawl stage')
+            lines.append('# TYPE crawler_stage_seconds summary')
+            for stage, stats in stages:
+                ordered = sorted(stats.samples)
+                for q in QUANTILES:
+                    lines.append(f'crawler_stage_seconds{_labels([("stage", stage), ("quantile", q)])} '
+                                 f'{_quantile(ordered, q):.6f}')
+                lines.append(f'crawler_stage_seconds_sum{_labels([("stage", stage)])} {stats.seconds:.6f}')
+                lines.append(f'crawler_stage_seconds_count{_labels([("stage", stage)])} {stats.count}')
+            lines.append('# HELP crawler_stage_failures_total Stage spans that raised')
+            lines.append('# TYPE crawler_stage_failures_total counter')
+            for stage, stats in stages:
+                lines.append(f'crawler_stage_failures_total{_labels([("stage", stage)])} {stats.errors}')
+
+            typed = set()
+            for (name, labels), value in counters:
+                metric = f'crawler_{name}_total'
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f'# TYPE {metric} counter')
+                lines.append(f'{metric}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path=None):
+        # Written to a temp file and renamed, a node_exporter textfile collector never sees half a file
+        path = path or self.prometheus_path
+        if not path:
+            return
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+    def serve(self, port=9108, host='127.0.0.1'):
+        # Prometheus scrape endpoint at http://host:port/metrics on a daemon thread
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                body = metrics.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def summary(self, n=5):
+        # Slowest stages by total time and slowest hotels of the run so far
+        with self._lock:
+            stages = []
+            for stage, stats in self.stages.items():
+                if not stats.run:
+                    continue
+                ordered = sorted(stats.run)
+                stages.append({
+                    'stage': stage,
+                    'count': len(ordered),
+                    'seconds': sum(ordered),
+                    'mean_ms': sum(ordered) * 1000 / len(ordered),
+                    'p95_ms': _quantile(ordered, 0.95) * 1000,
+                    'max_ms': ordered[-1] * 1000,
+                })
+            hotels = sorted(self.hotels.items(), key=lambda item: item[1], reverse=True)[:n]
+        stages.sort(key=lambda s: s['seconds'], reverse=True)
+        return {'stages': stages[:n], 'hotels': hotels}
+
+    def print_summary(self, n=5):
+        # Once per run: nested scrapers sharing this instance all call it, only the first prints
+        if self._recorded == self._reported:
+            return
+        s = self.summary(n)
+        if s['stages']:
+            print("Slowest stages:")
+            for stage in s['stages']:
+                print(f"  {stage['stage']:>22}: {stage['seconds']:.1f} s over {stage['count']}, "
+                      f"{stage['mean_ms']:.0f} ms mean, {stage['p95_ms']:.0f} ms p95, {stage['max_ms']:.0f} ms max")
+        if s['hotels']:
+            print("Slowest hotels:")
+            for hotel, seconds in s['hotels']:
+                print(f"  {seconds * 1000:8.0f} ms  {hotel}")
+        self.event('summary', **s)
+        self.write_prometheus()
+
+        with self._lock:
+            for stats in self.stages.values():
+                stats.run = []
+            self.hotels = {}
+            self._reported = self._recorded
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+def main():
+    # python -m crawler.metrics crawl_metrics.jsonl, slowest stages and hotels from a saved log
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "crawl_metrics.jsonl"
+    metrics = Metrics()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('event') == 'span':
+                metrics.observe(entry['stage'], entry['seconds'], error=entry.get('error'),
+                                hotel=entry.get('hotel'))
+    metrics.print_summary(10)
+
+
+if __name__ == "__main__":
+    main()
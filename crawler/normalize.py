@@ -0,0 +1,165 @@
+# Typed columns from the text the pages show, shared by the scrapers, the crawl
+# store and the dashboard. Parsing runs as Arrow compute kernels (RE2 regexes)
+# over the distinct strings of a column, never as a Python loop per row.
+import json
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# Leading anchors keep RE2 from trying a match at every offset of the string
+# First number in the text, digits plus thousands separators, e.g. "EGP 183,633" or "1.234,50 zł"
+AMOUNT_PATTERN = r'^[^0-9]*(?P<amount>[0-9][0-9., \x{00a0}\x{202f}]*)'
+# "Scored 9.3\n9.3\nWonderful\n3 reviews", "8.5/10" and "9,1" all start with the score
+SCORE_PATTERN = r'^[^0-9]*(?P<score>[0-9]{1,2}(?:[.,][0-9]+)?)'
+REVIEWS_PATTERN = r'(?P<reviews>[0-9][0-9,.]*)\s+reviews?'
+# What is left of a price once the number is trimmed off both ends: "EGP", "US$", "zł"
+SPACES = ' \u00a0\u202f\t\n'
+NUMBER_CHARS = '0123456789.,' + SPACES
+CURRENCY_CODE = re.compile(r'^[A-Z]{3}$')
+
+CURRENCY_SYMBOLS = {
+    'US$': 'USD',
+    '$': 'USD',
+    '€': 'EUR',
+    '£': 'GBP',
+    '¥': 'JPY',
+    '₹': 'INR',
+    '₺': 'TRY',
+    '₽': 'RUB',
+    '₩': 'KRW',
+    '฿': 'THB',
+    'zł': 'PLN',
+}
+
+RATING_COLUMNS = ['cleanliness_rating', 'comfort_rating', 'location_rating',
+                  'facilities_rating', 'staff_rating', 'value_for_money']
+
+
+def _strings(values):
+    # Arrow string array from a pandas Series, list or Arrow array, NaN/None become null
+    if isinstance(values, pd.Series):
+        values = values.to_numpy(dtype=object)
+        try:
+            values = pa.array(values, type=pa.string(), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Numbers mixed in, e.g. a ratings column read from CSV
+            values = pa.array(values, from_pandas=True)
+    elif not isinstance(values, (pa.Array, pa.ChunkedArray)):
+        values = pa.array(list(values), from_pandas=True)
+    if not pa.types.is_string(values.type):
+        values = pc.cast(values, pa.string())
+    return values
+
+
+def _per_unique(values, *parsers):
+    # Parse each distinct string once and spread the results back over the rows as
+    # numpy arrays, one per parser. Crawls repeat the same price and score text a lot.
+    encoded = pc.dictionary_encode(_strings(values))
+    if isinstance(encoded, pa.ChunkedArray):
+        encoded = encoded.combine_chunks()
+    # Null rows point one past the dictionary, at a missing value
+    indices = pc.fill_null(encoded.indices, len(encoded.dictionary)).to_numpy()
+    columns = []
+    for parse in parsers:
+        parsed = parse(encoded.dictionary)
+        if isinstance(parsed, (pa.Array, pa.ChunkedArray)):
+            parsed = parsed.to_numpy(zero_copy_only=False)
+        missing = None if parsed.dtype == object else np.nan
+        columns.append(np.append(parsed, np.array([missing], dtype=parsed.dtype))[indices])
+    return columns
+
+
+def _number(text):
+    # "183,633" -> 183633.0, "1.234,50" -> 1234.5, null stays null. A trailing separator
+    # with one or two digits is the decimal part, thousands groups always have three.
+    text = pc.utf8_rtrim(text, SPACES)
+    digits = text
+    for separator in '.,' + SPACES:
+        digits = pc.replace_substring(digits, separator, '')
+    scale = pc.if_else(pc.match_substring_regex(text, r'[.,][0-9][0-9]$'), 100.0,
+                       pc.if_else(pc.match_substring_regex(text, r'[.,][0-9]$'), 10.0, 1.0))
+    return pc.divide(pc.cast(digits, pa.float64()), scale)
+
+
+def _prices(dictionary):
+    return _number(pc.struct_field(pc.extract_regex(dictionary, AMOUNT_PATTERN), 'amount'))
+
+
+def _currencies(dictionary):
+    # Trimming the number off leaves a handful of distinct symbols, only those go through Python
+    symbols = pc.dictionary_encode(pc.utf8_trim(dictionary, NUMBER_CHARS))
+    codes = []
+    for text in symbols.dictionary.to_pylist():
+        code = CURRENCY_SYMBOLS.get(text, text)
+        codes.append(code if CURRENCY_CODE.match(code) else None)
+    indices = pc.fill_null(symbols.indices, len(codes)).to_numpy()
+    return np.array(codes + [None], dtype=object)[indices]
+
+
+def _scores(dictionary):
+    score = pc.struct_field(pc.extract_regex(dictionary, SCORE_PATTERN), 'score')
+    score = pc.cast(pc.replace_substring(score, ',', '.'), pa.float64())
+    # Booking scores are out of 10, anything else is a review count or a year
+    return pc.if_else(pc.less_equal(score, 10.0), score, pa.scalar(None, pa.float64()))
+
+
+def _review_counts(dictionary):
+    reviews = pc.struct_field(pc.extract_regex(dictionary, REVIEWS_PATTERN), 'reviews')
+    return pc.cast(pc.replace_substring_regex(reviews, r'[^0-9]', ''), pa.float64())
+
+
+def _int_column(values):
+    # Nullable Int64 straight from a float array with NaN for missing
+    missing = np.isnan(values)
+    return pd.arrays.IntegerArray(np.where(missing, 0, values).astype('int64'), missing)
+
+
+def parse_prices(series):
+    """Price text -> (amount, ISO currency code) columns"""
+    amounts, currencies = _per_unique(series, _prices, _currencies)
+    return pd.DataFrame({'price_numeric': amounts, 'currency': currencies}, index=series.index)
+
+
+def parse_scores(series):
+    return pd.Series(_per_unique(series, _scores)[0], index=series.index)
+
+
+def parse_review_counts(series):
+    return pd.Series(_int_column(_per_unique(series, _review_counts)[0]), index=series.index)
+
+
+def load_fx_rates(path):
+    # JSON object {"EGP": 0.019, "GBP": 1.17, ...}: value of one unit in the base currency
+    with open(path, encoding='utf-8') as f:
+        return {code.upper(): float(rate) for code, rate in json.load(f).items()}
+
+
+def convert_prices(amounts, currencies, rates):
+    # Unknown currencies convert to NaN rather than to a wrong number
+    factor = currencies.map(rates).astype(float)
+    return amounts * factor
+
+
+def normalize_frame(df, fx_rates=None, base_currency='EUR'):
+    """Copy of df with typed price, currency, score, review count and sub-rating columns"""
+    df = df.copy()
+    if df.empty:
+        return df
+    if 'price' in df.columns:
+        prices = parse_prices(df['price'])
+        df['price_numeric'] = prices['price_numeric']
+        df['currency'] = prices['currency']
+        if fx_rates:
+            df[f'price_{base_currency.lower()}'] = convert_prices(df['price_numeric'], df['currency'], fx_rates)
+    if 'score' in df.columns:
+        scores, reviews = _per_unique(df['score'], _scores, _review_counts)
+        df['score_clean'] = scores
+        df['review_count'] = _int_column(reviews)
+    for column in RATING_COLUMNS:
+        if column in df.columns and not pd.api.types.is_float_dtype(df[column]):
+            df[column] = parse_scores(df[column])
+    return df
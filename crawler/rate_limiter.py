@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+from crawler.robots_analyzer import RobotsAnalyzer
+
+
+DEFAULT_RATE = 2.0      # navigations per second per host when robots.txt sets no crawl delay
+DEFAULT_BURST = 4
+MAX_BACKOFF = 32        # slowest we go is DEFAULT_RATE / MAX_BACKOFF
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+class _Bucket:
+    def __init__(self, burst):
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.backoff = 1.0
+        self.blocked_until = 0.0
+
+
+class HostRateLimiter:
+    """Token bucket per host, shared by every scraper and thread that fetches pages"""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_backoff=MAX_BACKOFF):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.max_backoff = max_backoff
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_robots(cls, analyzer=None, **kwargs):
+        # Seed the rate from robots.txt Crawl-delay, e.g. a 5 s delay -> 0.2 requests/s with no burst
+        if analyzer is None:
+            analyzer = RobotsAnalyzer()
+
+        info = analyzer.analyze()
+        delay = info.get("crawl_delay")
+        if delay:
+            kwargs.setdefault("rate", 1.0 / float(delay))
+            kwargs.setdefault("burst", 1)
+        elif "error" in info:
+            print(f"Could not read robots.txt, using default rate limit: {info['error']}")
+        return cls(**kwargs)
+
+    def _bucket(self, host):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = _Bucket(self.burst)
+        return bucket
+
+    def reserve(self, url):
+        # Take a token for the url's host and return how long the caller must wait before using it
+        host = urlparse(url).hostname or url
+        with self._lock:
+            bucket = self._bucket(host)
+            now = time.monotonic()
+            rate = self.rate / bucket.backoff
+
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * rate)
+            bucket.updated = now
+            bucket.tokens -= 1
+
+            wait = 0.0 if bucket.tokens >= 0 else -bucket.tokens / rate
+            return max(wait, bucket.blocked_until - now)
+
+    def acquire(self, url):
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, url):
+        wait = self.reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def report_success(self, url):
+        host = urlparse(url).hostname or url
+        with self._lock:
+            bucket = self._bucket(host)
+            bucket.backoff = max(1.0, bucket.backoff * 0.75)
+
+    def report_error(self, url, status=None, retry_after=None):
+        # Halve the rate on every failure, 429/503 with Retry-After also pause the host
+        host = urlparse(url).hostname or url
+        with self._lock:
+            bucket = self._bucket(host)
+            bucket.backoff = min(self.max_backoff, bucket.backoff * 2)
+            if status in (429, 503):
+                pause = _parse_retry_after(retry_after)
+                if pause is None:
+                    pause = bucket.backoff / self.rate
+                bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + pause)
+            print(f"Backing off {host}: rate now {self.rate / bucket.backoff:.2f} requests/s"
+                  + (f" (HTTP {status})" if status else ""))
+
+    def report_response(self, url, response):
+        # Convenience for Playwright and requests responses, None counts as a failure
+        if response is None:
+            self.report_error(url)
+            return
+        status = response.status if hasattr(response, "status") else response.status_code
+        if status in (429, 503) or status >= 500:
+            headers = response.headers or {}
+            self.report_error(url, status, headers.get("retry-after") or headers.get("Retry-After"))
+        else:
+            self.report_success(url)
+
+
+def _parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def get_default_limiter():
+    # One limiter per process, seeded from robots.txt on first use
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = HostRateLimiter.from_robots()
+        return _default_limiter
@@ -1,22 +1,348 @@
-
-from urllib.robotparser import RobotFileParser
-import requests
-
-
-class RobotsAnalyzer:
-    def __init__(self, domain="https://www.booking.com"):
-        self.domain = domain
-        self.rp = RobotFileParser()
-
-    def analyze(self):
-        self.rp.set_url(f"{self.domain}/robots.txt")
-        try:
-            self.rp.read()
-            return {
-                "crawl_delay": self.rp.crawl_delay("*"),
-                "sitemaps": self.rp.site_maps(),
-                "can_fetch_home": self.rp.can_fetch("*", "/"),
-                "can_fetch_search": self.rp.can_fetch("*", "/searchresults.en-us.html")
-            }
-        except Exception as e:
-            return {"error": str(e)}
+
+from collections import deque
+from urllib.parse import urlsplit
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+
+
+CACHE_TTL = 24 * 3600           # RFC 9309: a cached robots.txt should not be used for more than a day
+USER_AGENT = "*"                # the browser user agent matches no named group, so the * group applies
+GRAM = 4                        # wildcard rules are indexed by this many characters of the text they require...
+GRAM_INDEX_AFTER = 100          # ...once more than this many of them share a trie node
+
+_default_policy = None
+_default_lock = threading.Lock()
+
+
+def _pattern_regex(pattern):
+    # robots.txt path pattern -> regex: * matches anything, a trailing $ anchors the end
+    anchored = pattern.endswith('$')
+    if anchored:
+        pattern = pattern[:-1]
+    return '.*'.join(re.escape(part) for part in pattern.split('*')) + (r'\Z' if anchored else '')
+
+
+class RobotsRules:
+    """The rules of one robots.txt for one user agent, indexed by the literal start of each pattern"""
+
+    # Longest matching pattern wins and Allow wins a tie. A path can only match rules whose
+    # literal start (the pattern up to its first *) it begins with, and those are found in
+    # one walk down a character trie. Plain prefix rules match by being reached; wildcard
+    # and $ rules need a regex, and where many of them share a node (the "/*?*param="
+    # kind) they are looked up by a few characters of the text they require.
+    def __init__(self, text="", user_agent=USER_AGENT, allow_all=False, disallow_all=False, error=None):
+        self.error = error
+        self.crawl_delay = None
+        self.sitemaps = []
+        rules = []
+        if disallow_all:
+            rules = [(True, False, '/')]
+        elif not allow_all:
+            rules = self._parse(text, user_agent.lower())
+
+        rules.sort(key=lambda rule: (len(rule[2]), rule[1]), reverse=True)
+        self.rules = rules
+        self._trie = {}
+        for _, allow, pattern in rules:
+            self._add(allow, pattern)
+        self._index_wildcards()
+
+    def _add(self, allow, pattern):
+        # Trie keys are single characters; '' holds the plain rules ending at a node, '*' its
+        # wildcard rules and None their gram index, none of which can be a character of a literal
+        literal = pattern.rstrip('$').split('*', 1)[0]
+        node = self._trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        rank = (len(pattern), allow)
+        if literal == pattern:
+            node.setdefault('', []).append((rank, allow, pattern))
+            return
+
+        # Longest literal piece after the start, a cheap substring test before the regex runs
+        required = max(pattern[len(literal):].rstrip('$').split('*'), key=len)
+        node.setdefault('*', []).append((rank, allow, pattern, re.compile(_pattern_regex(pattern)), required))
+
+    def _index_wildcards(self):
+        # Many wildcard rules on one node go into a dict by the first GRAM characters of their required
+        # text, only rules whose text is too short for that stay in the list checked for every path
+        stack = [self._trie]
+        while stack:
+            node = stack.pop()
+            stack.extend(child for key, child in node.items() if key not in ('', '*', None))
+            wildcards = node.get('*', ())
+            if len(wildcards) <= GRAM_INDEX_AFTER:
+                continue
+            by_gram = {}
+            short = []
+            for rule in wildcards:
+                if len(rule[4]) >= GRAM:
+                    by_gram.setdefault(rule[4][:GRAM], []).append(rule)
+                else:
+                    short.append(rule)
+            node['*'] = short
+            node[None] = by_gram
+
+    def _wildcards(self, node, path, grams):
+        # Wildcard rules of node that path might match, grams being path's GRAM-character slices
+        rules = node.get('*', ())
+        by_gram = node.get(None)
+        if by_gram is None:
+            return rules, grams
+        if grams is None:
+            grams = {path[i:i + GRAM] for i in range(len(path) - GRAM + 1)}
+        found = list(rules)
+        for gram in grams & by_gram.keys():
+            found.extend(by_gram[gram])
+        return found, grams
+
+    def _parse(self, text, agent):
+        # Groups of consecutive User-agent lines followed by their rules
+        groups = {}
+        delays = {}
+        current = []
+        in_rules = False
+        for line in text.splitlines():
+            line = line.split('#', 1)[0].strip()
+            if ':' not in line:
+                continue
+            field, value = (part.strip() for part in line.split(':', 1))
+            field = field.lower()
+            if field == 'user-agent':
+                if in_rules:
+                    current = []
+                    in_rules = False
+                current.append(value.lower())
+                groups.setdefault(value.lower(), [])
+            elif field in ('allow', 'disallow'):
+                in_rules = True
+                if value:
+                    for name in current:
+                        groups[name].append((True, field == 'allow', value))
+            elif field == 'crawl-delay':
+                in_rules = True
+                for name in current:
+                    try:
+                        delays[name] = float(value)
+                    except ValueError:
+                        pass
+            elif field == 'sitemap':
+                self.sitemaps.append(value)
+        name = agent if agent in groups else '*'
+        self.crawl_delay = delays.get(name)
+        return list(groups.get(name, []))
+
+    def blocking_rule(self, path):
+        # The Disallow pattern that blocks path (path plus query string), None when it may be fetched
+        best = None
+        grams = None
+        node = self._trie
+        depth = 0
+        while True:
+            for rank, allow, pattern in node.get('', ()):
+                if best is None or rank > best[0]:
+                    best = (rank, allow, pattern)
+            if '*' in node:
+                wildcards, grams = self._wildcards(node, path, grams)
+                for rank, allow, pattern, regex, required in wildcards:
+                    if (best is None or rank > best[0]) and required in path and regex.match(path):
+                        best = (rank, allow, pattern)
+            if depth == len(path):
+                break
+            node = node.get(path[depth])
+            if node is None:
+                break
+            depth += 1
+        if best is None or best[1]:
+            return None
+        return best[2]
+
+    def allowed(self, path):
+        return self.blocking_rule(path) is None
+
+
+class RobotsPolicy:
+    """robots.txt per site, cached on disk and revalidated with ETag / Last-Modified once expired"""
+
+    def __init__(self, path="robots_cache.json", ttl=CACHE_TTL, user_agent=USER_AGENT, session=None):
+        self.path = path
+        self.ttl = ttl
+        self.user_agent = user_agent
+        self.session = session or requests.Session()
+        # How many URLs scrapers were told not to fetch, and the latest of them as (url, pattern)
+        self.skipped = 0
+        self.skipped_examples = deque(maxlen=100)
+        self._reported = 0
+        self._rules = {}
+        self._lock = threading.Lock()
+        # Site -> Event set once the robots.txt being downloaded for it has arrived
+        self._fetching = {}
+        self._entries = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except ValueError:
+                self._entries = {}
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def _max_age(self, headers):
+        match = re.search(r'max-age=(\d+)', headers.get('Cache-Control', ''))
+        return min(self.ttl, int(match.group(1))) if match else self.ttl
+
+    def _refresh(self, site, entry):
+        # Conditional GET when we hold a copy; 304 just extends its life
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            response = self.session.get(f"{site}/robots.txt", headers=headers, timeout=10)
+        except requests.RequestException as e:
+            if entry:
+                # Unreachable: keep using the copy we have
+                entry['expires_at'] = time.time() + 3600
+                return entry
+            return {'status': 'unreachable', 'error': str(e), 'expires_at': time.time() + 600}
+
+        now = time.time()
+        if response.status_code == 304 and entry:
+            entry.update(fetched_at=now, expires_at=now + self._max_age(response.headers))
+            return entry
+        if response.status_code == 200:
+            return {'status': 'ok', 'text': response.text, 'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'), 'fetched_at': now,
+                    'expires_at': now + self._max_age(response.headers)}
+        if 400 <= response.status_code < 500:
+            # No robots.txt (404, 410, even 403) means no restrictions
+            return {'status': 'missing', 'fetched_at': now, 'expires_at': now + self.ttl}
+        if entry:
+            entry['expires_at'] = now + 3600
+            return entry
+        return {'status': 'unreachable', 'error': f"HTTP {response.status_code}", 'expires_at': now + 600}
+
+    def rules_for(self, url):
+        # RobotsRules of the url's site, fetched or revalidated only when the cached copy has expired.
+        # The download runs without the lock, so a slow site holds up only the threads waiting for it.
+        parts = urlsplit(url)
+        site = f"{parts.scheme or 'https'}://{parts.netloc}"
+        while True:
+            with self._lock:
+                rules = self._rules.get(site)
+                entry = self._entries.get(site)
+                if entry and entry['expires_at'] > time.time():
+                    return rules if rules is not None else self._parse(site, entry)
+                fetching = self._fetching.get(site)
+                if fetching is None:
+                    fetching = self._fetching[site] = threading.Event()
+                    break
+                if rules is not None:
+                    # Being revalidated by another thread, the expired copy is good until then
+                    return rules
+            fetching.wait()
+
+        try:
+            # A copy, the cached entry is only replaced under the lock
+            entry = self._refresh(site, dict(entry) if entry else None)
+            with self._lock:
+                self._entries[site] = entry
+                self._save()
+                return self._parse(site, entry)
+        finally:
+            with self._lock:
+                del self._fetching[site]
+            fetching.set()
+
+    def _parse(self, site, entry):
+        # Called with the lock held
+        if entry['status'] == 'ok':
+            rules = RobotsRules(entry['text'], self.user_agent)
+        elif entry['status'] == 'missing':
+            rules = RobotsRules(allow_all=True)
+        else:
+            # RFC 9309: a robots.txt that cannot be read means the whole site is off limits
+            print(f"Could not read {site}/robots.txt ({entry.get('error')}), not crawling {site}")
+            rules = RobotsRules(disallow_all=True, error=entry.get('error'))
+        self._rules[site] = rules
+        return rules
+
+    def check(self, url):
+        # Disallow pattern blocking url, None when it may be fetched; blocked URLs are recorded in skipped
+        parts = urlsplit(url)
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        rule = self.rules_for(url).blocking_rule(path)
+        if rule is not None:
+            with self._lock:
+                self.skipped += 1
+                self.skipped_examples.append((url, rule))
+        return rule
+
+    def allowed(self, url):
+        return self.check(url) is None
+
+    def filter(self, urls):
+        return [url for url in urls if self.allowed(url)]
+
+    def print_summary(self, examples=5):
+        # URLs skipped since the last summary, shared policies print each batch once
+        with self._lock:
+            count = self.skipped - self._reported
+            self._reported = self.skipped
+            recent = list(self.skipped_examples)[-count:] if count else []
+        if not count:
+            return
+        print(f"robots.txt: skipped {count} disallowed URLs")
+        for url, rule in recent[:examples]:
+            print(f"  {url} (Disallow: {rule})")
+        if count > examples:
+            print(f"  ... and {count - examples} more")
+
+
+def get_default_policy():
+    # One policy per process, shared by every scraper like the default rate limiter
+    global _default_policy
+    with _default_lock:
+        if _default_policy is None:
+            _default_policy = RobotsPolicy()
+        return _default_policy
+
+
+class RobotsDisallowed(Exception):
+    def __init__(self, url, rule):
+        super().__init__(f"{url} is disallowed by robots.txt (Disallow: {rule})")
+        self.url = url
+        self.rule = rule
+
+
+class RobotsAnalyzer:
+    def __init__(self, domain="https://www.booking.com", policy=None):
+        self.domain = domain
+        self.policy = policy
+
+    def analyze(self):
+        try:
+            rules = (self.policy or get_default_policy()).rules_for(self.domain)
+        except Exception as e:
+            return {"error": str(e)}
+        info = {
+            "crawl_delay": rules.crawl_delay,
+            "sitemaps": rules.sitemaps or None,
+            "can_fetch_home": rules.allowed("/"),
+            "can_fetch_search": rules.allowed("/searchresults.en-us.html")
+        }
+        if rules.error:
+            info["error"] = rules.error
+        return info
@@ -0,0 +1,292 @@
+from collections import deque
+import multiprocessing
+import os
+import re
+import signal
+import time
+
+import pandas as pd
+
+from crawler.rate_limiter import HostRateLimiter
+from crawler.urls import canonical_url, split_destinations
+from crawler.writer import Checkpoint, crawl_to_csv
+
+
+# A worker that has not produced a hotel for this long is taken to be stuck (hung Chromium, dead tab)
+STALL_TIMEOUT = 300
+POLL_INTERVAL = 0.5
+
+
+class Shard:
+    """One unit of work for a worker: a destination and date pair, optionally from a result offset"""
+
+    def __init__(self, destination, checkin, checkout, max_results=20, offset=0):
+        self.destination = destination
+        self.checkin = checkin
+        self.checkout = checkout
+        self.max_results = max_results
+        self.offset = offset
+
+    @property
+    def name(self):
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', self.destination).strip('_')
+        return f"{slug}_{self.checkin}_{self.checkout}_{self.offset}"
+
+    def __repr__(self):
+        return f"Shard({self.destination!r}, {self.checkin}, {self.checkout}, offset={self.offset})"
+
+
+def plan_shards(destinations, date_pairs, max_results=20, shard_size=None):
+    # Every destination x date pair, split into result-offset ranges of shard_size hotels when given
+    shards = []
+    for destination in destinations:
+        for checkin, checkout in date_pairs:
+            size = shard_size if shard_size and shard_size < max_results else max_results
+            for offset in range(0, max_results, size):
+                shards.append(Shard(destination, checkin, checkout, min(size, max_results - offset), offset))
+    return shards
+
+
+class SharedRateLimiter(HostRateLimiter):
+    """HostRateLimiter with one token bucket in shared memory, a single budget for every worker process"""
+
+    # The crawl targets one site, so the bucket is global rather than per host.
+    # state holds tokens, last update (wall clock), backoff and blocked-until.
+    def __init__(self, rate, burst, max_backoff=32, state=None, context=None):
+        super().__init__(rate=rate, burst=burst, max_backoff=max_backoff)
+        if state is None:
+            state = (context or multiprocessing).Array('d', [float(self.burst), time.time(), 1.0, 0.0])
+        self.state = state
+
+    def reserve(self, url):
+        with self.state.get_lock():
+            tokens, updated, backoff, blocked_until = self.state[:]
+            now = time.time()
+            rate = self.rate / backoff
+            tokens = min(self.burst, tokens + (now - updated) * rate) - 1
+            self.state[0], self.state[1] = tokens, now
+            wait = 0.0 if tokens >= 0 else -tokens / rate
+            return max(wait, blocked_until - now)
+
+    def report_success(self, url):
+        with self.state.get_lock():
+            self.state[2] = max(1.0, self.state[2] * 0.75)
+
+    def report_error(self, url, status=None, retry_after=None):
+        with self.state.get_lock():
+            backoff = self.state[2] = min(self.max_backoff, self.state[2] * 2)
+            if status in (429, 503):
+                try:
+                    pause = max(0.0, float(retry_after))
+                except (TypeError, ValueError):
+                    pause = backoff / self.rate
+                self.state[3] = max(self.state[3], time.time() + pause)
+        print(f"Backing off (all workers): rate now {self.rate / backoff:.2f} requests/s"
+              + (f" (HTTP {status})" if status else ""))
+
+
+class _Heartbeat:
+    # Passes rows through and stamps the time of each one for the parent's stall check
+    def __init__(self, scraper, beat):
+        self.scraper = scraper
+        self.beat = beat
+
+    def iter_hotels(self, *args, **kwargs):
+        for row in self.scraper.iter_hotels(*args, **kwargs):
+            self.beat.value = time.time()
+            yield row
+
+
+def _build_scraper(kind, limiter, headless, concurrency, base_url=None):
+    from crawler.async_handler import AsyncJSScraper
+    from crawler.fetcher import TieredFetcher
+    from crawler.js_handler import JSScraper
+
+    if kind == 'browser':
+        browser = JSScraper(headless=headless, rate_limiter=limiter)
+    else:
+        browser = AsyncJSScraper(headless=headless, concurrency=concurrency, rate_limiter=limiter)
+    scraper = TieredFetcher(browser=browser, workers=concurrency) if kind == 'tiered' else browser
+    if base_url:
+        # Search page of another host, e.g. the benchmark fixture server
+        browser.base_url = base_url
+        if kind == 'tiered':
+            scraper.static.base_url = base_url
+    return scraper
+
+
+def _run_shard(shard, path, kind, limiter_args, beat, headless, concurrency, base_url=None):
+    # Worker process: its own browser, the shared limiter, rows streamed to its own part file
+    if hasattr(os, 'setsid'):
+        # Own process group, so the parent can kill Chromium along with a stuck worker
+        os.setsid()
+    beat.value = time.time()
+    limiter = SharedRateLimiter(*limiter_args)
+    scraper = _Heartbeat(_build_scraper(kind, limiter, headless, concurrency, base_url), beat)
+    crawl_to_csv(scraper, path, shard.destination, shard.checkin, shard.checkout, shard.max_results, resume=True)
+
+
+class ShardedCrawler:
+    """Crawls shards in separate worker processes and merges them into one deduplicated CSV"""
+
+    # kind is 'async' (parallel detail tabs), 'browser' (JSScraper) or 'tiered'
+    # (static HTML first). A crashed or stalled worker is killed and its shard
+    # retried, resuming from the part file's checkpoint.
+    def __init__(self, workers=None, kind='async', headless=True, concurrency=4, rate=None, burst=None,
+                 work_dir="shards", retries=2, stall_timeout=STALL_TIMEOUT, base_url=None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.kind = kind
+        self.headless = headless
+        self.concurrency = concurrency
+        self.work_dir = work_dir
+        self.retries = retries
+        self.stall_timeout = stall_timeout
+        self.base_url = base_url
+        # Playwright does not survive a fork, workers always start from a fresh interpreter
+        self._context = multiprocessing.get_context('spawn')
+        if rate is None:
+            seeded = HostRateLimiter.from_robots()
+            rate, burst = seeded.rate, burst or seeded.burst
+        self.limiter = SharedRateLimiter(rate, burst or 1, context=self._context)
+        self.failed = []
+
+    def part_path(self, shard):
+        return os.path.join(self.work_dir, f"{shard.name}.csv")
+
+    def _start(self, shard):
+        path = self.part_path(shard)
+        checkpoint_path = path + '.checkpoint'
+        if shard.offset and not os.path.exists(checkpoint_path):
+            # First attempt of an offset shard: start the crawl at its first result page
+            checkpoint = Checkpoint(checkpoint_path)
+            checkpoint.mark_page(shard.offset, 0)
+            checkpoint.close()
+
+        beat = self._context.Value('d', time.time())
+        limiter_args = (self.limiter.rate, self.limiter.burst, self.limiter.max_backoff, self.limiter.state)
+        process = self._context.Process(
+            target=_run_shard, name=f"shard-{shard.name}",
+            args=(shard, path, self.kind, limiter_args, beat, self.headless, self.concurrency, self.base_url),
+        )
+        process.start()
+        return process, beat
+
+    def _kill(self, process):
+        try:
+            if hasattr(os, 'killpg'):
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except (ProcessLookupError, PermissionError):
+            process.kill()
+        process.join(10)
+
+    def run(self, shards):
+        # Returns the part file of every shard that finished, in shard order
+        os.makedirs(self.work_dir, exist_ok=True)
+        pending = deque((shard, 0) for shard in shards)
+        running = {}
+        finished = set()
+        self.failed = []
+
+        try:
+            while pending or running:
+                while pending and len(running) < self.workers:
+                    shard, attempt = pending.popleft()
+                    running[shard] = (attempt,) + self._start(shard)
+
+                time.sleep(POLL_INTERVAL)
+                for shard, (attempt, process, beat) in list(running.items()):
+                    if process.is_alive():
+                        if time.time() - beat.value < self.stall_timeout:
+                            continue
+                        print(f"{shard} made no progress for {self.stall_timeout} s, killing its worker")
+                        self._kill(process)
+                    else:
+                        process.join()
+
+                    del running[shard]
+                    if process.exitcode == 0:
+                        finished.add(shard)
+                    elif attempt < self.retries:
+                        print(f"{shard} failed (exit code {process.exitcode}), retrying")
+                        pending.append((shard, attempt + 1))
+                    else:
+                        print(f"{shard} failed after {attempt + 1} attempts, keeping its partial rows")
+                        self.failed.append(shard)
+        finally:
+            # Ctrl-C or an error here: workers run in their own session and never see the
+            # signal, so take down each one's process group along with its browser
+            for _, process, _ in running.values():
+                if process.is_alive():
+                    self._kill(process)
+
+        # Failed shards still contribute whatever they wrote before dying
+        return [(shard, self.part_path(shard)) for shard in shards
+                if shard in finished or os.path.exists(self.part_path(shard))]
+
+    def crawl(self, destinations, date_pairs, max_results=20, output="hotels_sharded.csv", shard_size=None):
+        shards = plan_shards(destinations, date_pairs, max_results, shard_size)
+        print(f"Crawling {len(shards)} shards with {min(self.workers, len(shards))} workers")
+        parts = self.run(shards)
+        total = merge_shards(parts, output)
+        # Finished part files are merged, failed ones stay with their checkpoints for a resumed run
+        for shard, path in parts:
+            if shard not in self.failed:
+                for leftover in (path, path + '.checkpoint'):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+        return total
+
+
+def merge_shards(parts, output):
+    # One CSV from the part files, a hotel found by two shards of the same search keeps its first row
+    frames = []
+    for shard, path in parts:
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            continue
+        df = pd.read_csv(path)
+        df['destination'] = shard.destination
+        df['checkin'] = shard.checkin
+        df['checkout'] = shard.checkout
+        frames.append(df)
+    if not frames:
+        return 0
+
+    merged = pd.concat(frames, ignore_index=True)
+    key = merged['url'].map(canonical_url)
+    merged = merged[~pd.DataFrame({'key': key, 'destination': merged['destination'], 'checkin': merged['checkin'],
+                                   'checkout': merged['checkout']}).duplicated()]
+    merged.to_csv(output, index=False)
+    print(f"Merged {len(merged)} hotels from {len(frames)} shards into {output}")
+    return len(merged)
+
+
+def main():
+    # python -m crawler.sharding "Paris, Madrid" 2025-12-01:2025-12-02 [2025-12-08:2025-12-09 ...]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crawl destinations and date pairs across worker processes")
+    parser.add_argument("destinations")
+    parser.add_argument("dates", nargs='+', help="checkin:checkout pairs, YYYY-MM-DD:YYYY-MM-DD")
+    parser.add_argument("--max-results", type=int, default=20, help="hotels per destination and date pair")
+    parser.add_argument("--shard-size", type=int, help="split each search into offset ranges of this many hotels")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--kind", default="async", choices=['async', 'browser', 'tiered'])
+    parser.add_argument("--concurrency", type=int, default=4, help="detail tabs per worker")
+    parser.add_argument("--rate", type=float, help="navigations per second across all workers")
+    parser.add_argument("--output", default="hotels_sharded.csv")
+    parser.add_argument("--show-browser", action="store_true")
+    args = parser.parse_args()
+
+    date_pairs = [tuple(pair.split(':', 1)) for pair in args.dates]
+    crawler = ShardedCrawler(workers=args.workers, kind=args.kind, headless=not args.show_browser,
+                             concurrency=args.concurrency, rate=args.rate)
+    crawler.crawl(split_destinations(args.destinations), date_pairs, args.max_results, args.output,
+                  args.shard_size)
+    if crawler.failed:
+        print(f"{len(crawler.failed)} shards failed, run the same command again to resume them")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import os
+import re
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from crawler.normalize import normalize_frame
+
+
+DEFAULT_ROOT = "crawl_store"
+
+# Every crawl lands in <root>/destination=<dest>/crawl_date=<yyyy-mm-dd>/checkin=<yyyy-mm-dd>/checkout=<yyyy-mm-dd>/
+# part-0.parquet, so searches of one destination for other stays on the same day keep their own files.
+# Crawls imported without their stay (old CSV names) read back with checkin and checkout null.
+PARTITION_SCHEMA = pa.schema([
+    ('destination', pa.string()),
+    ('crawl_date', pa.string()),
+    ('checkin', pa.string()),
+    ('checkout', pa.string()),
+])
+
+# Raw page text is kept next to its parsed value so nothing is lost by the typing
+COLUMNS = pa.schema([
+    ('name', pa.string()),
+    ('price', pa.string()),
+    ('price_numeric', pa.float64()),
+    ('currency', pa.string()),
+    ('score', pa.string()),
+    ('score_clean', pa.float64()),
+    ('review_count', pa.int64()),
+    ('location', pa.string()),
+    ('distance_from_center', pa.string()),
+    ('facilities', pa.string()),
+    ('cleanliness_rating', pa.float64()),
+    ('comfort_rating', pa.float64()),
+    ('location_rating', pa.float64()),
+    ('facilities_rating', pa.float64()),
+    ('staff_rating', pa.float64()),
+    ('value_for_money', pa.float64()),
+    ('free_wifi', pa.string()),
+    ('url', pa.string()),
+])
+SCHEMA = pa.schema(list(COLUMNS) + list(PARTITION_SCHEMA))
+
+# hotels_data_<dest>_<yyyymmdd>.csv, and since jobs name files by search too, ..._<checkin>-<checkout>_<adults>a.csv
+CSV_NAME_PATTERN = re.compile(r'hotels_data_(.+?)_(\d{4})(\d{2})(\d{2})(?:_(\d{8})-(\d{8})_\d+a)?\.csv$')
+
+
+def _iso_day(value):
+    # date, yyyy-mm-dd or yyyymmdd as yyyy-mm-dd, None stays None
+    if value is None or isinstance(value, date):
+        return value and value.isoformat()
+    value = str(value)
+    return f"{value[:4]}-{value[4:6]}-{value[6:]}" if len(value) == 8 else value
+
+
+def _typed_frame(df):
+    # Cast a crawl's rows to COLUMNS, parsing prices and scores from the page text
+    df = normalize_frame(df)
+    for field in COLUMNS:
+        if field.name not in df.columns:
+            df[field.name] = None
+        elif pa.types.is_integer(field.type):
+            df[field.name] = pd.to_numeric(df[field.name], errors='coerce').astype('Int64')
+        elif pa.types.is_floating(field.type):
+            df[field.name] = pd.to_numeric(df[field.name], errors='coerce')
+        else:
+            df[field.name] = df[field.name].map(lambda v: None if pd.isna(v) else str(v))
+    return df[COLUMNS.names]
+
+
+def read_crawl_csv(path, destination=None, crawl_date=None, checkin=None, checkout=None):
+    # Destination, date and stay default to the ones in a hotels_data_<dest>_<yyyymmdd>[...].csv name
+    match = CSV_NAME_PATTERN.search(os.path.basename(path))
+    if match:
+        destination = destination or match.group(1).replace('_', ' ')
+        crawl_date = crawl_date or '-'.join(match.group(2, 3, 4))
+        checkin = checkin or match.group(5)
+        checkout = checkout or match.group(6)
+    if destination is None:
+        raise ValueError(f"Cannot tell the destination of {path}, pass destination=")
+
+    try:
+        df = pd.read_csv(path, encoding='utf-8')
+    except UnicodeDecodeError:
+        df = pd.read_csv(path, encoding='latin1')
+    return df, destination, _iso_day(crawl_date), _iso_day(checkin), _iso_day(checkout)
+
+
+class CrawlStore:
+    """Parquet dataset of every crawl, partitioned by destination, crawl date and stay"""
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+        self.partitioning = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+    def exists(self):
+        return os.path.isdir(self.root) and any(os.scandir(self.root))
+
+    def write(self, rows, destination, crawl_date=None, checkin=None, checkout=None):
+        # Replaces the partition of that day and stay, so a re-crawl of the same search never duplicates rows
+        df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+        if df.empty:
+            return 0
+        keys = {
+            'destination': destination,
+            'crawl_date': _iso_day(crawl_date or date.today()),
+            'checkin': _iso_day(checkin),
+            'checkout': _iso_day(checkout),
+        }
+
+        table = pa.Table.from_pandas(_typed_frame(df), schema=COLUMNS, preserve_index=False)
+        for name, value in keys.items():
+            table = table.append_column(name, pa.array([value] * len(table), pa.string()))
+
+        ds.write_dataset(
+            table, self.root,
+            format='parquet',
+            partitioning=self.partitioning,
+            basename_template='part-{i}.parquet',
+            existing_data_behavior='delete_matching',
+            file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+        )
+        return len(table)
+
+    def import_csv(self, path, destination=None, crawl_date=None, checkin=None, checkout=None):
+        df, destination, crawl_date, checkin, checkout = read_crawl_csv(path, destination, crawl_date,
+                                                                        checkin, checkout)
+        return self.write(df, destination, crawl_date, checkin, checkout)
+
+    def dataset(self):
+        return ds.dataset(self.root, format='parquet', schema=SCHEMA, partitioning=self.partitioning)
+
+    def partitions(self):
+        # (destination, crawl_date) of every stored crawl, read from the directory names only
+        found = set()
+        if not self.exists():
+            return []
+        for fragment in self.dataset().get_fragments():
+            keys = ds.get_partition_keys(fragment.partition_expression)
+            found.add((keys.get('destination'), keys.get('crawl_date')))
+        return sorted(found)
+
+    def destinations(self):
+        return sorted({dest for dest, _ in self.partitions()})
+
+    def latest_dates(self, destinations=None):
+        latest = {}
+        for dest, crawl_date in self.partitions():
+            if destinations is None or dest in destinations:
+                latest[dest] = max(latest.get(dest, crawl_date), crawl_date)
+        return latest
+
+    def read(self, columns=None, destinations=None, crawl_dates=None, price_range=None,
+             score_range=None, latest=False):
+        # Only the requested columns are decoded and the filters are pushed down to the
+        # partition directories and Parquet row-group statistics
+        if not self.exists():
+            return pd.DataFrame(columns=columns or SCHEMA.names)
+
+        conditions = []
+        if latest:
+            # Newest crawl of each destination
+            pairs = self.latest_dates(destinations)
+            if not pairs:
+                return pd.DataFrame(columns=columns or SCHEMA.names)
+            latest_expr = None
+            for dest, crawl_date in pairs.items():
+                expr = (pc.field('destination') == dest) & (pc.field('crawl_date') == crawl_date)
+                latest_expr = expr if latest_expr is None else latest_expr | expr
+            conditions.append(latest_expr)
+        elif destinations is not None:
+            conditions.append(pc.field('destination').isin(list(destinations)))
+        if crawl_dates is not None:
+            conditions.append(pc.field('crawl_date').isin([str(d) for d in crawl_dates]))
+        if price_range is not None:
+            low, high = price_range
+            conditions.append((pc.field('price_numeric') >= low) & (pc.field('price_numeric') <= high))
+        if score_range is not None:
+            low, high = score_range
+            conditions.append((pc.field('score_clean') >= low) & (pc.field('score_clean') <= high))
+
+        condition = None
+        for expr in conditions:
+            condition = expr if condition is None else condition & expr
+        return self.dataset().to_table(columns=columns, filter=condition).to_pandas()
+
+
+def main():
+    # One-off migration: python -m crawler.store hotels_data_*.csv
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Import crawl CSV files into the Parquet crawl store")
+    parser.add_argument('files', nargs='*', default=['hotels_data_*.csv'])
+    parser.add_argument('--root', default=DEFAULT_ROOT)
+    args = parser.parse_args()
+
+    store = CrawlStore(args.root)
+    for pattern in args.files:
+        for path in sorted(glob.glob(pattern)):
+            print(f"{path}: {store.import_csv(path)} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+import re
+
+import pandas as pd
+
+from crawler.js_handler import build_dataframe
+from crawler.normalize import parse_prices
+from crawler.urls import canonical_url
+
+
+def date_grid(first_checkin, last_checkin=None, nights=(1,), step=1):
+    # Every check-in from first to last (every step days) paired with every stay length in nights
+    day = date.fromisoformat(str(first_checkin))
+    last = date.fromisoformat(str(last_checkin)) if last_checkin else day
+    pairs = []
+    while day <= last:
+        for n in nights:
+            pairs.append((day.isoformat(), (day + timedelta(days=int(n))).isoformat()))
+        day += timedelta(days=step)
+    return pairs
+
+
+def sweep(scraper, destination, date_pairs, max_results=20, adults=2, children=0, rooms=1):
+    """Prices of every hotel for every date pair, each hotel's detail page visited once"""
+    # scraper is a JSScraper, AsyncJSScraper or TieredFetcher. Returns (prices, hotels):
+    # prices has one row per hotel and date pair, hotels one row per hotel with the
+    # date-independent columns (score, location, facilities).
+    date_pairs = [(str(checkin), str(checkout)) for checkin, checkout in date_pairs]
+    cards_by_dates = scraper.scrape_cards(destination, date_pairs, max_results, adults, children, rooms)
+
+    hotels = {}
+    rows = []
+    for (checkin, checkout), cards in cards_by_dates.items():
+        for card in cards:
+            key = canonical_url(card['url'])
+            hotels.setdefault(key, card)
+            rows.append({'url': key, 'name': card['name'], 'checkin': checkin, 'checkout': checkout,
+                         'price': card['price']})
+
+    print(f"{len(date_pairs)} searches found {len(rows)} prices for {len(hotels)} hotels, "
+          f"visiting {len(hotels)} detail pages instead of {len(rows)}")
+    details = build_dataframe(scraper.scrape_details(list(hotels.values())))
+
+    prices = pd.DataFrame(rows, columns=['url', 'name', 'checkin', 'checkout', 'price'])
+    if not prices.empty:
+        prices = pd.concat([prices, parse_prices(prices['price'])], axis=1)
+    if not details.empty:
+        # The price on a detail row belongs to whichever search found the hotel first
+        details['url'] = details['url'].map(canonical_url)
+        details = details.drop(columns=['price', 'price_numeric', 'currency'], errors='ignore')
+    return prices, details
+
+
+def sweep_to_csv(scraper, destination, date_pairs, path, max_results=20, **search):
+    # Writes the long price table to path and the hotel table next to it as <path>_hotels.csv
+    prices, hotels = sweep(scraper, destination, date_pairs, max_results, **search)
+    prices.insert(0, 'destination', destination)
+    prices.to_csv(path, index=False)
+    hotels_path = re.sub(r'\.csv$', '', path) + '_hotels.csv'
+    hotels.to_csv(hotels_path, index=False)
+    print(f"Saved {len(prices)} prices to {path} and {len(hotels)} hotels to {hotels_path}")
+    return prices, hotels
+
+
+def main():
+    # python -m crawler.sweep Paris 2025-12-01 2025-12-14 --nights 1,2,7
+    import argparse
+    from crawler.async_handler import AsyncJSScraper
+    from crawler.detail_cache import DetailCache
+    from crawler.fetcher import TieredFetcher
+
+    parser = argparse.ArgumentParser(description="Prices for a grid of check-in/check-out dates, "
+                                                 "detail pages fetched once per hotel")
+    parser.add_argument("destination")
+    parser.add_argument("first_checkin", help="YYYY-MM-DD")
+    parser.add_argument("last_checkin", nargs='?', help="YYYY-MM-DD, defaults to the first")
+    parser.add_argument("--nights", default="1", help="comma separated stay lengths, e.g. 1,2,7")
+    parser.add_argument("--step", type=int, default=1, help="days between check-ins")
+    parser.add_argument("--max-results", type=int, default=20, help="hotels per date pair")
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel detail tabs")
+    parser.add_argument("--browser-only", action="store_true", help="skip the static HTML tier")
+    parser.add_argument("--output", help="price CSV, defaults to hotels_sweep_<destination>_<today>.csv")
+    args = parser.parse_args()
+
+    date_pairs = date_grid(args.first_checkin, args.last_checkin,
+                           [int(n) for n in args.nights.split(',')], args.step)
+    detail_cache = DetailCache()
+    scraper = AsyncJSScraper(concurrency=args.concurrency, detail_cache=detail_cache)
+    if not args.browser_only:
+        scraper = TieredFetcher(browser=scraper, detail_cache=detail_cache)
+
+    slug = args.destination.replace(',', '').replace(' ', '_')
+    path = args.output or f"hotels_sweep_{slug}_{date.today().strftime('%Y%m%d')}.csv"
+    sweep_to_csv(scraper, args.destination, date_pairs, path, args.max_results)
+    detail_cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+
+# hotel/gb/foo.en-gb.html and hotel/gb/foo.html are the same property
+LOCALE_SUFFIX = re.compile(r'\.[a-z]{2}(-[a-z]{2})?\.html$')
+
+
+def split_destinations(text):
+    # "Paris, Madrid" -> ["Paris", "Madrid"], also accepts a list
+    if isinstance(text, str):
+        text = re.split(r'[,;\n]', text)
+
+    seen = set()
+    return [d.strip() for d in text if d.strip() and not (d.strip() in seen or seen.add(d.strip()))]
+
+
+def canonical_url(url):
+    # One key per hotel: no query string (session, search and tracking params), no fragment, no locale.
+    # A non-default port stays, hotels of two local test servers are different hotels.
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = LOCALE_SUFFIX.sub('.html', parts.path)
+    return urlunsplit((parts.scheme.lower() or "https", host, path, "", ""))
@@ -0,0 +1,167 @@
+import csv
+import json
+import os
+from datetime import date
+
+from crawler.urls import canonical_url
+
+
+class StreamingCSVWriter:
+    """Appends each row to the CSV as soon as it is produced"""
+
+    def __init__(self, path, fieldnames=None, append=False):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.rows_written = 0
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        if exists and fieldnames is None:
+            # Keep the column order of the file we are appending to
+            with open(path, newline='', encoding='utf-8') as f:
+                self.fieldnames = next(csv.reader(f), None)
+        self._file = open(path, 'a' if exists else 'w', newline='', encoding='utf-8')
+        self._writer = None
+        self._header_written = exists
+
+    def write(self, row):
+        if self._writer is None:
+            self.fieldnames = self.fieldnames or list(row)
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+            if not self._header_written:
+                self._writer.writeheader()
+                self._header_written = True
+        self._writer.writerow(row)
+        # Flush per row so a crash loses at most the row being written
+        self._file.flush()
+        self.rows_written += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class Checkpoint:
+    """Append-only journal of finished hotel URLs and result pages for one crawl"""
+
+    # Each line is {"search": parameters of the crawl}, {"done": url} or {"page": offset, "seen": hotels
+    # counted so far}. The page watermark never passes a hotel that failed, so a resume goes back for it.
+    def __init__(self, path):
+        self.path = path
+        self.search = None
+        self.completed = set()
+        self.page_offset = 0
+        self.seen = 0
+        self._held = False
+        if os.path.exists(path):
+            self._load()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _load(self):
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Last line may be cut short by the crash we are resuming from
+                    continue
+                if 'search' in entry:
+                    self.search = entry['search']
+                elif 'done' in entry:
+                    self.completed.add(entry['done'])
+                elif 'page' in entry:
+                    self.page_offset = entry['page']
+                    self.seen = entry['seen']
+
+    def _append(self, entry):
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+
+    def is_done(self, url):
+        return canonical_url(url) in self.completed
+
+    def mark_done(self, url):
+        key = canonical_url(url)
+        if key not in self.completed:
+            self.completed.add(key)
+            self._append({'done': key})
+
+    def set_search(self, search):
+        self.search = search
+        self._append({'search': search})
+
+    def mark_page(self, offset, seen, urls=()):
+        # Every card before this result offset has been handed out, urls being those of this page.
+        # Once one of them is not done the watermark stays put for the rest of the crawl.
+        if self._held or not all(self.is_done(url) for url in urls):
+            self._held = True
+            return
+        self.page_offset = offset
+        self.seen = seen
+        self._append({'page': offset, 'seen': seen})
+
+    def close(self):
+        self._file.close()
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def crawl_to_csv(scraper, path, destination, checkin, checkout, max_results=20, resume=False, store=None,
+                 history=None, **search):
+    # Stream scraper.iter_hotels() into path, resume=True continues an interrupted crawl of the same file.
+    # With a CrawlStore the finished file is also written to the destination's partition for today,
+    # with a PriceHistory its prices and scores are added to the hotels' time series.
+    checkpoint_path = path + '.checkpoint'
+    resuming = resume and os.path.exists(checkpoint_path)
+    if not resuming and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    checkpoint = Checkpoint(checkpoint_path)
+    wanted = dict(search, destination=destination, checkin=str(checkin), checkout=str(checkout),
+                  max_results=max_results)
+    if resuming and checkpoint.search not in (None, wanted):
+        # Left by a crawl of other dates or settings, its hotels are not this crawl's
+        print(f"{path} was started for another search, starting over")
+        checkpoint.remove()
+        checkpoint = Checkpoint(checkpoint_path)
+        resuming = False
+    if checkpoint.search is None:
+        checkpoint.set_search(wanted)
+    if resuming:
+        print(f"Resuming {path}: {len(checkpoint.completed)} hotels already done")
+
+    with StreamingCSVWriter(path, append=resuming) as writer:
+        try:
+            for row in scraper.iter_hotels(destination, checkin, checkout, max_results,
+                                           checkpoint=checkpoint, **search):
+                writer.write(row)
+                checkpoint.mark_done(row['url'])
+        except BaseException:
+            # Ctrl-C, crash or timeout: keep the checkpoint for the next resume
+            checkpoint.close()
+            raise
+
+    # The file now holds every completed hotel. A crawl that came up short may
+    # have stopped on an error the scraper swallowed, so keep its checkpoint.
+    total = len(checkpoint.completed)
+    if total == 0:
+        # Leave no header-only file behind for the dashboard to pick up
+        os.remove(path)
+    else:
+        if store is not None:
+            store.import_csv(path, destination=destination, crawl_date=date.today(), checkin=checkin,
+                             checkout=checkout)
+        if history is not None:
+            history.ingest_csv(path, destination=destination, crawl_date=date.today(), checkin=checkin,
+                               checkout=checkout)
+    if total >= max_results:
+        checkpoint.remove()
+    else:
+        checkpoint.close()
+    return total
@@ -1,273 +1,358 @@
-import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import matplotlib.pyplot as plt
-from datetime import datetime
-import glob
-import os
-# Set page config must be the first Streamlit command
-st.set_page_config(page_title="Booking.com Crawler", layout="wide")
-
-
-def clean_price(price_series):
-    """Helper function to clean price data"""
-    return (
-        price_series
-        .str.replace(r'[^\d.]', '', regex=True)
-        .replace('', np.nan)
-        .dropna()
-        .astype(float)
-    )
-
-
-def clean_score(score_series):
-    """Helper function to clean score data"""
-    return (
-        score_series
-        .str.extract(r'(\d+\.\d+)')[0]
-        .replace('', np.nan)
-        .dropna()
-        .astype(float)
-    )
-
-
-# Replace the load_latest_data function in app.py with:
-def load_latest_data():
-    """Load the most recent hotels data file with proper error handling"""
-    try:
-        # Find all matching files
-        files = glob.glob("hotels_data_*.csv")
-        if not files:
-            st.warning("No hotel data files found. Please run the crawler first.")
-            return None
-
-        # Get the most recent file by modification time
-        latest_file = max(files, key=os.path.getmtime)
-        st.info(f"Loading data from: {latest_file}")
-
-        # Try different encodings if needed
-        try:
-            df = pd.read_csv(latest_file, encoding='utf-8')
-        except UnicodeDecodeError:
-            try:
-                df = pd.read_csv(latest_file, encoding='latin1')
-            except Exception as e:
-                st.error(f"Failed to read CSV file: {str(e)}")
-                return None
-
-        # Ensure required columns exist
-        if 'price' in df.columns and 'price_numeric' not in df.columns:
-            df['price_numeric'] = clean_price(df['price'])
-        if 'score' in df.columns and 'score_clean' not in df.columns:
-            df['score_clean'] = clean_score(df['score'])
-
-        # Check if facilities column exists
-        if 'facilities' not in df.columns:
-            st.warning("Facilities data not found in the CSV file. The scraper may need to be updated.")
-            df['facilities'] = "No data available"  # Add placeholder
-
-        return df
-
-    except Exception as e:
-        st.error(f"Error loading data: {str(e)}")
-        return None
-
-
-def create_dashboard(data):
-    def create_dashboard(data):
-        st.title("🏨 Booking.com Data Crawler")
-
-        # Debug info
-        st.write(f"Data shape: {data.shape}")
-        st.write("Columns available:", data.columns.tolist())
-
-        # Check if we have valid data
-        if data.empty:
-            st.warning("No hotel data available. Please run the crawler first.")
-            return
-
-        # Ensure required columns exist
-        if 'price_numeric' not in data.columns:
-            data['price_numeric'] = clean_price(data['price'])
-        if 'score_clean' not in data.columns:
-            data['score_clean'] = clean_score(data['score'])
-        if 'facilities' not in data.columns:
-            data['facilities'] = "No data available"
-
-    # Sidebar filters
-    st.sidebar.header("Filters")
-
-    # Get min/max values for filters
-    min_price, max_price = float(data['price_numeric'].min()), float(data['price_numeric'].max())
-    min_score, max_score = float(data['score_clean'].min()), float(data['score_clean'].max())
-
-    # Create filters
-    price_range = st.sidebar.slider(
-        "Price Range",
-        min_value=min_price,
-        max_value=max_price,
-        value=(min_price, max_price))
-
-    score_range = st.sidebar.slider(
-        "Review Score Range",
-        min_value=min_score,
-        max_value=max_score,
-        value=(min_score, max_score))
-
-    # Apply filters
-    filtered_data = data[
-        (data['price_numeric'] >= price_range[0]) &
-        (data['price_numeric'] <= price_range[1]) &
-        (data['score_clean'] >= score_range[0]) &
-        (data['score_clean'] <= score_range[1])
-        ]
-
-    # Main content - Data Table
-    st.header("📊 Hotel Data Table")
-    st.dataframe(filtered_data.style.format({
-        'price_numeric': '${:.2f}',
-        'score_clean': '{:.1f}'
-    }), height=600)
-
-    # Visualizations Section
-    st.header("📈 Data Visualizations")
-
-    # First row of charts
-    col1, col2 = st.columns(2)
-
-    with col1:
-        st.subheader("Price Distribution")
-        try:
-            fig, ax = plt.subplots(figsize=(8, 4))
-            ax.hist(filtered_data['price_numeric'], bins=20, color='skyblue', edgecolor='black')
-            ax.set_xlabel('Price ($)')
-            ax.set_ylabel('Count')
-            ax.set_title('Price Distribution')
-            st.pyplot(fig)
-            plt.close()
-        except Exception as e:
-            st.error(f"Could not create price distribution: {str(e)}")
-            st.write("Price data sample:", filtered_data['price_numeric'].head())
-
-    with col2:
-        st.subheader("Review Score Distribution")
-        try:
-            fig, ax = plt.subplots(figsize=(8, 4))
-            ax.hist(filtered_data['score_clean'], bins=np.arange(0, 10.5, 0.5), color='lightgreen', edgecolor='black')
-            ax.set_xlabel('Review Score')
-            ax.set_ylabel('Count')
-            ax.set_title('Review Score Distribution')
-            ax.set_xticks(np.arange(0, 10.5, 1))
-            st.pyplot(fig)
-            plt.close()
-        except Exception as e:
-            st.error(f"Could not create score distribution: {str(e)}")
-            st.write("Score data sample:", filtered_data['score_clean'].head())
-
-    # Second row of charts
-    col3, col4 = st.columns(2)
-
-    with col3:
-        st.subheader("Price vs. Rating")
-        try:
-            fig, ax = plt.subplots(figsize=(8, 4))
-            ax.scatter(filtered_data['price_numeric'], filtered_data['score_clean'], alpha=0.6)
-            ax.set_xlabel('Price ($)')
-            ax.set_ylabel('Review Score')
-            ax.set_title('Price vs. Rating')
-
-            # Add simple linear regression line
-            if len(filtered_data) > 1:
-                x = filtered_data['price_numeric']
-                y = filtered_data['score_clean']
-                m, b = np.polyfit(x, y, 1)
-                ax.plot(x, m * x + b, color='red')
-
-            st.pyplot(fig)
-            plt.close()
-        except Exception as e:
-            st.error(f"Could not create scatter plot: {str(e)}")
-            st.write("Data sample:", filtered_data[['price_numeric', 'score_clean']].head())
-
-    # In the facilities analysis section (around line 150), replace with:
-    with col4:
-        st.subheader("Facilities Analysis")
-        if 'facilities' in filtered_data.columns:
-            try:
-                # Convert all facilities to string and clean
-                filtered_data['facilities'] = filtered_data['facilities'].astype(str)
-
-                # Remove "No facilities listed" and empty entries
-                facilities_data = filtered_data[
-                    (~filtered_data['facilities'].str.contains('No facilities listed')) &
-                    (filtered_data['facilities'] != 'nan') &
-                    (filtered_data['facilities'] != '')
-                    ]
-
-                if len(facilities_data) > 0:
-                    # Split and count facilities
-                    all_facilities = facilities_data['facilities'].str.split(',\s*').explode()
-                    facility_counts = all_facilities.value_counts().head(10)
-
-                    if len(facility_counts) > 0:
-                        fig = px.bar(
-                            facility_counts,
-                            orientation='h',
-                            labels={'index': 'Facility', 'value': 'Count'},
-                            title='Top 10 Facilities'
-                        )
-                        fig.update_layout(yaxis={'categoryorder': 'total ascending'})
-                        st.plotly_chart(fig, use_container_width=True)
-                    else:
-                        st.warning("No facilities data available after processing")
-                else:
-                    st.warning("No hotels with listed facilities found")
-            except Exception as e:
-                st.error(f"Could not create facilities analysis: {str(e)}")
-                st.write("Facilities data sample:", filtered_data['facilities'].head())
-        else:
-            st.warning("Facilities data not available in this dataset")
-
-    # Metrics Section
-    st.header("📊 Key Metrics")
-    mcol1, mcol2, mcol3, mcol4 = st.columns(4)
-    mcol1.metric("Total Hotels", len(filtered_data))
-    mcol2.metric("Average Price", f"${filtered_data['price_numeric'].mean():.2f}")
-    mcol3.metric("Average Rating", f"{filtered_data['score_clean'].mean():.1f}/10")
-    mcol4.metric("Highest Rated", filtered_data.loc[filtered_data['score_clean'].idxmax()]['name'])
-
-    # Download button
-    st.download_button(
-        label="Download Filtered Data as CSV",
-        data=filtered_data.to_csv(index=False),
-        file_name=f"filtered_hotels_{datetime.now().strftime('%Y%m%d')}.csv",
-        mime="text/csv"
-    )
-
-
-if __name__ == "__main__":
-    # Load the data
-    data = load_latest_data()
-
-    if data is None:
-        # Create dummy data if no file found
-        data = pd.DataFrame({
-            'name': ['Hotel A', 'Hotel B', 'Hotel C'],
-            'price': ['$100', '$150', '$200'],
-            'score': ['8.5/10', '9.0/10', '7.8/10'],
-            'location': ['Location A', 'Location B', 'Location C'],
-            'price_numeric': [100, 150, 200],
-            'score_clean': [8.5, 9.0, 7.8],
-            'facilities': ['Free WiFi, Pool', 'Free WiFi, Parking', 'Restaurant, Bar']
-        })
-        st.warning("No hotel data file found. Showing sample data.")
-
-    # Clean the data if needed
-    if not data.empty:
-        if 'price' in data.columns and 'price_numeric' not in data.columns:
-            data['price_numeric'] = clean_price(data['price'])
-        if 'score' in data.columns and 'score_clean' not in data.columns:
-            data['score_clean'] = clean_score(data['score'])
-
-    create_dashboard(data)
\ No newline at end of file
+import streamlit as st
+import pandas as pd
+import numpy as np
+from datetime import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler.store import CrawlStore  # noqa: E402
+from crawler.facilities_index import FacilitiesIndex  # noqa: E402
+from dashboard.data import (  # noqa: E402
+    HISTORY_PATH, csv_key, destination_hotels, destination_trend, facilities_index, filter_mask, filtered_csv,
+    histogram_bins, histogram_counts, history_destinations, history_version, hotel_trend, latest_csv, load_frame,
+    price_drops, regression, store_destinations, store_key, store_latest_dates, store_version, value_range,
+)
+
+# Above this many hotels the table is paged and charts are drawn from pre-binned data
+LARGE_DATA_ROWS = 5000
+
+# Set page config must be the first Streamlit command
+st.set_page_config(page_title="Booking.com Crawler", layout="wide")
+
+
+def load_store_data(store, destinations=None, version=None):
+    """Latest crawl of each destination from the Parquet crawl store"""
+    try:
+        key = store_key(store, destinations, version)
+        df = load_frame(key)
+    except Exception as e:
+        st.error(f"Failed to read the crawl store: {str(e)}")
+        return None, None
+    if df.empty:
+        return None, None
+
+    dates = store_latest_dates(*key[1:])
+    st.info("Loading data from the crawl store: " + ", ".join(f"{d} ({dates[d]})" for d in sorted(dates)))
+    return key, df
+
+
+def load_latest_data():
+    """Load the most recent hotels data file with proper error handling"""
+    try:
+        # Get the most recent file by modification time
+        latest_file = latest_csv()
+        if latest_file is None:
+            st.warning("No hotel data files found. Please run the crawler first.")
+            return None, None
+        st.info(f"Loading data from: {latest_file}")
+
+        # Parsed once per file version, later reruns reuse the cached frame
+        key = csv_key(latest_file)
+        return key, load_frame(key)
+
+    except Exception as e:
+        st.error(f"Error loading data: {str(e)}")
+        return None, None
+
+
+def pyplot():
+    """matplotlib on first use, the charts are skipped when there is no data"""
+    import matplotlib
+    # Streamlit renders figures to images, no GUI backend needed
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def price_currency(data):
+    """Currency code for price labels, prices keep the currency the site showed"""
+    codes = data['currency'].dropna().unique() if 'currency' in data.columns else []
+    if len(codes) == 1:
+        return codes[0]
+    return "mixed currencies" if len(codes) else "$"
+
+
+def show_table_page(filtered_data, currency):
+    """Send only one page of the filtered table to the browser"""
+    pcol1, pcol2 = st.columns(2)
+    page_size = pcol1.selectbox("Rows per page", [50, 100, 250, 500], index=1)
+    pages = max(1, -(-len(filtered_data) // page_size))
+    page = pcol2.number_input("Page", min_value=1, max_value=pages, value=1, step=1)
+    start = (page - 1) * page_size
+    rows = filtered_data.iloc[start:start + page_size]
+    st.caption(f"Rows {min(start + 1, len(filtered_data))}-{start + len(rows)} of {len(filtered_data)}")
+    st.dataframe(rows.style.format({
+        'price_numeric': '{:,.2f} ' + currency,
+        'score_clean': '{:.1f}'
+    }), height=600)
+
+
+def create_dashboard(data, key=None):
+    # key identifies the cached dataset version, None for frames built in place (sample data)
+    st.title("🏨 Booking.com Data Crawler")
+
+    # Debug info
+    st.write(f"Data shape: {data.shape}")
+    st.write("Columns available:", data.columns.tolist())
+
+    # Check if we have valid data
+    if data.empty:
+        st.warning("No hotel data available. Please run the crawler first.")
+        return
+
+    currency = price_currency(data)
+    plt = pyplot()
+
+    # Sidebar filters
+    st.sidebar.header("Filters")
+
+    # Get min/max values for filters
+    if key is not None:
+        min_price, max_price = value_range(key, 'price_numeric')
+        min_score, max_score = value_range(key, 'score_clean')
+    else:
+        min_price, max_price = float(data['price_numeric'].min()), float(data['price_numeric'].max())
+        min_score, max_score = float(data['score_clean'].min()), float(data['score_clean'].max())
+
+    # Paged table and pre-binned charts keep reruns bounded on big crawls
+    large = st.sidebar.checkbox(
+        "Large dataset mode",
+        value=key is not None and len(data) > LARGE_DATA_ROWS,
+        disabled=key is None)
+
+    # Create filters
+    price_range = st.sidebar.slider(
+        "Price Range",
+        min_value=min_price,
+        max_value=max_price,
+        value=(min_price, max_price))
+
+    score_range = st.sidebar.slider(
+        "Review Score Range",
+        min_value=min_score,
+        max_value=max_score,
+        value=(min_score, max_score))
+
+    # Hotels must list every facility picked here
+    index = facilities_index(key) if key is not None else FacilitiesIndex.from_series(data['facilities'])
+    required = st.sidebar.multiselect("Must Have Facilities", index.vocabulary)
+
+    # Apply filters
+    mask = filter_mask(data, price_range, score_range)
+    if required:
+        mask = index.mask(required, within=mask)
+    filtered_data = data[mask]
+
+    # Main content - Data Table
+    st.header("📊 Hotel Data Table")
+    if large:
+        show_table_page(filtered_data, currency)
+    else:
+        st.dataframe(filtered_data.style.format({
+            'price_numeric': '{:,.2f} ' + currency,
+            'score_clean': '{:.1f}'
+        }), height=600)
+
+    # Visualizations Section
+    st.header("📈 Data Visualizations")
+
+    # First row of charts
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("Price Distribution")
+        try:
+            fig, ax = plt.subplots(figsize=(8, 4))
+            if large:
+                # Bins are fixed over the whole dataset, the filter only changes the counts
+                bins = histogram_bins(key, 'price_numeric', 20)
+                ax.stairs(histogram_counts(bins, mask), bins[0], fill=True, facecolor='skyblue', edgecolor='black')
+            else:
+                ax.hist(filtered_data['price_numeric'], bins=20, color='skyblue', edgecolor='black')
+            ax.set_xlabel(f'Price ({currency})')
+            ax.set_ylabel('Count')
+            ax.set_title('Price Distribution')
+            st.pyplot(fig)
+            plt.close()
+        except Exception as e:
+            st.error(f"Could not create price distribution: {str(e)}")
+            st.write("Price data sample:", filtered_data['price_numeric'].head())
+
+    with col2:
+        st.subheader("Review Score Distribution")
+        try:
+            fig, ax = plt.subplots(figsize=(8, 4))
+            if large:
+                bins = histogram_bins(key, 'score_clean', 20, (0.0, 10.0))
+                ax.stairs(histogram_counts(bins, mask), bins[0], fill=True, facecolor='lightgreen', edgecolor='black')
+            else:
+                ax.hist(filtered_data['score_clean'], bins=np.arange(0, 10.5, 0.5), color='lightgreen', edgecolor='black')
+            ax.set_xlabel('Review Score')
+            ax.set_ylabel('Count')
+            ax.set_title('Review Score Distribution')
+            ax.set_xticks(np.arange(0, 10.5, 1))
+            st.pyplot(fig)
+            plt.close()
+        except Exception as e:
+            st.error(f"Could not create score distribution: {str(e)}")
+            st.write("Score data sample:", filtered_data['score_clean'].head())
+
+    # Second row of charts
+    col3, col4 = st.columns(2)
+
+    with col3:
+        st.subheader("Price vs. Rating")
+        try:
+            fig, ax = plt.subplots(figsize=(8, 4))
+            if large:
+                # Hexagon density instead of one marker per hotel
+                points = filtered_data[['price_numeric', 'score_clean']].dropna()
+                if len(points):
+                    ax.hexbin(points['price_numeric'], points['score_clean'], gridsize=40, mincnt=1, cmap='Blues')
+            else:
+                ax.scatter(filtered_data['price_numeric'], filtered_data['score_clean'], alpha=0.6)
+            ax.set_xlabel(f'Price ({currency})')
+            ax.set_ylabel('Review Score')
+            ax.set_title('Price vs. Rating')
+
+            # Add simple linear regression line
+            if large:
+                line = regression(key, mask)
+                if line is not None:
+                    x = np.array([filtered_data['price_numeric'].min(), filtered_data['price_numeric'].max()])
+                    ax.plot(x, line[0] * x + line[1], color='red')
+            elif len(filtered_data) > 1:
+                x = filtered_data['price_numeric']
+                y = filtered_data['score_clean']
+                m, b = np.polyfit(x, y, 1)
+                ax.plot(x, m * x + b, color='red')
+
+            st.pyplot(fig)
+            plt.close()
+        except Exception as e:
+            st.error(f"Could not create scatter plot: {str(e)}")
+            st.write("Data sample:", filtered_data[['price_numeric', 'score_clean']].head())
+
+    with col4:
+        st.subheader("Facilities Analysis")
+        if 'facilities' in filtered_data.columns:
+            try:
+                # Counted straight from the facility bitsets of the filtered hotels
+                facility_counts = index.top(10, within=mask)
+
+                if len(filtered_data) > 0:
+                    if len(facility_counts) > 0:
+                        import plotly.express as px
+
+                        fig = px.bar(
+                            facility_counts,
+                            orientation='h',
+                            labels={'index': 'Facility', 'value': 'Count'},
+                            title='Top 10 Facilities'
+                        )
+                        fig.update_layout(yaxis={'categoryorder': 'total ascending'})
+                        st.plotly_chart(fig, use_container_width=True)
+                    else:
+                        st.warning("No facilities data available after processing")
+                else:
+                    st.warning("No hotels with listed facilities found")
+            except Exception as e:
+                st.error(f"Could not create facilities analysis: {str(e)}")
+                st.write("Facilities data sample:", filtered_data['facilities'].head())
+        else:
+            st.warning("Facilities data not available in this dataset")
+
+    # Metrics Section
+    st.header("📊 Key Metrics")
+    mcol1, mcol2, mcol3, mcol4 = st.columns(4)
+    mcol1.metric("Total Hotels", len(filtered_data))
+    mcol2.metric("Average Price", f"{filtered_data['price_numeric'].mean():,.2f} {currency}")
+    mcol3.metric("Average Rating", f"{filtered_data['score_clean'].mean():.1f}/10")
+    mcol4.metric("Highest Rated",
+                 filtered_data.loc[filtered_data['score_clean'].idxmax()]['name'] if len(filtered_data) else "N/A")
+
+    # Download button, a big CSV is only built when asked for
+    if large and not st.button("Prepare Filtered Data for Download"):
+        return
+    st.download_button(
+        label="Download Filtered Data as CSV",
+        data=filtered_csv(key, mask) if large else filtered_data.to_csv(index=False),
+        file_name=f"filtered_hotels_{datetime.now().strftime('%Y%m%d')}.csv",
+        mime="text/csv"
+    )
+
+
+def show_price_history():
+    """Trends and price drops across every crawl, not just the latest one"""
+    st.header("📉 Price History")
+    try:
+        version = history_version()
+        destinations = history_destinations(HISTORY_PATH, version)
+    except Exception as e:
+        st.error(f"Could not read the price history: {str(e)}")
+        return
+    if not destinations:
+        st.info("No crawls in the price history yet.")
+        return
+
+    destination = st.selectbox("Destination", destinations)
+    trend = destination_trend(HISTORY_PATH, version, destination).set_index('crawl_date')
+    if len(trend) < 2:
+        st.info(f"Only one crawl of {destination} so far, trends need at least two.")
+
+    hcol1, hcol2 = st.columns(2)
+    with hcol1:
+        st.subheader("Average and Lowest Price")
+        st.line_chart(trend[['avg_price', 'min_price']])
+    with hcol2:
+        st.subheader("Average Review Score")
+        st.line_chart(trend[['avg_score']])
+
+    st.subheader("Biggest Price Drops Since the Previous Crawl")
+    min_drop = st.slider("Minimum drop (%)", min_value=1, max_value=90, value=5) / 100
+    drops = price_drops(HISTORY_PATH, version, destination, min_drop)
+    if drops.empty:
+        st.write("No hotel got cheaper by that much in the latest crawl.")
+    else:
+        st.dataframe(drops.style.format({'price_drop': '{:.0%}', 'price': '{:,.2f}', 'previous_price': '{:,.2f}'}))
+
+    st.subheader("Single Hotel")
+    hotels = destination_hotels(HISTORY_PATH, version, destination)
+    url = st.selectbox("Hotel", hotels['url'], format_func=dict(zip(hotels['url'], hotels['name'])).get)
+    if url:
+        # One price line per stay searched, the score does not depend on the dates
+        series = hotel_trend(HISTORY_PATH, version, url)
+        series['stay'] = (series['checkin'] + ' to ' + series['checkout']).where(series['checkin'] != '', 'any dates')
+        st.line_chart(series.pivot_table(index='crawl_date', columns='stay', values='price'))
+        st.line_chart(series.groupby('crawl_date')[['score']].mean())
+
+
+if __name__ == "__main__":
+    # Load the data, the crawl store only reads the destinations picked in the sidebar
+    key, data = None, None
+    store = CrawlStore()
+    if store.exists():
+        version = store_version(store.root)
+        available = store_destinations(store.root, version)
+        selected = st.sidebar.multiselect("Destinations", available, default=available)
+        key, data = load_store_data(store, selected or None, version)
+    if data is None:
+        key, data = load_latest_data()
+
+    if data is None:
+        # Create dummy data if no file found
+        data = pd.DataFrame({
+            'name': ['Hotel A', 'Hotel B', 'Hotel C'],
+            'price': ['$100', '$150', '$200'],
+            'score': ['8.5/10', '9.0/10', '7.8/10'],
+            'location': ['Location A', 'Location B', 'Location C'],
+            'price_numeric': [100, 150, 200],
+            'score_clean': [8.5, 9.0, 7.8],
+            'facilities': ['Free WiFi, Pool', 'Free WiFi, Parking', 'Restaurant, Bar']
+        })
+        st.warning("No hotel data file found. Showing sample data.")
+
+    create_dashboard(data, key)
+    show_price_history()
\ No newline at end of file
@@ -0,0 +1,192 @@
+# Cached data layer for the dashboard. Streamlit reruns app.py on every widget
+# change, so files are only read and derived columns only computed once per
+# version of the data (file path + mtime, or the newest file in the crawl store).
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from crawler.facilities_index import FacilitiesIndex
+from crawler.history import PriceHistory
+from crawler.normalize import normalize_frame
+from crawler.store import CrawlStore
+
+
+CSV_PATTERN = "hotels_data_*.csv"
+HISTORY_PATH = "price_history.sqlite"
+# Crawl files missing from the price history are looked for at most this often, not on every rerun
+HISTORY_SCAN_SECONDS = 60
+
+
+def prepare(df, normalize=True):
+    # Derived columns every chart needs, computed once per loaded version.
+    # The crawl store already holds typed columns, CSV text still needs parsing.
+    if normalize:
+        df = normalize_frame(df)
+    if 'facilities' not in df.columns:
+        df['facilities'] = "No data available"
+    df['facilities'] = df['facilities'].fillna('').astype(str)
+    return df
+
+
+def file_version(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def store_version(root):
+    # Any crawl written to the store adds or replaces a file, so the newest mtime changes
+    newest, count = 0, 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            newest = max(newest, os.stat(os.path.join(dirpath, name)).st_mtime_ns)
+            count += 1
+    return newest, count
+
+
+def latest_csv():
+    files = glob.glob(CSV_PATTERN)
+    return max(files, key=os.path.getmtime) if files else None
+
+
+def store_key(store, destinations=None, version=None):
+    return ('store', store.root, version or store_version(store.root), tuple(destinations or ()))
+
+
+# Listing partitions discovers every fragment of the dataset, done once per store version
+@st.cache_data(max_entries=4)
+def store_destinations(root, version):
+    return CrawlStore(root).destinations()
+
+
+@st.cache_data(max_entries=16)
+def store_latest_dates(root, version, destinations):
+    return CrawlStore(root).latest_dates(list(destinations) or None)
+
+
+def csv_key(path):
+    return ('csv', path, file_version(path))
+
+
+# cache_resource hands every rerun and session the same frame instead of a pickled
+# copy, callers must treat it as read-only
+@st.cache_resource(max_entries=4, show_spinner="Loading hotel data...")
+def _store_frame(root, version, destinations):
+    return prepare(CrawlStore(root).read(destinations=list(destinations) or None, latest=True), normalize=False)
+
+
+@st.cache_resource(max_entries=4, show_spinner="Loading hotel data...")
+def _csv_frame(path, version):
+    try:
+        df = pd.read_csv(path, encoding='utf-8')
+    except UnicodeDecodeError:
+        df = pd.read_csv(path, encoding='latin1')
+    return prepare(df)
+
+
+def load_frame(key):
+    if key[0] == 'store':
+        return _store_frame(*key[1:])
+    return _csv_frame(*key[1:])
+
+
+@st.cache_resource(max_entries=4)
+def facilities_index(key):
+    # Built once per dataset version, facility filters and counts then work on bitsets
+    return FacilitiesIndex.from_series(load_frame(key)['facilities'])
+
+
+def filter_mask(df, price_range, score_range):
+    price = df['price_numeric'].to_numpy()
+    score = df['score_clean'].to_numpy()
+    return ((price >= price_range[0]) & (price <= price_range[1])
+            & (score >= score_range[0]) & (score <= score_range[1]))
+
+
+@st.cache_data(max_entries=16)
+def value_range(key, column):
+    values = load_frame(key)[column]
+    return float(values.min()), float(values.max())
+
+
+@st.cache_resource(max_entries=8)
+def histogram_bins(key, column, bins=20, value_range=None):
+    # Bin edges plus every hotel's bin number, fixed per dataset version so a
+    # filter change only has to count. Missing values get bin -1.
+    values = load_frame(key)[column].to_numpy(dtype=float)
+    finite = np.isfinite(values)
+    edges = np.histogram_bin_edges(values[finite], bins=bins, range=value_range)
+    index = np.digitize(values, edges[1:-1])
+    index[~finite] = -1
+    if value_range is not None:
+        index[finite & ((values < edges[0]) | (values > edges[-1]))] = -1
+    return edges, index
+
+
+def histogram_counts(bins, mask):
+    edges, index = bins
+    selected = index[mask]
+    return np.bincount(selected[selected >= 0], minlength=len(edges) - 1)
+
+
+@st.cache_data(max_entries=32)
+def regression(key, mask):
+    # Price vs. score least-squares line over the filtered hotels, None below two points
+    df = load_frame(key)
+    x = df['price_numeric'].to_numpy(dtype=float)[mask]
+    y = df['score_clean'].to_numpy(dtype=float)[mask]
+    finite = np.isfinite(x) & np.isfinite(y)
+    if finite.sum() < 2:
+        return None
+    m, b = np.polyfit(x[finite], y[finite], 1)
+    return float(m), float(b)
+
+
+@st.cache_data(max_entries=4, show_spinner="Preparing CSV...")
+def filtered_csv(key, mask):
+    return load_frame(key)[mask].to_csv(index=False)
+
+
+@st.cache_resource
+def price_history(path=HISTORY_PATH):
+    # One connection shared by every session, PriceHistory serialises access itself
+    return PriceHistory(path)
+
+
+@st.cache_data(ttl=HISTORY_SCAN_SECONDS, show_spinner=False)
+def _ingest_new_crawls(path):
+    # Crawl daemons add their files as they finish, this picks up crawls run any other way
+    return price_history(path).ingest_new(CSV_PATTERN)
+
+
+def history_version(path=HISTORY_PATH):
+    # Versions the queries below by the database file
+    _ingest_new_crawls(path)
+    return file_version(path)
+
+
+@st.cache_data(max_entries=16)
+def history_destinations(path, version):
+    return price_history(path).destinations()
+
+
+@st.cache_data(max_entries=16)
+def destination_trend(path, version, destination):
+    return price_history(path).destination_series(destination)
+
+
+@st.cache_data(max_entries=16)
+def destination_hotels(path, version, destination):
+    return price_history(path).hotels(destination)
+
+
+@st.cache_data(max_entries=64)
+def hotel_trend(path, version, url):
+    return price_history(path).hotel_series(url)
+
+
+@st.cache_data(max_entries=16)
+def price_drops(path, version, destination, min_drop):
+    return price_history(path).price_drops(destination, min_drop)
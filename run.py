@@ -1,164 +1,226 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-from crawler.js_handler import JSScraper
-import pandas as pd
-from datetime import datetime, timedelta
-import time
-
-
-class BookingCrawlerGUI:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Booking.com Crawler")
-        self.root.geometry("500x400")
-
-        # Create main frame
-        self.main_frame = ttk.Frame(root, padding="20")
-        self.main_frame.pack(fill=tk.BOTH, expand=True)
-
-        # Add title
-        ttk.Label(self.main_frame,
-                 text="=== Booking.com Crawler ===",
-                 font=('Arial', 14)).grid(row=0, column=0, columnspan=2, pady=10)
-
-        # Destination
-        ttk.Label(self.main_frame, text="Destination:").grid(row=1, column=0, sticky=tk.W, pady=5)
-        self.destination_entry = ttk.Entry(self.main_frame, width=40)
-        self.destination_entry.grid(row=1, column=1, pady=5)
-        self.destination_entry.insert(0, "Paris, Madrid")
-
-        # Check-in date
-        ttk.Label(self.main_frame, text="Check-in Date (YYYY-MM-DD):").grid(row=2, column=0, sticky=tk.W, pady=5)
-        self.checkin_entry = ttk.Entry(self.main_frame, width=40)
-        self.checkin_entry.grid(row=2, column=1, pady=5)
-        self.checkin_entry.insert(0, datetime.now().strftime('%Y-%m-%d'))
-
-        # Check-out date
-        ttk.Label(self.main_frame, text="Check-out Date (YYYY-MM-DD):").grid(row=3, column=0, sticky=tk.W, pady=5)
-        self.checkout_entry = ttk.Entry(self.main_frame, width=40)
-        self.checkout_entry.grid(row=3, column=1, pady=5)
-        self.checkout_entry.insert(0, (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d'))
-
-        # Max results
-        ttk.Label(self.main_frame, text="Maximum Results:").grid(row=4, column=0, sticky=tk.W, pady=5)
-        self.max_results_entry = ttk.Entry(self.main_frame, width=40)
-        self.max_results_entry.grid(row=4, column=1, pady=5)
-        self.max_results_entry.insert(0, "20")
-
-        # Headless mode checkbox
-        self.headless_var = tk.BooleanVar(value=True)
-        self.headless_check = ttk.Checkbutton(
-            self.main_frame,
-            text="Run browser in headless mode",
-            variable=self.headless_var
-        )
-        self.headless_check.grid(row=5, column=0, columnspan=2, pady=5)
-
-        # Run button
-        self.run_button = ttk.Button(
-            self.main_frame,
-            text="Start Crawling",
-            command=self.run_crawler
-        )
-        self.run_button.grid(row=6, column=0, columnspan=2, pady=20)
-
-        # Progress bar
-        self.progress = ttk.Progressbar(
-            self.main_frame,
-            orient=tk.HORIZONTAL,
-            length=300,
-            mode='determinate'
-        )
-        self.progress.grid(row=7, column=0, columnspan=2, pady=10)
-
-        # Status label
-        self.status_label = ttk.Label(self.main_frame, text="Ready", foreground="blue")
-        self.status_label.grid(row=8, column=0, columnspan=2)
-
-    def run_crawler(self):
-        try:
-            # Get values from entries
-            destination = self.destination_entry.get()
-            checkin = self.checkin_entry.get()
-            checkout = self.checkout_entry.get()
-            max_results = int(self.max_results_entry.get())
-            headless = self.headless_var.get()
-
-            # Validate inputs
-            if not destination:
-                messagebox.showerror("Error", "Please enter a destination")
-                return
-
-            try:
-                datetime.strptime(checkin, '%Y-%m-%d')
-                datetime.strptime(checkout, '%Y-%m-%d')
-            except ValueError:
-                messagebox.showerror("Error", "Invalid date format. Please use YYYY-MM-DD")
-                return
-
-            # Update UI
-            self.status_label.config(text="Scraping in progress...", foreground="orange")
-            self.progress["value"] = 0
-            self.root.update_idletasks()
-
-            # Initialize scraper
-            js_scraper = JSScraper(headless=headless)
-
-            # Start scraping in a separate thread to keep UI responsive
-            def scraping_thread():
-                try:
-                    # Get the hotels DataFrame
-                    hotels_df = js_scraper.scrape_hotels(
-                        destination=destination,
-                        checkin=checkin,
-                        checkout=checkout,
-                        max_results=max_results
-                    )
-
-                    if hotels_df is not None and not hotels_df.empty:
-                        # Save with timestamp
-                        filename = f"hotels_data_{destination.replace(',', '').replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.csv"
-                        hotels_df.to_csv(filename, index=False)
-
-                        # Update UI
-                        self.status_label.config(
-                            text=f"Success! Scraped {len(hotels_df)} hotels. Saved to {filename}",
-                            foreground="green"
-                        )
-                        self.progress["value"] = 100
-
-                        # Show success message
-                        messagebox.showinfo(
-                            "Success",
-                            f"Successfully scraped {len(hotels_df)} hotels.\nData saved to {filename}"
-                        )
-                    else:
-                        self.status_label.config(text="No hotels were scraped", foreground="red")
-                        messagebox.showerror("Error",
-                                            "No hotels were scraped. Please check the website structure or try again.")
-
-                except Exception as e:
-                    self.status_label.config(text=f"Error: {str(e)}", foreground="red")
-                    messagebox.showerror("Error", f"JS scraping failed: {str(e)}")
-                finally:
-                    self.progress["value"] = 100
-
-            # Start the scraping thread
-            import threading
-            thread = threading.Thread(target=scraping_thread)
-            thread.start()
-
-        except ValueError:
-            messagebox.showerror("Error", "Please enter a valid number for maximum results")
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
-
-
-def main():
-    root = tk.Tk()
-    app = BookingCrawlerGUI(root)
-    root.mainloop()
-
-
-if __name__ == "__main__":
+import tkinter as tk
+from tkinter import ttk, messagebox
+# Only the job queue is needed to show the window; Playwright, pandas and pyarrow load
+# on the worker threads once the first job runs
+from crawler.jobs import JobQueue, CrawlDaemon, DONE, FINISHED
+from crawler.urls import split_destinations
+import threading
+from datetime import datetime, timedelta
+
+
+# How often the window checks the job queue for progress
+POLL_MS = 1000
+
+
+class BookingCrawlerGUI:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Booking.com Crawler")
+        self.root.geometry("500x540")
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Crawls go through the same job queue as cli.py. The worker below owns the warm
+        # browser pool, detail cache, Parquet store, price history and metrics, and runs
+        # jobs on its own threads; a `cli.py daemon` on this machine may take them too.
+        self.queue = JobQueue()
+        self.worker = CrawlDaemon(self.queue, workers=2)
+        threading.Thread(target=self.worker.run_forever, daemon=True).start()
+        # Jobs of the crawl started by the last click
+        self.active_jobs = []
+
+        # Create main frame
+        self.main_frame = ttk.Frame(root, padding="20")
+        self.main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # Add title
+        ttk.Label(self.main_frame,
+                 text="=== Booking.com Crawler ===",
+                 font=('Arial', 14)).grid(row=0, column=0, columnspan=2, pady=10)
+
+        # Destination
+        ttk.Label(self.main_frame, text="Destination:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        self.destination_entry = ttk.Entry(self.main_frame, width=40)
+        self.destination_entry.grid(row=1, column=1, pady=5)
+        self.destination_entry.insert(0, "Paris, Madrid")
+
+        # Check-in date
+        ttk.Label(self.main_frame, text="Check-in Date (YYYY-MM-DD):").grid(row=2, column=0, sticky=tk.W, pady=5)
+        self.checkin_entry = ttk.Entry(self.main_frame, width=40)
+        self.checkin_entry.grid(row=2, column=1, pady=5)
+        self.checkin_entry.insert(0, datetime.now().strftime('%Y-%m-%d'))
+
+        # Check-out date
+        ttk.Label(self.main_frame, text="Check-out Date (YYYY-MM-DD):").grid(row=3, column=0, sticky=tk.W, pady=5)
+        self.checkout_entry = ttk.Entry(self.main_frame, width=40)
+        self.checkout_entry.grid(row=3, column=1, pady=5)
+        self.checkout_entry.insert(0, (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d'))
+
+        # Max results
+        ttk.Label(self.main_frame, text="Maximum Results:").grid(row=4, column=0, sticky=tk.W, pady=5)
+        self.max_results_entry = ttk.Entry(self.main_frame, width=40)
+        self.max_results_entry.grid(row=4, column=1, pady=5)
+        self.max_results_entry.insert(0, "20")
+
+        # Parallel detail-page tabs
+        ttk.Label(self.main_frame, text="Parallel Tabs:").grid(row=5, column=0, sticky=tk.W, pady=5)
+        self.concurrency_entry = ttk.Entry(self.main_frame, width=40)
+        self.concurrency_entry.grid(row=5, column=1, pady=5)
+        self.concurrency_entry.insert(0, "4")
+
+        # Headless mode checkbox
+        self.headless_var = tk.BooleanVar(value=True)
+        self.headless_check = ttk.Checkbutton(
+            self.main_frame,
+            text="Run browser in headless mode",
+            variable=self.headless_var
+        )
+        self.headless_check.grid(row=6, column=0, columnspan=2, pady=5)
+
+        # Static HTML first, browser only when the page needs JavaScript
+        self.static_first_var = tk.BooleanVar(value=True)
+        self.static_first_check = ttk.Checkbutton(
+            self.main_frame,
+            text="Try fast static fetch before the browser",
+            variable=self.static_first_var
+        )
+        self.static_first_check.grid(row=7, column=0, columnspan=2, pady=5)
+
+        # Continue an interrupted crawl of the same destination and day
+        self.resume_var = tk.BooleanVar(value=True)
+        self.resume_check = ttk.Checkbutton(
+            self.main_frame,
+            text="Resume interrupted crawls",
+            variable=self.resume_var
+        )
+        self.resume_check.grid(row=8, column=0, columnspan=2, pady=5)
+
+        # Reuse last crawl's row for hotels whose search card has not changed
+        self.delta_var = tk.BooleanVar(value=False)
+        self.delta_check = ttk.Checkbutton(
+            self.main_frame,
+            text="Only revisit new or changed hotels",
+            variable=self.delta_var
+        )
+        self.delta_check.grid(row=9, column=0, columnspan=2, pady=5)
+
+        # Run button
+        self.run_button = ttk.Button(
+            self.main_frame,
+            text="Start Crawling",
+            command=self.run_crawler
+        )
+        self.run_button.grid(row=10, column=0, columnspan=2, pady=20)
+
+        # Progress bar
+        self.progress = ttk.Progressbar(
+            self.main_frame,
+            orient=tk.HORIZONTAL,
+            length=300,
+            mode='determinate'
+        )
+        self.progress.grid(row=11, column=0, columnspan=2, pady=10)
+
+        # Status label
+        self.status_label = ttk.Label(self.main_frame, text="Ready", foreground="blue")
+        self.status_label.grid(row=12, column=0, columnspan=2)
+
+    def on_close(self):
+        try:
+            self.worker.close()
+        except Exception:
+            pass
+        self.root.destroy()
+
+    def run_crawler(self):
+        try:
+            # Get values from entries
+            destination = self.destination_entry.get()
+            checkin = self.checkin_entry.get()
+            checkout = self.checkout_entry.get()
+            max_results = int(self.max_results_entry.get())
+            concurrency = int(self.concurrency_entry.get())
+            headless = self.headless_var.get()
+            static_first = self.static_first_var.get()
+            resume = self.resume_var.get()
+            delta = self.delta_var.get()
+
+            # Validate inputs
+            destinations = split_destinations(destination)
+            if not destinations:
+                messagebox.showerror("Error", "Please enter a destination")
+                return
+
+            try:
+                datetime.strptime(checkin, '%Y-%m-%d')
+                datetime.strptime(checkout, '%Y-%m-%d')
+            except ValueError:
+                messagebox.showerror("Error", "Invalid date format. Please use YYYY-MM-DD")
+                return
+
+            # Queue one job per destination, the worker threads pick them up
+            self.active_jobs = self.queue.submit(destinations, checkin, checkout, max_results,
+                                                 concurrency=concurrency, headless=headless,
+                                                 static_first=static_first, resume=resume, delta=delta)
+
+            # Update UI
+            self.status_label.config(text="Scraping in progress...", foreground="orange")
+            self.progress["value"] = 0
+            self.run_button.config(state=tk.DISABLED)
+            self.root.after(POLL_MS, self.poll_jobs)
+
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid number for maximum results and parallel tabs")
+        except Exception as e:
+            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+
+    def poll_jobs(self):
+        # Runs on the Tk thread through root.after, the crawl threads never touch widgets
+        jobs = [self.queue.get(job_id) for job_id in self.active_jobs]
+        wanted = sum(job['max_results'] for job in jobs)
+        scraped = sum(job['hotels'] for job in jobs)
+        self.progress["value"] = 100 * scraped / wanted if wanted else 0
+
+        finished = [job for job in jobs if job['status'] in FINISHED]
+        if len(finished) < len(jobs):
+            retrying = [job for job in jobs if job['error'] and job['status'] not in FINISHED]
+            text = f"Scraping in progress... {scraped} hotels, {len(finished)}/{len(jobs)} destinations done"
+            if retrying:
+                text += f", retrying {', '.join(job['destination'] for job in retrying)}"
+            self.status_label.config(text=text, foreground="orange")
+            self.root.after(POLL_MS, self.poll_jobs)
+            return
+
+        self.run_button.config(state=tk.NORMAL)
+        self.progress["value"] = 100
+        filenames = [job['output'] for job in jobs if job['status'] == DONE]
+        total = sum(job['hotels'] for job in jobs if job['status'] == DONE)
+        failed = [job for job in jobs if job['status'] != DONE]
+
+        if filenames:
+            # Update UI
+            self.status_label.config(
+                text=f"Success! Scraped {total} hotels. Saved to {', '.join(filenames)}",
+                foreground="green"
+            )
+
+            # Show success message
+            message = f"Successfully scraped {total} hotels.\nData saved to:\n" + "\n".join(filenames)
+            if failed:
+                message += "\n\nFailed: " + ", ".join(f"{job['destination']} ({job['error']})" for job in failed)
+            messagebox.showinfo("Success", message)
+        else:
+            self.status_label.config(text="No hotels were scraped", foreground="red")
+            errors = "\n".join(f"{job['destination']}: {job['error']}" for job in failed if job['error'])
+            messagebox.showerror("Error",
+                                 "No hotels were scraped. Please check the website structure or try again."
+                                 + (f"\n\n{errors}" if errors else ""))
+
+
+def main():
+    root = tk.Tk()
+    app = BookingCrawlerGUI(root)
+    root.mainloop()
+
+
+if __name__ == "__main__":
     main()
\ No newline at end of file